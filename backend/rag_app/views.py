@@ -415,10 +415,14 @@ class DocumentModulesListView(APIView):
             uploaded_by=request.user  # Fixed field name
         )
 
-        # if vector store exists for module, update status to empty to trigger re-indexing
-        vector_store = ModuleVectorStore.objects.get(module=module)
-        vector_store.status = 'empty'
-        vector_store.save(update_fields=['status'])
+        # A ready vector store indexes just the new document; otherwise the next full build picks it up
+        vector_store = ModuleVectorStore.objects.filter(module=module).first()
+        if vector_store is not None and vector_store.status == 'ready':
+            from vectordb.tasks import reindex_document_task
+            reindex_document_task.delay(document.id)
+        elif vector_store is not None:
+            vector_store.status = 'empty'
+            vector_store.save(update_fields=['status'])
 
         return Response(
             DocumentSerializer(document).data,
@@ -1,11 +1,76 @@
 from celery import Celery
+from celery.signals import celeryd_init
+from kombu import Queue
+import logging
 import os
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sop_rag.settings')
 
+logger = logging.getLogger(__name__)
+
 app = Celery('sop_rag')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# One queue per workload, each consumed by its own worker, so a chat answer or
+# a single-document re-index never waits behind a multi-hour module rebuild
+QUEUE_BUILDS = 'builds'            # full module (re)builds
+QUEUE_REINDEX = 'reindex'          # one document added or changed
+QUEUE_CHAT = 'chat'                # queued chat answers and session summaries
+QUEUE_MAINTENANCE = 'maintenance'  # periodic housekeeping from celery-beat
+
+# Redis serves lower numbers first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_BULK = 9
+
+TASK_ROUTES = {
+    'vectordb.tasks.create_vectordb_for_module_task': {'queue': QUEUE_BUILDS, 'priority': PRIORITY_BULK},
+    'vectordb.tasks.reindex_document_task': {'queue': QUEUE_REINDEX, 'priority': PRIORITY_INTERACTIVE},
+    'vectordb.tasks.answer_chat_question_task': {'queue': QUEUE_CHAT, 'priority': PRIORITY_INTERACTIVE},
+    'vectordb.tasks.summarize_chat_session_task': {'queue': QUEUE_CHAT, 'priority': PRIORITY_BULK},
+    'vectordb.tasks.prune_llm_response_cache': {'queue': QUEUE_MAINTENANCE},
+    'vectordb.tasks.cleanup_old_vector_tasks': {'queue': QUEUE_MAINTENANCE},
+    'vectordb.tasks.update_vector_store_stats': {'queue': QUEUE_MAINTENANCE},
+}
+
+
+def _concurrency(queue: str, default: int) -> int:
+    return int(os.getenv(f'CELERY_{queue.upper()}_CONCURRENCY', default))
+
+
+# Worker settings applied by the first queue a worker consumes (-Q); the
+# profiles of any further queues are ignored, so give each queue its own
+# worker (as docker-compose.yml does) for its profile to take effect. Builds
+# hold a document's elements and embeddings in memory, so their child process
+# is recycled after every build; chat workers stay warm to keep the embeddings
+# model and HTTP connection pools. Memory limits are in KiB.
+WORKER_PROFILES = {
+    QUEUE_BUILDS: {
+        'worker_concurrency': _concurrency(QUEUE_BUILDS, 1),
+        'worker_prefetch_multiplier': 1,
+        'worker_max_tasks_per_child': 1,
+        'worker_max_memory_per_child': 1500000,
+    },
+    QUEUE_REINDEX: {
+        'worker_concurrency': _concurrency(QUEUE_REINDEX, 2),
+        'worker_prefetch_multiplier': 1,
+        'worker_max_tasks_per_child': 50,
+        'worker_max_memory_per_child': 800000,
+    },
+    QUEUE_CHAT: {
+        'worker_concurrency': _concurrency(QUEUE_CHAT, 4),
+        'worker_prefetch_multiplier': 1,
+        'worker_max_tasks_per_child': None,
+        'worker_max_memory_per_child': 1000000,
+    },
+    QUEUE_MAINTENANCE: {
+        'worker_concurrency': _concurrency(QUEUE_MAINTENANCE, 1),
+        'worker_prefetch_multiplier': 4,
+        'worker_max_tasks_per_child': 100,
+        'worker_max_memory_per_child': 300000,
+    },
+}
+
 # Memory optimization settings
 app.conf.update(
     worker_max_tasks_per_child=10,  # Restart worker after 10 tasks to free memory
@@ -15,4 +80,36 @@ app.conf.update(
     worker_max_memory_per_child=500000,  # 500MB max per worker (restart after)
 )
 
+# Queues, routing and priorities
+app.conf.update(
+    task_queues=[Queue(name) for name in (QUEUE_BUILDS, QUEUE_REINDEX, QUEUE_CHAT, QUEUE_MAINTENANCE)],
+    task_default_queue=QUEUE_MAINTENANCE,
+    task_routes=TASK_ROUTES,
+    task_default_priority=PRIORITY_DEFAULT,
+    broker_transport_options={
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(10)),
+        'sep': ':',
+    },
+)
+
+
+@celeryd_init.connect
+def apply_worker_profile(sender=None, conf=None, options=None, **kwargs):
+    """Tune a worker for the workload of its queues; command-line options still win"""
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    queues = [queue.strip() for queue in queues]
+    profile = WORKER_PROFILES.get(queues[0]) if queues else None
+    if profile:
+        conf.update(profile)
+    ignored = [queue for queue in queues[1:] if queue in WORKER_PROFILES]
+    if profile and ignored:
+        logger.warning(
+            f"Worker consumes {', '.join(queues)}: applying the {queues[0]} profile, "
+            f"the {', '.join(ignored)} profile(s) are not used"
+        )
+
+
 app.autodiscover_tasks()
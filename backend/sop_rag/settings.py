@@ -189,6 +189,18 @@ CORS_ALLOW_METHODS = [
     'PUT',
 ]
 
+# Cache Configuration (shared across web and Celery workers when Redis is available)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sop-rag-cache',
+    }
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", 'redis://redis:6379/0/0')
 # 'redis://redis:6379/0/0'
@@ -207,7 +219,88 @@ VECTOR_DB_CONFIG = {
     'CHUNK_SIZE': int(os.getenv("CHUNK_SIZE", 1000)),
     'CHUNK_OVERLAP': int(os.getenv("CHUNK_OVERLAP", 200)),
     'EMBEDDING_DIMENSION': int(os.getenv("EMBEDDING_DIMENSION", 384)),
-    'VECTOR_STORE': os.getenv("VECTOR_STORE", 'chromadb'),
+    'EMBEDDINGS_BACKEND': os.getenv("EMBEDDINGS_BACKEND", 'huggingface'),  # or 'hash': offline feature-hashed vectors
+    'FAKE_EMBEDDING_LATENCY_MS': float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", 0)),
+    'VECTOR_STORE': os.getenv("VECTOR_STORE", 'chromadb'),  # chromadb | hnswlib | quantized; per module via config['vector_store']
+    'QUANTIZATION': os.getenv("QUANTIZATION", 'int8'),  # int8 | binary, for the quantized backend
+    'RETRIEVAL_CACHE_TTL': int(os.getenv("RETRIEVAL_CACHE_TTL", 3600)),
+    'RETRIEVAL_CACHE_L1_SIZE': int(os.getenv("RETRIEVAL_CACHE_L1_SIZE", 1024)),
+    'QUERY_EMBEDDING_CACHE_SIZE': int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+    'SCORE_THRESHOLD': float(os.getenv("SCORE_THRESHOLD", 0.2)),  # default; modules override via config['score_threshold']
+    'SCORE_GAP': float(os.getenv("SCORE_GAP", 0.15)),
+    # Below this top score the canned "no information" reply is returned without an LLM call; modules
+    # override via config['answer_min_score'] (0 = only when nothing passes SCORE_THRESHOLD)
+    'ANSWER_MIN_SCORE': float(os.getenv("ANSWER_MIN_SCORE", 0.3)),
+    'CONTEXT_TOKEN_BUDGET': int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000)),  # modules override via config['context_token_budget']
+    # A chunk is dropped from the context when this share of its 5-word shingles is already in a better one
+    'CONTEXT_OVERLAP_RATIO': float(os.getenv("CONTEXT_OVERLAP_RATIO", 0.6)),
+    'PARENT_WINDOW': int(os.getenv("PARENT_WINDOW", 0)),  # neighbouring elements around each hit; modules override via config['parent_window']
+    'SEARCH_THREADS': int(os.getenv("SEARCH_THREADS", 4)),  # bounded pool for embedding/search in async views
+    'BATCH_MAX_QUERIES': int(os.getenv("BATCH_MAX_QUERIES", 500)),
+    'BATCH_LLM_CONCURRENCY': int(os.getenv("BATCH_LLM_CONCURRENCY", 8)),  # LLM calls in flight per batch request
+    'PROJECT_SEARCH_THREADS': int(os.getenv("PROJECT_SEARCH_THREADS", 8)),
+    'PROJECT_SEARCH_BUDGET_MS': int(os.getenv("PROJECT_SEARCH_BUDGET_MS", 1500)),  # shards slower than this are skipped
+    # Identical concurrent questions share one retrieval + generation; across workers needs Redis (REDIS_URL)
+    'COALESCE_ACROSS_WORKERS': os.getenv("COALESCE_ACROSS_WORKERS", 'True' if REDIS_URL else 'False') == 'True',
+    'COALESCE_TIMEOUT': int(os.getenv("COALESCE_TIMEOUT", 120)),
+    'COALESCE_RESULT_TTL': int(os.getenv("COALESCE_RESULT_TTL", 10)),  # seconds a finished result is served to late joiners
+    'CHAT_MEMORY_RECENT_TURNS': int(os.getenv("CHAT_MEMORY_RECENT_TURNS", 4)),
+    'CHAT_MEMORY_SUMMARY_MODEL': os.getenv("CHAT_MEMORY_SUMMARY_MODEL", 'mistral-small-latest'),
+    # Follow-ups are rewritten into a standalone search query by the small model before retrieval
+    'CONDENSE_QUESTION': os.getenv("CONDENSE_QUESTION", 'True') == 'True',
+    # Chat jobs: how often the events stream checks a job, and how long it waits before giving up
+    'CHAT_JOB_POLL_INTERVAL': float(os.getenv("CHAT_JOB_POLL_INTERVAL", 1.0)),
+    'CHAT_JOB_STREAM_TIMEOUT': int(os.getenv("CHAT_JOB_STREAM_TIMEOUT", 300)),
+    # Build progress: task row + Celery state written at most this often; page/chunk detail goes to the cache
+    'PROGRESS_FLUSH_SECONDS': float(os.getenv("PROGRESS_FLUSH_SECONDS", 5)),
+    'PROGRESS_LIVE_SECONDS': float(os.getenv("PROGRESS_LIVE_SECONDS", 1)),
+}
+
+# LLM Configuration
+LLM_CONFIG = {
+    # 'fake' serves every chat model with a deterministic offline stand-in (load tests, CI, air-gapped hosts)
+    'PROVIDER': os.getenv("LLM_PROVIDER", 'mistralai'),
+    'FAKE': {
+        'LATENCY_MS': float(os.getenv("FAKE_LLM_LATENCY_MS", 0)),  # median time to first token
+        'LATENCY_DISTRIBUTION': os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", 'lognormal'),  # fixed | uniform | lognormal
+        'LATENCY_SIGMA': float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.5)),
+        'TOKENS_PER_SECOND': float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 0)),  # 0 = no per-token delay
+        'ANSWER_TOKENS': int(os.getenv("FAKE_LLM_ANSWER_TOKENS", 64)),
+        'SEED': int(os.getenv("FAKE_LLM_SEED", 0)),
+    },
+    # HuggingFace tokenizer used to count prompt tokens; TOKENIZERS maps specific chat models.
+    # The default is ungated (Mistral's own repos need an HF token) with a close 32k SentencePiece vocabulary
+    'TOKENIZER': os.getenv("LLM_TOKENIZER", 'hf-internal-testing/llama-tokenizer'),
+    'TOKENIZERS': {},
+    'TOKENIZER_RETRY_SECONDS': int(os.getenv("LLM_TOKENIZER_RETRY_SECONDS", 600)),  # after a failed download
+    # Shared keep-alive connection pool per provider; MAX_CONNECTIONS caps outbound LLM calls per process
+    'MAX_CONNECTIONS': int(os.getenv("LLM_MAX_CONNECTIONS", 20)),
+    'MAX_KEEPALIVE_CONNECTIONS': int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10)),
+    'KEEPALIVE_EXPIRY': float(os.getenv("LLM_KEEPALIVE_EXPIRY", 30)),
+    'TIMEOUT': float(os.getenv("LLM_TIMEOUT", 120)),
+    'CONNECT_TIMEOUT': float(os.getenv("LLM_CONNECT_TIMEOUT", 10)),
+    'MAX_RETRIES': int(os.getenv("LLM_MAX_RETRIES", 2)),
+    # Per-request routing between a small and a large chat model; modules override via config['routing']
+    # or pin one model with config['chat_model']
+    'ROUTING_ENABLED': os.getenv("LLM_ROUTING_ENABLED", 'True') == 'True',
+    'SMALL_MODEL': os.getenv("LLM_SMALL_MODEL", 'mistral-small-latest'),
+    'LARGE_MODEL': os.getenv("LLM_LARGE_MODEL", 'mistral-large-latest'),
+    'ROUTE_MAX_QUESTION_TOKENS': int(os.getenv("LLM_ROUTE_MAX_QUESTION_TOKENS", 48)),
+    'ROUTE_MAX_CONTEXT_TOKENS': int(os.getenv("LLM_ROUTE_MAX_CONTEXT_TOKENS", 2000)),
+    'ROUTE_MIN_TOP_SCORE': float(os.getenv("LLM_ROUTE_MIN_TOP_SCORE", 0.5)),
+    'ROUTE_FALLBACK': os.getenv("LLM_ROUTE_FALLBACK", 'True') == 'True',  # re-ask the large model when the small one says "I don't know"
+    # Cache of temperature-0 answers keyed by model + rendered prompt (table vectordb_llm_response_cache)
+    'RESPONSE_CACHE': os.getenv("LLM_RESPONSE_CACHE", 'True') == 'True',
+    'RESPONSE_CACHE_MAX_ENTRIES': int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", 50000)),
+    'RESPONSE_CACHE_L1_SIZE': int(os.getenv("LLM_RESPONSE_CACHE_L1_SIZE", 512)),
+    # Per-call deadline, one hedged retry after the model's recent p95 latency, and a circuit breaker
+    # that answers retrieval-only while a model keeps failing
+    'DEADLINE_SECONDS': float(os.getenv("LLM_DEADLINE_SECONDS", 30)),
+    'HEDGE': os.getenv("LLM_HEDGE", 'True') == 'True',
+    'HEDGE_PERCENTILE': float(os.getenv("LLM_HEDGE_PERCENTILE", 95)),
+    'HEDGE_MIN_DELAY_SECONDS': float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", 1.0)),
+    'BREAKER_FAILURE_THRESHOLD': int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5)),
+    'BREAKER_RESET_SECONDS': float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30)),
 }
 
 LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", 'true')
@@ -5,7 +5,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from .models import VectorDBTask, ModuleVectorStore, QueryLog, Question, Answer, Rating, ChatSession
+from .models import VectorDBTask, ModuleVectorStore, QueryLog, Question, Answer, Rating, ChatSession, LLMResponseCache
 
 @admin.register(VectorDBTask)
 class VectorDBTaskAdmin(admin.ModelAdmin):
@@ -314,9 +314,12 @@ class QuestionAdmin(admin.ModelAdmin):
 
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'text_short', 'created_at']
+    list_display = ['id', 'text_short', 'model_name', 'total_tokens', 'created_at']
     search_fields = ['text', 'question__text']
-    readonly_fields = ['id', 'text', 'question', 'created_at']
+    readonly_fields = [
+        'id', 'text', 'question', 'model_name', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+        'tokens_estimated', 'created_at'
+    ]
     ordering = ['-created_at']
     
     def text_short(self, obj):
@@ -340,3 +343,15 @@ class ChatSessionAdmin(admin.ModelAdmin):
     search_fields = ['title', 'session_id', 'user__username', 'module_vector_store__module__name']
     readonly_fields = ['id', 'title', 'session_id', 'module_vector_store', 'user', 'created_at']
     ordering = ['-created_at']
+
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ['key', 'model_name', 'collection_name', 'hit_count', 'last_used_at']
+    list_filter = ['model_name']
+    search_fields = ['key', 'collection_name']
+    readonly_fields = ['key', 'model_name', 'collection_name', 'response_text', 'hit_count', 'created_at', 'last_used_at']
+    ordering = ['-last_used_at']
+
+    def has_add_permission(self, request, obj=None):
+        return False
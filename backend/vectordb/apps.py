@@ -1,8 +1,20 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class VectordbConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vectordb'
     verbose_name = 'Vector Database'
-    
+
+    def ready(self):
+        from vectordb.cache import cache_is_shared
+        if not cache_is_shared():
+            logger.warning(
+                "No shared cache configured (REDIS_URL is unset): index versions fall back to the database, "
+                "but retrieval caching and request coalescing stay per process. Set REDIS_URL when running "
+                "Celery workers alongside the web process."
+            )
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+from vectordb.context_packer import ContextPacker, resolve_token_budget
+from vectordb.embeddings import get_embeddings
+from vectordb.executors import search_executor
+from vectordb.filters import build_where
+from vectordb.llm import get_rag_prompt
+from vectordb.model_router import ModelRouter, degraded_answer, resolve_routing
+from vectordb.models import ModuleVectorStore, QueryLog
+from vectordb.parent_store import ParentElementStore, resolve_parent_window
+from vectordb.resilience import LLMUnavailable
+from vectordb.retrieval import (
+    open_vector_store, similarity_search_with_scores, apply_score_cutoff,
+    resolve_score_threshold, resolve_score_gap, resolve_answer_min_score, has_relevant_context, NO_ANSWER
+)
+from vectordb.tokens import add_usage, empty_usage, usage_fields
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_batch_concurrency(override: int = None) -> int:
+    if override is not None:
+        return override
+    return getattr(settings, 'VECTOR_DB_CONFIG', {}).get('BATCH_LLM_CONCURRENCY', 8)
+
+
+class BatchQueryService:
+    """Answer many questions against one module in a single call.
+
+    Questions are embedded in one batched forward pass, searched concurrently on
+    the search pool and, if requested, answered with at most `max_concurrency`
+    LLM calls in flight.
+    """
+
+    def __init__(self, model_provider: str = "mistralai"):
+        self.model_provider = model_provider
+
+    def _search(self, vector_store: ModuleVectorStore, queries: List[str], k: int, where: dict = None,
+                similarity_threshold: float = None, parent_window: int = None) -> List[Any]:
+        """Top-k hits per query after the score cutoff and parent expansion; an exception per failed query"""
+        store = open_vector_store(
+            vector_store.collection_name,
+            vector_store.persistence_directory,
+            vector_store.embedding_model,
+            vector_store.config
+        )
+        threshold = resolve_score_threshold(vector_store.config, similarity_threshold)
+        score_gap = resolve_score_gap(vector_store.config)
+        window = resolve_parent_window(vector_store.config, parent_window)
+        parent_store = ParentElementStore(vector_store.collection_name, vector_store.persistence_directory)
+
+        def search_one(query):
+            try:
+                results = similarity_search_with_scores(store, vector_store.collection_name, query, k=k, filters=where)
+                results = apply_score_cutoff(results, threshold, score_gap)
+                return parent_store.expand(results, window)
+            except Exception as e:
+                logger.warning(f"Batch search failed for query {query[:50]!r}: {e}")
+                return e
+
+        # Searches below find their query vectors in the embedding cache
+        get_embeddings(vector_store.embedding_model).embed_queries(queries)
+        return list(search_executor.map(search_one, queries))
+
+    def _generate(self, vector_store: ModuleVectorStore, queries: List[str], hits: List[Any],
+                  max_concurrency: int) -> List[Any]:
+        """One routed LLM call per query with hits, at most `max_concurrency` per model at a time.
+
+        Queries are batched per chosen model; small-model answers that give up
+        are re-asked on the large model in a second batch.
+        """
+        no_context = {'answer': NO_ANSWER, 'model': None, 'route_reason': 'no relevant context'}
+        answers = [
+            results if isinstance(results, Exception) else dict(no_context, usage=empty_usage()) for results in hits
+        ]
+        # Queries whose retrieval found nothing relevant keep the canned answer without an LLM call
+        answer_min_score = resolve_answer_min_score(vector_store.config)
+        pending = [
+            i for i, results in enumerate(hits)
+            if not isinstance(results, Exception)
+            and has_relevant_context([score for _, score in results], answer_min_score)
+        ]
+        if not pending:
+            return answers
+
+        router = ModelRouter(
+            resolve_routing(vector_store.config), self.model_provider, 0.0, vector_store.collection_name
+        )
+        prompt = get_rag_prompt()
+        packer = ContextPacker(router.routing['large_model'], resolve_token_budget(vector_store.config))
+        messages, routes, contexts = {}, {}, {}
+        for i in pending:
+            scores = [score for _, score in hits[i]]
+            packed = packer.pack([doc for doc, _ in hits[i]], scores)
+            contexts[i] = packed["text"]
+            messages[i] = prompt.invoke({"question": queries[i], "context": packed["text"]})
+            routes[i] = router.choose(queries[i], scores, packed["token_count"])
+
+        def run_batch(indices, model, reason):
+            responses = router.batch(model, [messages[i] for i in indices], max_concurrency)
+            for i, (response, usage) in zip(indices, responses):
+                if isinstance(response, LLMUnavailable):
+                    # Keep a small-model answer whose fallback failed; otherwise answer retrieval-only
+                    if not answers[i].get('model'):
+                        answers[i] = {
+                            'answer': degraded_answer(contexts[i]), 'model': None,
+                            'route_reason': f"degraded after {reason(i)}", 'degraded': True, 'usage': empty_usage(),
+                        }
+                    continue
+                # A fallback's tokens add to those already spent on the small model
+                answers[i] = response if isinstance(response, Exception) else {
+                    'answer': response, 'model': model, 'route_reason': reason(i),
+                    'usage': add_usage(answers[i].get('usage'), usage),
+                }
+
+        for model in {model for model, _ in routes.values()}:
+            run_batch([i for i in pending if routes[i][0] == model], model, lambda i: routes[i][1])
+
+        retry = [
+            i for i in pending
+            if isinstance(answers[i], dict) and answers[i]['model']
+            and router.should_fall_back(answers[i]['model'], answers[i]['answer'], [score for _, score in hits[i]])
+        ]
+        if retry:
+            run_batch(retry, router.routing['large_model'], lambda i: f"fallback after {routes[i][1]}")
+        return answers
+
+    def run(self, module, queries: List[str], max_results: int = 5, similarity_threshold: float = None,
+            filters: dict = None, parent_window: int = None, generate: bool = True,
+            max_concurrency: int = None, user=None) -> Dict[str, Any]:
+        """Retrieve (and optionally answer) every query; failures are reported per query"""
+        vector_store = ModuleVectorStore.objects.get(module=module, status='ready')
+        start_time = time.time()
+
+        hits = self._search(
+            vector_store, queries, max_results, build_where(filters), similarity_threshold, parent_window
+        )
+        retrieval_time = int((time.time() - start_time) * 1000)
+
+        generation_start = time.time()
+        answers = (
+            self._generate(vector_store, queries, hits, resolve_batch_concurrency(max_concurrency))
+            if generate else [None] * len(queries)
+        )
+        generation_time = int((time.time() - generation_start) * 1000)
+
+        results, logs = [], []
+        for query, results_for_query, answer in zip(queries, hits, answers):
+            error = next((value for value in (results_for_query, answer) if isinstance(value, Exception)), None)
+            if error is not None:
+                results.append({'query': query, 'error': str(error)})
+                continue
+            sources = [
+                {'content': doc.page_content, 'metadata': doc.metadata, 'score': round(score, 4)}
+                for doc, score in results_for_query
+            ]
+            item = {'query': query, 'sources': sources}
+            if generate:
+                item.update(answer)
+                if user:
+                    logs.append(QueryLog(
+                        user=user,
+                        module=module,
+                        query_text=query,
+                        query_hash=hashlib.md5(query.encode()).hexdigest(),
+                        response_text=answer['answer'],
+                        retrieved_chunks=sources,
+                        similarity_scores=[source['score'] for source in sources],
+                        retrieval_time_ms=retrieval_time // len(queries),
+                        generation_time_ms=generation_time // len(queries),
+                        total_time_ms=(retrieval_time + generation_time) // len(queries),
+                        **usage_fields(answer),
+                    ))
+            results.append(item)
+
+        if logs:
+            QueryLog.objects.bulk_create(logs)
+
+        return {
+            'results': results,
+            'query_count': len(queries),
+            'failed_count': sum(1 for item in results if 'error' in item),
+            'usage': add_usage(*(item.get('usage') for item in results)),
+            'retrieval_time_ms': retrieval_time,
+            'generation_time_ms': generation_time,
+            'total_time_ms': int((time.time() - start_time) * 1000),
+            'metadata': {'module_id': module.id},
+        }
@@ -0,0 +1,93 @@
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Serves vectors computed up front so benchmarks time the index, not the model"""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+def export_chunks(store) -> dict:
+    """Read ids, texts, metadata and vectors back out of an opened vector store"""
+    from vectordb.hnsw_store import MmapVectorStore
+
+    if isinstance(store, MmapVectorStore):
+        return store.export()
+
+    data = store.get(include=['documents', 'metadatas', 'embeddings'])
+    return {
+        'ids': data['ids'],
+        'texts': data['documents'],
+        'metadatas': [metadata or {} for metadata in data['metadatas']],
+        'embeddings': np.asarray(data['embeddings'], dtype=np.float32),
+    }
+
+
+def sample_queries(texts: List[str], count: int, seed: int = 0, length: int = 200) -> List[str]:
+    """Use the opening of random chunks as stand-in queries"""
+    rng = random.Random(seed)
+    picked = rng.sample(texts, min(count, len(texts)))
+    return [text[:length] for text in picked]
+
+
+def exact_top_k(embeddings: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    """Ground-truth neighbours by brute-force cosine similarity, one row of indices per query"""
+    corpus = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    queries = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(similarities, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(retrieved: List[List[str]], expected: List[List[str]]) -> float:
+    """Mean fraction of the exact top-k found by the index"""
+    if not expected:
+        return 0.0
+    return float(np.mean([
+        len(set(got) & set(want)) / len(want) for got, want in zip(retrieved, expected) if want
+    ]))
+
+
+def time_queries(search, queries: List[str]) -> List[float]:
+    """Run search(query) for each query and return latencies in ms"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    if not latencies:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    values = np.asarray(latencies)
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+    }
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_KEY = "vectordb:index_version:{}"
+
+
+def normalise_query(query: str) -> str:
+    """Collapse whitespace and case so trivially different questions share a key"""
+    return re.sub(r"\s+", " ", query or "").strip().lower()
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU cache with optional per-entry expiry"""
+
+    def __init__(self, max_size: int = 1024, ttl: int = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: int = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """In-process L1 in front of the shared Django cache (Redis in deployment)"""
+
+    def __init__(self, namespace: str, l1_size: int = 1024, ttl: int = 3600):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = LocalLRUCache(max_size=l1_size, ttl=ttl)
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            value = shared_cache.get(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {self.namespace}: {e}")
+            return None
+
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        self.local.set(key, value)
+        try:
+            shared_cache.set(self._shared_key(key), value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {self.namespace}: {e}")
+
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared() -> bool:
+    """False when the default cache lives in each process, so Celery workers and web processes can't see each other's writes"""
+    return getattr(settings, 'CACHES', {}).get('default', {}).get('BACKEND') not in PROCESS_LOCAL_CACHES
+
+
+def get_index_version(collection_name: str) -> int:
+    """Current index version of a collection; bumped whenever its vectors change.
+
+    Without a shared cache the version is read from the database, so a bump made
+    by a Celery worker still reaches the web processes.
+    """
+    try:
+        if not cache_is_shared():
+            from vectordb.models import IndexVersion
+            return IndexVersion.objects.filter(collection_name=collection_name).values_list(
+                'version', flat=True
+            ).first() or 0
+        return shared_cache.get(INDEX_VERSION_KEY.format(collection_name)) or 0
+    except Exception as e:
+        logger.warning(f"Failed to read index version for {collection_name}: {e}")
+        return 0
+
+
+def bump_index_version(collection_name: str):
+    """Invalidate everything cached against the previous contents of a collection"""
+    if not cache_is_shared():
+        from django.db.models import F
+        from vectordb.models import IndexVersion
+        try:
+            IndexVersion.objects.get_or_create(collection_name=collection_name)
+            IndexVersion.objects.filter(collection_name=collection_name).update(version=F('version') + 1)
+            return get_index_version(collection_name)
+        except Exception as e:
+            logger.warning(f"Failed to bump index version for {collection_name}: {e}")
+            return None
+
+    key = INDEX_VERSION_KEY.format(collection_name)
+    try:
+        shared_cache.add(key, 0, None)
+        return shared_cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Failed to bump index version for {collection_name}: {e}")
+        return None
+
+
+class RetrievalCache:
+    """Caches vector search results as (chunk id, score) pairs"""
+
+    def __init__(self):
+        config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+        self.cache = TieredCache(
+            'vectordb:retrieval',
+            l1_size=config.get('RETRIEVAL_CACHE_L1_SIZE', 1024),
+            ttl=config.get('RETRIEVAL_CACHE_TTL', 3600),
+        )
+
+    @staticmethod
+    def make_key(collection_name: str, query: str, k: int, filters: dict = None) -> str:
+        """Key on (collection, index version, normalised query, k, filters)"""
+        payload = json.dumps(
+            [collection_name, get_index_version(collection_name), normalise_query(query), k, filters or {}],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        return self.cache.get(key)
+
+    def set(self, key: str, hits):
+        self.cache.set(key, [(doc_id, float(score)) for doc_id, score in hits])
+
+    def stats(self):
+        return self.cache.local.stats()
+
+
+retrieval_cache = RetrievalCache()
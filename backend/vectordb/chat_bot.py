@@ -1,3 +1,6 @@
+import inspect
+import json
+import logging
 import os
 import sys
 
@@ -9,43 +12,67 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sop_rag.settings')
 import django
 django.setup()
 
-from django.conf import settings
+from vectordb.llm import export_provider_environment
 
-os.environ['LANGCHAIN_TRACING_V2'] = settings.LANGCHAIN_TRACING_V2
-os.environ['LANGCHAIN_ENDPOINT'] = settings.LANGCHAIN_ENDPOINT
-os.environ['LANGCHAIN_API_KEY'] = settings.LANGCHAIN_API_KEY
-os.environ["MISTRAL_API_KEY"] = settings.MISTRAL_API_KEY
+# Keys may be unset when running against the offline fake providers
+export_provider_environment()
 
 from langchain_core.documents import Document
 from typing_extensions import List, TypedDict
-from langchain_chroma import Chroma
-from langchain.chat_models import init_chat_model
-from langgraph.graph import START, StateGraph
+from vectordb.llm import get_chat_model
+from langgraph.graph import END, START, StateGraph
 import threading
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.runnables import RunnableLambda
+from vectordb.embeddings import get_embeddings
 from langchain.retrievers.multi_vector import MultiVectorRetriever
 from langchain.storage import InMemoryStore
-from langchain import hub 
 from langchain.prompts.chat import ChatPromptTemplate
+from vectordb.context_packer import ContextPacker, resolve_token_budget
+from vectordb.parent_store import ParentElementStore, resolve_parent_window
+from vectordb.model_router import ModelRouter, resolve_routing
+from vectordb.single_flight import answer_flight, acoalesce_key, coalesce_key
+from vectordb.executors import run_in_search_pool
+from vectordb.chat_memory import CONDENSE_PROMPT, condense_enabled
+from vectordb.resilience import LLMUnavailable
+from vectordb.tokens import add_usage, empty_usage
+from vectordb.retrieval import (
+    open_vector_store, similarity_search_with_scores, apply_score_cutoff, resolve_score_threshold, resolve_score_gap,
+    resolve_answer_min_score, has_relevant_context, no_answer
+)
+
+logger = logging.getLogger(__name__)
 
 class State(TypedDict):
     question: str
+    search_query: str
+    condense_usage: dict
     context: List[Document]
-    previous_chat: List[dict]
+    previous_chat: str
+    scores: List[float]
+    closest: List[Document]
+    closest_scores: List[float]
+    score_threshold: float
+    answer_min_score: float
+    token_budget: int
+    filters: dict
+    parent_window: int
+    routing: dict
     answer: str
+    model: str
+    route_reason: str
+    cached: bool
+    degraded: bool
+    usage: dict
                                                                                         
 class CREATE_VECTOR_DB:
-    def __init__(self, model_name: str, model_provider: str, temperature: float):
-        self.llm = init_chat_model("mistral-large-latest", model_provider=model_provider, temperature=temperature)
+    def __init__(self, model_name: str, model_provider: str, temperature: float, routing: dict = None):
+        self.chat_model_name = (routing or resolve_routing())['large_model']
+        self.llm = get_chat_model(self.chat_model_name, model_provider, temperature)
 
-        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        self.embeddings = get_embeddings(model_name)
 
-    def load_model(self, collection_name, persist_directory):
-        self.vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory,
-        )
+    def load_model(self, collection_name, persist_directory, vector_store_config=None):
+        self.vector_store = open_vector_store(collection_name, persist_directory, self.embeddings.model_name, vector_store_config)
 
         return self.vector_store
     
@@ -57,17 +84,32 @@ class CREATE_VECTOR_DB:
         return doc_ids
 
 class Retrieval:
-    def __init__(self, collection_name: str, persist_directory: str, embedding_model_name: str = "all-MiniLM-L6-v2", model_provider: str = "mistralai", temperature: float = 0.0):
+    def __init__(self, collection_name: str, persist_directory: str, embedding_model_name: str = "all-MiniLM-L6-v2", model_provider: str = "mistralai", temperature: float = 0.0, k: int = 4, vector_store_config: dict = None):
+        self.collection_name = collection_name
+        self.k = k
+        # Module config overrides the global defaults for every retrieval and generation knob
+        self.score_threshold = resolve_score_threshold(vector_store_config)
+        self.score_gap = resolve_score_gap(vector_store_config)
+        self.answer_min_score = resolve_answer_min_score(vector_store_config)
+        self.routing = resolve_routing(vector_store_config)
         self.vector_store_db = CREATE_VECTOR_DB(
             model_name=embedding_model_name,
             model_provider=model_provider,
             temperature=temperature,
+            routing=self.routing,
         )
         self.vector_store = self.vector_store_db.load_model(
             collection_name=collection_name,
-            persist_directory=persist_directory
+            persist_directory=persist_directory,
+            vector_store_config=vector_store_config
         )
         self.llm = self.vector_store_db.llm_model()
+        self.chat_model_name = self.vector_store_db.chat_model_name
+        self.model_provider = model_provider
+        self.temperature = temperature
+        self.token_budget = resolve_token_budget(vector_store_config)
+        self.parent_store = ParentElementStore(collection_name, persist_directory)
+        self.parent_window = resolve_parent_window(vector_store_config)
         prompt_text = """Answer the question based on the context below and previous chat history.
             If the answer is not contained within the text below, say "I don't know".
 
@@ -82,60 +124,201 @@ class Retrieval:
             Answer:"""
                     
         self.prompt = ChatPromptTemplate.from_template(prompt_text)
+        self.condense_prompt = ChatPromptTemplate.from_template(CONDENSE_PROMPT)
+
+    def _condense_skipped(self, state: State) -> bool:
+        return not state.get("previous_chat") or not condense_enabled()
+
+    def _condensed(self, state: State, query: str, usage: dict) -> dict:
+        query = (query or "").strip() or state["question"]
+        if query != state["question"]:
+            logger.info(f"Condensed follow-up for search: {query!r}")
+        return {"search_query": query, "condense_usage": usage}
+
+    def condense(self, state: State):
+        """Rewrite a follow-up into a standalone search query with the small model.
+
+        Uses the rolling summary and recent turns (previous_chat). The answer
+        prompt still gets the original question and history; if the small
+        model is unavailable the question is searched as asked.
+        """
+        if self._condense_skipped(state):
+            return {"search_query": state["question"], "condense_usage": empty_usage()}
+        router = self.router(state)
+        messages = self.condense_prompt.invoke({"question": state["question"], "previous_chat": state["previous_chat"]})
+        try:
+            query, _, usage = router.complete(router.routing['small_model'], messages)
+        except LLMUnavailable as e:
+            logger.warning(f"Condensing skipped, searching the question as asked: {e}")
+            return {"search_query": state["question"], "condense_usage": empty_usage()}
+        return self._condensed(state, query, usage)
+
+    async def acondense(self, state: State):
+        if self._condense_skipped(state):
+            return {"search_query": state["question"], "condense_usage": empty_usage()}
+        router = self.router(state)
+        messages = self.condense_prompt.invoke({"question": state["question"], "previous_chat": state["previous_chat"]})
+        try:
+            query, _, usage = await router.acomplete(router.routing['small_model'], messages)
+        except LLMUnavailable as e:
+            logger.warning(f"Condensing skipped, searching the question as asked: {e}")
+            return {"search_query": state["question"], "condense_usage": empty_usage()}
+        return self._condensed(state, query, usage)
 
     def retrieve(self, state: State):
-        similarity_text = f"""
-        Previous Chat History: {state["previous_chat"]}
-        Question: {state["question"]}
-        Answer:
+        # Only the (condensed) question is embedded; history goes to the prompt, not the search
+        closest = similarity_search_with_scores(
+            self.vector_store, self.collection_name, state.get("search_query") or state["question"], k=self.k,
+            filters=state.get("filters")
+        )
+        score_threshold = state.get("score_threshold")
+        results = apply_score_cutoff(
+            closest,
+            self.score_threshold if score_threshold is None else score_threshold,
+            self.score_gap
+        )
+        parent_window = state.get("parent_window")
+        results = self.parent_store.expand(
+            results, self.parent_window if parent_window is None else parent_window
+        )
+        return {
+            "context": [doc for doc, _ in results],
+            "scores": [score for _, score in results],
+            "closest": [doc for doc, _ in closest],
+            "closest_scores": [score for _, score in closest]
+        }
+
+    def needs_llm(self, state: State) -> bool:
+        """False when retrieval found nothing relevant enough to answer from.
+
+        Follow-up turns always go to the LLM: they are often answered from the
+        chat history rather than from what the question alone retrieves.
         """
-        retrieved_docs = self.vector_store.similarity_search(similarity_text)
-        return {"context": retrieved_docs}
+        if state.get("previous_chat"):
+            return True
+        answer_min_score = state.get("answer_min_score")
+        return has_relevant_context(
+            state.get("scores"), self.answer_min_score if answer_min_score is None else answer_min_score
+        )
+
+    def no_answer(self, state: State):
+        return no_answer(list(zip(state.get("closest") or [], state.get("closest_scores") or [])))
 
+    def pack_context(self, state: State) -> dict:
+        packer = ContextPacker(self.chat_model_name, state.get("token_budget") or self.token_budget)
+        return packer.pack(state["context"], state.get("scores"))
+
+    def build_messages(self, state: State, packed: dict = None):
+        docs_content = (packed or self.pack_context(state))["text"]
+        return self.prompt.invoke({"question": state["question"], "context": docs_content, "previous_chat": state["previous_chat"]})
+
+    def router(self, state: State) -> ModelRouter:
+        return ModelRouter(
+            state.get("routing") or self.routing, self.model_provider, self.temperature, self.collection_name
+        )
+
+    async def aretrieve(self, state: State):
+        return await run_in_search_pool(self.retrieve, state)
 
     def generate(self, state: State):
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        messages = self.prompt.invoke({"question": state["question"], "context": docs_content, "previous_chat": state["previous_chat"]})
-        response = self.llm.invoke(messages)
-        return {"answer": response.content}
+        packed = self.pack_context(state)
+        result = self.router(state).invoke(
+            self.build_messages(state, packed), state["question"], state.get("scores"), packed["token_count"],
+            packed["text"]
+        )
+        # The condense call is part of this turn's cost
+        return dict(result, usage=add_usage(state.get("condense_usage"), result["usage"]))
+
+    async def agenerate(self, state: State):
+        packed = self.pack_context(state)
+        result = await self.router(state).ainvoke(
+            self.build_messages(state, packed), state["question"], state.get("scores"), packed["token_count"],
+            packed["text"]
+        )
+        return dict(result, usage=add_usage(state.get("condense_usage"), result["usage"]))
+
+    async def astream_generate(self, state: State, result: dict = None):
+        """Yield answer tokens as the LLM produces them.
+
+        The model is routed up front; there is no low-confidence fallback since
+        tokens have already been sent. `result`, when given, receives the model
+        and token usage once the stream ends.
+        """
+        packed = self.pack_context(state)
+        router = self.router(state)
+        model, _ = router.choose(state["question"], state.get("scores"), packed["token_count"])
+        usage = {}
+        async for token in router.astream(model, self.build_messages(state, packed), packed["text"], usage):
+            yield token
+        if result is not None:
+            result.update(model=model, usage=add_usage(state.get("condense_usage"), usage))
     
 class Graph:
-    def __init__(self, collection_name: str, persist_directory: str, embedding_model_name: str = "all-MiniLM-L6-v2", model_provider: str = "mistralai", temperature: float = 0.0):
+    def __init__(self, collection_name: str, persist_directory: str, embedding_model_name: str = "all-MiniLM-L6-v2", model_provider: str = "mistralai", temperature: float = 0.0, vector_store_config: dict = None):
         self.retrieval = Retrieval(
             collection_name=collection_name,
             persist_directory=persist_directory,
             embedding_model_name=embedding_model_name,
             model_provider=model_provider,
-            temperature=temperature
+            temperature=temperature,
+            vector_store_config=vector_store_config
         )
 
+    def condense(self, state: State):
+        return self.retrieval.condense(state)
+
     def retrieve(self, state: State):
         return self.retrieval.retrieve(state)
 
     def generate(self, state: State):
         return self.retrieval.generate(state)
-    
+
+    def route(self, state: State) -> str:
+        return "generate" if self.retrieval.needs_llm(state) else "no_answer"
+
     def graph_builder(self):
-        graph_builder = StateGraph(State).add_sequence([self.retrieve, self.generate])
-        graph_builder.add_edge(START, "retrieve")
+        # Each node has a sync and an async implementation so the graph serves invoke() and ainvoke()
+        graph_builder = StateGraph(State)
+        graph_builder.add_node("condense", RunnableLambda(self.condense, afunc=self.retrieval.acondense))
+        graph_builder.add_node("retrieve", RunnableLambda(self.retrieve, afunc=self.retrieval.aretrieve))
+        graph_builder.add_node("generate", RunnableLambda(self.generate, afunc=self.retrieval.agenerate))
+        # Nothing relevant retrieved: answer from retrieval alone and skip the LLM call
+        graph_builder.add_node("no_answer", self.retrieval.no_answer)
+        graph_builder.add_edge(START, "condense")
+        graph_builder.add_edge("condense", "retrieve")
+        graph_builder.add_conditional_edges("retrieve", self.route, ["generate", "no_answer"])
+        graph_builder.add_edge("generate", END)
+        graph_builder.add_edge("no_answer", END)
         graph = graph_builder.compile()
         return graph
 
 def singleton(cls):
-    """Singleton decorator"""
+    """One instance per collection and configuration.
+
+    The key covers everything the graph captures at construction (directory,
+    embedding model, vector store config), so a module re-configured or
+    re-indexed onto another backend gets a fresh graph; the instance built
+    for its old configuration is dropped.
+    """
     instances = {}
     lock = threading.Lock()
+    signature = inspect.signature(cls)
     
     def get_instance(*args, **kwargs):
-        # Create key from collection_name
-        key = kwargs.get('collection_name', args[0] if args else None)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        config = dict(bound.arguments)
+        collection_name = config.pop('collection_name')
+        key = (collection_name, json.dumps(config, sort_keys=True, default=str))
         
         with lock:
             if key not in instances:
-                print(f"🆕 Creating instance for: {key}")
+                print(f"🆕 Creating instance for: {collection_name}")
+                for stale in [other for other in instances if other[0] == collection_name]:
+                    del instances[stale]
                 instances[key] = cls(*args, **kwargs)
             else:
-                print(f"♻️  Reusing instance for: {key}")
+                print(f"♻️  Reusing instance for: {collection_name}")
         
         return instances[key]
     
@@ -146,29 +329,113 @@ class RUN_GRAPH:
     def __init__(self, collection_name: str, persist_directory: str, 
                  embedding_model_name: str = "all-MiniLM-L6-v2", 
                  model_provider: str = "mistralai", 
-                 temperature: float = 0.0):
+                 temperature: float = 0.0,
+                 vector_store_config: dict = None):
         
         print(f"🚀 Initializing graph for: {collection_name}")
         
         self.collection_name = collection_name
-        self.graph = Graph(
+        graph = Graph(
             collection_name=collection_name,
             persist_directory=persist_directory,
             embedding_model_name=embedding_model_name,
             model_provider=model_provider,
-            temperature=temperature
-        ).graph_builder()
+            temperature=temperature,
+            vector_store_config=vector_store_config
+        )
+        self.retrieval = graph.retrieval
+        self.graph = graph.graph_builder()
         
         print("✅ Graph initialized")
     
-    def run(self, question: str, previous_chat: List[dict] = []):
-        result = self.graph.invoke({
+    @staticmethod
+    def _flight_options(state: dict) -> dict:
+        return {key: value for key, value in state.items() if key not in ("question", "previous_chat")}
+
+    def _flight_key(self, state: dict) -> str:
+        return coalesce_key(self.collection_name, state["question"], state["previous_chat"], **self._flight_options(state))
+
+    async def _aflight_key(self, state: dict) -> str:
+        return await acoalesce_key(
+            self.collection_name, state["question"], state["previous_chat"], **self._flight_options(state)
+        )
+
+    def run(self, question: str, previous_chat: str = "", score_threshold: float = None,
+            token_budget: int = None, filters: dict = None, parent_window: int = None,
+            routing: dict = None, answer_min_score: float = None):
+        state = {
             "question": question,
-            "previous_chat": previous_chat
-        })
+            "previous_chat": previous_chat,
+            "score_threshold": score_threshold,
+            "token_budget": token_budget,
+            "filters": filters,
+            "parent_window": parent_window,
+            "routing": routing,
+            "answer_min_score": answer_min_score
+        }
+        # Identical concurrent turns (same question, history and options) share one graph run
+        result = answer_flight.do(self._flight_key(state), lambda: self.graph.invoke(state))
         print(f"Answer: {result['answer']}")
         return result
 
+    async def arun(self, question: str, previous_chat: str = "", score_threshold: float = None,
+                   token_budget: int = None, filters: dict = None, parent_window: int = None,
+                   routing: dict = None, answer_min_score: float = None):
+        state = {
+            "question": question,
+            "previous_chat": previous_chat,
+            "score_threshold": score_threshold,
+            "token_budget": token_budget,
+            "filters": filters,
+            "parent_window": parent_window,
+            "routing": routing,
+            "answer_min_score": answer_min_score
+        }
+        return await answer_flight.ado(await self._aflight_key(state), lambda: self.graph.ainvoke(state))
+
+    async def astream(self, question: str, previous_chat: str = "", score_threshold: float = None,
+                      token_budget: int = None, filters: dict = None, parent_window: int = None,
+                      routing: dict = None, answer_min_score: float = None):
+        """Run the same pipeline incrementally, yielding (event, data) pairs.
+
+        Retrieval results are emitted as soon as the search finishes, followed by
+        one event per generated token and a final "usage" event with the model
+        and token counts.
+        """
+        state = {
+            "question": question,
+            "previous_chat": previous_chat,
+            "score_threshold": score_threshold,
+            "token_budget": token_budget,
+            "filters": filters,
+            "parent_window": parent_window,
+            "routing": routing,
+            "answer_min_score": answer_min_score
+        }
+        state.update(await self.retrieval.acondense(state))
+        state.update(await self.retrieval.aretrieve(state))
+        retrieval_only = not self.retrieval.needs_llm(state)
+        if retrieval_only:
+            state.update(self.retrieval.no_answer(state))
+        yield "sources", [
+            {
+                "content": doc.page_content[:500],
+                "metadata": doc.metadata,
+                "score": round(score, 4)
+            }
+            for doc, score in zip(state["context"], state["scores"])
+        ]
+
+        if retrieval_only:
+            yield "token", state["answer"]
+            yield "usage", {"model": None, "usage": state["usage"]}
+            return
+
+        generated = {}
+        async for token in self.retrieval.astream_generate(state, generated):
+            yield "token", token
+        yield "usage", generated
+
 
 if __name__ == "__main__":
     persist_directory = "/media/mohit/storage/projects/SOP_RAG/backend/vector_data/project_1/"
@@ -180,5 +447,5 @@ if __name__ == "__main__":
         model_provider="mistralai",
         temperature=0.0
     )
-    run_graph.run(question="How we are parsisg large xml files?", previous_chat=[])
+    run_graph.run(question="How we are parsisg large xml files?", previous_chat="")
 
@@ -0,0 +1,130 @@
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from celery.result import AsyncResult
+
+from vectordb.chat_memory import append_turn, format_memory, seed_memory
+from vectordb.context_packer import resolve_token_budget
+from vectordb.models import Answer, Question
+from vectordb.model_router import resolve_routing
+from vectordb.parent_store import resolve_parent_window
+from vectordb.retrieval import resolve_answer_min_score, resolve_score_threshold
+from vectordb.tokens import usage_fields
+
+logger = logging.getLogger(__name__)
+
+# Celery states after which a job will not change any more
+FINISHED_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+
+def _graph_for(module_vector_store):
+    from vectordb.chat_bot import RUN_GRAPH
+
+    return RUN_GRAPH(
+        collection_name=module_vector_store.collection_name,
+        persist_directory=module_vector_store.persistence_directory,
+        embedding_model_name=module_vector_store.embedding_model,
+        model_provider="mistralai",
+        temperature=0.0,
+        vector_store_config=module_vector_store.config
+    )
+
+
+def _run_options(module_vector_store, question: Question, previous_chat: str, filters: dict = None) -> dict:
+    config = module_vector_store.config
+    return {
+        'question': question.text,
+        'previous_chat': previous_chat,
+        'score_threshold': resolve_score_threshold(config),
+        'token_budget': resolve_token_budget(config),
+        'filters': filters,
+        'parent_window': resolve_parent_window(config),
+        'routing': resolve_routing(config),
+        'answer_min_score': resolve_answer_min_score(config),
+    }
+
+
+def _save_answer(question: Question, result: dict, processing_time: float) -> dict:
+    answer = Answer.objects.create(
+        question=question,
+        text=result['answer'],
+        created_by=question.created_by,
+        time_required=processing_time,
+        **usage_fields(result)
+    )
+    append_turn(question.chat_session, question.text, result['answer'])
+    logger.info(
+        f"Answered question {question.id} in session {question.chat_session.session_id} in {processing_time:.3f}s"
+    )
+    return answer_payload(answer, result)
+
+
+def answer_question(question: Question, filters: dict = None) -> dict:
+    """Run retrieval and generation for a stored question, save its Answer and return the chat response.
+
+    Shared by the synchronous chat view and the chat job task, so both read
+    the session memory at answer time and record the same fields.
+    """
+    session = question.chat_session
+    module_vector_store = question.module_vector_store
+    seed_memory(session)
+    previous_chat = format_memory(session)
+
+    start_time = time.time()
+    rag_service = _graph_for(module_vector_store)
+    result = rag_service.run(**_run_options(module_vector_store, question, previous_chat, filters))
+    return _save_answer(question, result, time.time() - start_time)
+
+
+async def aanswer_question(question: Question, filters: dict = None) -> dict:
+    """Async variant of answer_question() for the ASGI chat view; generation runs on the event loop"""
+    from vectordb.executors import run_in_search_pool
+
+    def load_memory():
+        seed_memory(question.chat_session)
+        return question.module_vector_store, format_memory(question.chat_session)
+
+    module_vector_store, previous_chat = await sync_to_async(load_memory)()
+
+    start_time = time.time()
+    # First use per collection loads models and opens the store; keep it off the event loop
+    rag_service = await run_in_search_pool(_graph_for, module_vector_store)
+    result = await rag_service.arun(**_run_options(module_vector_store, question, previous_chat, filters))
+    return await sync_to_async(_save_answer)(question, result, time.time() - start_time)
+
+
+def answer_payload(answer: Answer, result: dict = None) -> dict:
+    """Chat response body for a saved answer; `result` adds the routing details of a fresh run"""
+    result = result or {}
+    return {
+        "question": answer.question.text,
+        "answer": answer.text,
+        "processing_time": round(answer.time_required, 3),
+        "session_id": answer.question.chat_session.session_id,
+        "answer_id": str(answer.id),
+        "model": result.get('model', answer.model_name or None),
+        "degraded": bool(result.get('degraded')),
+        "usage": result.get('usage') or {
+            'input_tokens': answer.prompt_tokens,
+            'output_tokens': answer.completion_tokens,
+            'total_tokens': answer.total_tokens,
+            'estimated': answer.tokens_estimated,
+        }
+    }
+
+
+def job_status(question: Question) -> dict:
+    """Where a chat job stands; the saved Answer wins over the Celery state, which may have expired"""
+    answer = question.answers.order_by('-created_at').first()
+    if answer is not None:
+        return {"job_id": question.job_id, "status": "SUCCESS", "result": answer_payload(answer)}
+
+    celery_result = AsyncResult(question.job_id)
+    state = celery_result.state
+    data = {"job_id": question.job_id, "status": state}
+    if state == 'FAILURE':
+        data["error"] = str(celery_result.result)
+    elif state == 'PROGRESS' and isinstance(celery_result.info, dict):
+        data["step"] = celery_result.info.get('step')
+    return data
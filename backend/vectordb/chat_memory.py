@@ -0,0 +1,109 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChatSession, Answer
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a compact memory of a conversation about SOP documentation.
+Update the summary with the new turns below. Keep commands, names, decisions and open questions.
+Be brief. Just return the updated summary.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+"""
+
+
+CONDENSE_PROMPT = """Rewrite the follow-up question as a standalone question that can be understood
+without the conversation: resolve pronouns and references to earlier turns, keep every name and term.
+If it is already standalone, return it unchanged. Just return the question.
+
+Conversation:
+{previous_chat}
+
+Follow-up question: {question}
+
+Standalone question:"""
+
+
+def condense_enabled() -> bool:
+    return getattr(settings, 'VECTOR_DB_CONFIG', {}).get('CONDENSE_QUESTION', True)
+
+
+def recent_turns_limit() -> int:
+    return getattr(settings, 'VECTOR_DB_CONFIG', {}).get('CHAT_MEMORY_RECENT_TURNS', 4)
+
+
+def format_turns(turns) -> str:
+    return "\n\n".join(f"User: {turn['question']}\nAssistant: {turn['answer']}" for turn in turns)
+
+
+def format_memory(session: ChatSession) -> str:
+    """Render the session memory for the prompt: summary first, then recent turns verbatim"""
+    parts = []
+    if session.memory_summary:
+        parts.append(f"Summary of earlier conversation:\n{session.memory_summary}")
+    if session.recent_turns:
+        parts.append(format_turns(session.recent_turns))
+    return "\n\n".join(parts)
+
+
+def seed_memory(session: ChatSession):
+    """Populate memory for sessions that predate it from their latest answers"""
+    if session.recent_turns or session.summarized_turns or session.memory_summary:
+        return
+    answers = Answer.objects.select_related('question').filter(
+        question__chat_session=session
+    ).order_by('-created_at')[:recent_turns_limit()]
+    turns = [{"question": ans.question.text, "answer": ans.text} for ans in reversed(answers)]
+    if turns:
+        session.recent_turns = turns
+        session.save(update_fields=['recent_turns'])
+
+
+def append_turn(session: ChatSession, question: str, answer: str):
+    """Append a turn and schedule background summarisation once the window overflows"""
+    with transaction.atomic():
+        locked = ChatSession.objects.select_for_update().get(pk=session.pk)
+        locked.recent_turns = (locked.recent_turns or []) + [{"question": question, "answer": answer}]
+        locked.save(update_fields=['recent_turns', 'updated_at'])
+
+    session.recent_turns = locked.recent_turns
+    if len(locked.recent_turns) > recent_turns_limit():
+        from .tasks import summarize_chat_session_task
+        summarize_chat_session_task.delay(str(session.pk))
+
+
+def fold_overflow(session_id, llm) -> bool:
+    """Summarise turns that fell out of the recent window into the session summary.
+
+    The LLM call happens outside the row lock; the result is only applied if no
+    other summariser has folded turns in the meantime.
+    """
+    session = ChatSession.objects.get(pk=session_id)
+    limit = recent_turns_limit()
+    overflow = (session.recent_turns or [])[:-limit] if limit else list(session.recent_turns or [])
+    if not overflow:
+        return False
+
+    response = llm.invoke(SUMMARY_PROMPT.format(
+        summary=session.memory_summary or "(empty)",
+        turns=format_turns(overflow)
+    ))
+    summary = response.content if hasattr(response, 'content') else str(response)
+
+    with transaction.atomic():
+        locked = ChatSession.objects.select_for_update().get(pk=session_id)
+        if locked.summarized_turns != session.summarized_turns:
+            logger.info(f"Chat session {session_id} was summarised concurrently, skipping")
+            return False
+        locked.memory_summary = summary.strip()
+        locked.recent_turns = locked.recent_turns[len(overflow):]
+        locked.summarized_turns += len(overflow)
+        locked.save(update_fields=['memory_summary', 'recent_turns', 'summarized_turns'])
+    return True
@@ -0,0 +1,106 @@
+import re
+from typing import List
+
+from django.conf import settings
+from langchain_core.documents import Document
+
+from vectordb.tokens import count_tokens, truncate_to_tokens
+
+SEPARATOR = "\n\n"
+SHINGLE_SIZE = 5
+
+
+def resolve_token_budget(module_config: dict = None) -> int:
+    default = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('CONTEXT_TOKEN_BUDGET', 3000)
+    return (module_config or {}).get('context_token_budget', default)
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def _shingles(text: str) -> set:
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _span(doc: Document):
+    """(document_id, first, last) element span of a chunk or expanded passage, None when unknown"""
+    document_id = doc.metadata.get('document_id')
+    element_range = doc.metadata.get('element_range')
+    if element_range:
+        return document_id, element_range[0], element_range[-1]
+    element_index = doc.metadata.get('element_index')
+    if document_id is None or element_index is None:
+        return None
+    return document_id, element_index, element_index
+
+
+class ContextPacker:
+    """Packs retrieved chunks into the generation prompt under a token budget"""
+
+    def __init__(self, model_name: str = None, token_budget: int = 3000, overlap_ratio: float = None):
+        self.model_name = model_name
+        self.token_budget = token_budget
+        if overlap_ratio is None:
+            overlap_ratio = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('CONTEXT_OVERLAP_RATIO', 0.6)
+        self.overlap_ratio = overlap_ratio
+        self.separator_tokens = count_tokens(SEPARATOR, model_name)
+
+    def _covered(self, doc: Document, text: str, shingles: set, kept: List[tuple]) -> bool:
+        """True when a better chunk already carries this one: same id, an enclosing element span, or mostly the same text"""
+        span = _span(doc)
+        for kept_doc, kept_text, kept_shingles in kept:
+            if doc.id and doc.id == kept_doc.id:
+                return True
+            kept_span = _span(kept_doc)
+            # Only expanded passages hold whole elements; two chunks of one element can differ
+            if span and kept_span and 'element_range' in kept_doc.metadata and span[0] == kept_span[0] \
+                    and kept_span[1] <= span[1] and span[2] <= kept_span[2]:
+                return True
+            if text in kept_text or len(shingles & kept_shingles) >= self.overlap_ratio * len(shingles):
+                return True
+        return False
+
+    def select(self, docs: List[Document], scores: List[float] = None) -> List[Document]:
+        """Order by relevance and drop chunks that mostly repeat a better one"""
+        if scores and len(scores) == len(docs):
+            ranked = [doc for doc, _ in sorted(zip(docs, scores), key=lambda hit: hit[1], reverse=True)]
+        else:
+            ranked = list(docs)
+
+        selected, kept = [], []
+        for doc in ranked:
+            text = _normalise(doc.page_content)
+            if not text:
+                continue
+            shingles = _shingles(text)
+            if self._covered(doc, text, shingles, kept):
+                continue
+            selected.append(doc)
+            kept.append((doc, text, shingles))
+        return selected
+
+    def pack(self, docs: List[Document], scores: List[float] = None) -> dict:
+        """Return the packed context text plus what went into it"""
+        parts, used, included = [], 0, []
+        for doc in self.select(docs, scores):
+            cost = count_tokens(doc.page_content, self.model_name) + (self.separator_tokens if parts else 0)
+            if used + cost <= self.token_budget:
+                parts.append(doc.page_content)
+                used += cost
+                included.append(doc)
+            elif not parts:
+                # Never send an empty context because the best chunk alone is too large
+                parts.append(truncate_to_tokens(doc.page_content, self.token_budget, self.model_name))
+                used = self.token_budget
+                included.append(doc)
+                break
+
+        return {
+            'text': SEPARATOR.join(parts),
+            'documents': included,
+            'token_count': used,
+        }
@@ -7,27 +7,28 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sop_rag.settings')
 import django
 django.setup()
 
-from django.conf import settings
+from vectordb.llm import export_provider_environment
 
-os.environ['LANGCHAIN_TRACING_V2'] = settings.LANGCHAIN_TRACING_V2
-os.environ['LANGCHAIN_ENDPOINT'] = settings.LANGCHAIN_ENDPOINT
-os.environ['LANGCHAIN_API_KEY'] = settings.LANGCHAIN_API_KEY
-os.environ["MISTRAL_API_KEY"] = settings.MISTRAL_API_KEY
+# Keys may be unset when running against the offline fake providers
+export_provider_environment()
 
 import uuid
+from functools import cached_property
 
 from unstructured.partition.pdf import partition_pdf
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.chat_models import init_chat_model
+from vectordb.retrieval import open_vector_store
+from vectordb.filters import element_metadata
+from vectordb.parent_store import ParentElementStore
+from vectordb.llm import get_chat_model
+from vectordb.tokens import count_tokens_many
 from langchain.schema.document import Document
-from langchain_chroma import Chroma
 from langchain.retrievers.multi_vector import MultiVectorRetriever
 from langchain.storage import InMemoryStore
 
 
-llm = init_chat_model("mistral-small-latest", model_provider="mistralai", temperature=0.0)
+SUMMARY_MODEL = "mistral-small-latest"
 
 class Summarize:
     def __init__(self, file_path):
@@ -46,7 +47,7 @@ class TextSummarize(Summarize):
     
     def summarize_chain(self):
         """Create the summarization chain for text"""
-        chain = self.prompt | llm | StrOutputParser()
+        chain = self.prompt | get_chat_model(SUMMARY_MODEL) | StrOutputParser()
         return chain
     
     def batch_summarize(self, chunks, concurrency: int = 1):
@@ -113,7 +114,7 @@ class ImageSummarize(Summarize):
                     return x.metadata['image_base64']
             return ""
         
-        chain = {"image": get_image_base64} | self.prompt | llm | StrOutputParser()
+        chain = {"image": get_image_base64} | self.prompt | get_chat_model(SUMMARY_MODEL) | StrOutputParser()
         return chain
     
     def batch_summarize(self, chunks, concurrency: int = 1):
@@ -169,12 +170,10 @@ Text:
         self.id_key = "doc_id"
         self.store = InMemoryStore()
     
-    def load_vector_store(self, collection_name, persist_directory, embedding_model_name="all-MiniLM-L6-v2"):
-        self.vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=HuggingFaceEmbeddings(model_name=embedding_model_name),
-            persist_directory=persist_directory,
-        )
+    def load_vector_store(self, collection_name, persist_directory, embedding_model_name="all-MiniLM-L6-v2", vector_store_config=None):
+        self.embedding_model_name = embedding_model_name
+        self.vector_store = open_vector_store(collection_name, persist_directory, embedding_model_name, vector_store_config)
+        self.parent_store = ParentElementStore(collection_name, persist_directory)
         self.retriever = MultiVectorRetriever(
             vectorstore=self.vector_store,
             docstore=self.store,
@@ -208,93 +207,98 @@ Text:
             print(f"✅ Text summaries: {len(text_summaries)}")
             return text_summaries
     
-    def create_vector_store(self):
-        """Create vector store with optimized batching"""
+    def _collect(self, chunks, indices, summaries, summary_docs, doc_ids, stored_chunks):
+        """Wrap summaries as documents carrying doc_id plus filterable metadata"""
+        for summary, chunk, index in zip(self.summarize(chunks), chunks, indices):
+            doc_id = str(uuid.uuid4())
+            summaries.append(summary)
+            metadata = element_metadata(chunk, index, self.document_metadata)
+            metadata[self.id_key] = doc_id
+            summary_docs.append(Document(page_content=summary, metadata=metadata))
+            # Keep the element itself so retrieval can answer with it instead of the summary
+            self.parents.append({
+                'element_index': index,
+                'element_type': metadata['element_type'],
+                'page_number': metadata.get('page_number'),
+                'text': getattr(chunk, 'text', None) or summary,
+            })
+            doc_ids.append(doc_id)
+            stored_chunks.append(chunk)
+
+    def _report(self, progress, stage, summaries):
+        if progress:
+            progress(stage=stage, pages=self.page_count, chunks_done=len(summaries), chunks_total=len(self.chunks))
+
+    @cached_property
+    def page_count(self) -> int:
+        pages = {getattr(getattr(chunk, 'metadata', None), 'page_number', None) for chunk in self.chunks}
+        return len(pages - {None})
+
+    def create_vector_store(self, document_metadata: dict = None, progress=None):
+        """Create vector store with optimized batching; `progress(**detail)` is told about each batch"""
+        self.document_metadata = document_metadata or {}
+        self.parents = []
         summaries = []
         summary_docs = []
         txt_chunks = []
+        txt_indices = []
         doc_ids = []
+        stored_chunks = []
         
         BATCH_SIZE = 20  # Reduced to avoid rate limits
         total_chunks = len(self.chunks)
         
         print(f"📊 Total chunks to process: {total_chunks}")
         print(f"📦 Batch size: {BATCH_SIZE} chunks per API call")
+        self._report(progress, 'summarizing', summaries)
         
         for i, chunk in enumerate(self.chunks):
             if "Image" in str(type(chunk)):
                 # Process accumulated text first
                 if txt_chunks:
                     print(f"🔄 Processing batch of {len(txt_chunks)} text chunks...")
-                    text_summaries = self.summarize(txt_chunks)
-                    
-                    for summary in text_summaries:
-                        doc_id = str(uuid.uuid4())
-                        summaries.append(summary)
-                        summary_docs.append(Document(
-                            page_content=summary,
-                            metadata={self.id_key: doc_id}
-                        ))
-                        doc_ids.append(doc_id)
+                    self._collect(txt_chunks, txt_indices, summaries, summary_docs, doc_ids, stored_chunks)
                     
                     txt_chunks = []
+                    txt_indices = []
                     import gc; gc.collect()
                     # time.sleep(20)
                 
                 # Process image
                 print(f"🖼️  Processing image chunk {i+1}/{total_chunks}")
-                image_summaries = self.summarize([chunk])
-                for summary in image_summaries:
-                    doc_id = str(uuid.uuid4())
-                    summaries.append(summary)
-                    summary_docs.append(Document(
-                        page_content=summary,
-                        metadata={self.id_key: doc_id}
-                    ))
-                    doc_ids.append(doc_id)
+                self._collect([chunk], [i], summaries, summary_docs, doc_ids, stored_chunks)
+                self._report(progress, 'summarizing', summaries)
                 # time.sleep(20)
             
             else:
                 txt_chunks.append(chunk)
+                txt_indices.append(i)
                 
                 if len(txt_chunks) >= BATCH_SIZE:
                     print(f"🔄 Processing batch at chunk {i+1}/{total_chunks}")
-                    text_summaries = self.summarize(txt_chunks)
-                    
-                    for summary in text_summaries:
-                        doc_id = str(uuid.uuid4())
-                        summaries.append(summary)
-                        summary_docs.append(Document(
-                            page_content=summary,
-                            metadata={self.id_key: doc_id}
-                        ))
-                        doc_ids.append(doc_id)
+                    self._collect(txt_chunks, txt_indices, summaries, summary_docs, doc_ids, stored_chunks)
+                    self._report(progress, 'summarizing', summaries)
                     
                     print(f"✅ Progress: {((i+1)/total_chunks)*100:.1f}%")
                     txt_chunks = []
+                    txt_indices = []
                     import gc; gc.collect()
                     # time.sleep(20)
         
         # Process remaining
         if txt_chunks:
             print(f"🔄 Processing final batch of {len(txt_chunks)} chunks...")
-            text_summaries = self.summarize(txt_chunks)
-            
-            for summary in text_summaries:
-                doc_id = str(uuid.uuid4())
-                summaries.append(summary)
-                summary_docs.append(Document(
-                    page_content=summary,
-                    metadata={self.id_key: doc_id}
-                ))
-                doc_ids.append(doc_id)
+            self._collect(txt_chunks, txt_indices, summaries, summary_docs, doc_ids, stored_chunks)
         
         print(f"\n✅ Summarization complete! Generated {len(summaries)} summaries")
         
         # Store in vector database
         print("💾 Storing in vector database...")
+        self._report(progress, 'embedding', summaries)
         self.retriever.vectorstore.add_documents(summary_docs)
-        self.retriever.docstore.mset(list(zip(doc_ids, self.chunks)))
+        self.retriever.docstore.mset(list(zip(doc_ids, stored_chunks)))
+        if 'document_id' in self.document_metadata:
+            self.parent_store.save_document(self.document_metadata['document_id'], self.parents)
         print("✅ Vector store creation complete!")
         
         return {
@@ -302,10 +306,11 @@ Text:
             "total_summaries": len(summaries),
             "summaries": summaries,
             "chunk_count": total_chunks,
-            "token_count": sum(len(str(s).split()) for s in summaries)
+            # Counted with the embedding model's tokenizer, i.e. what was actually embedded
+            "token_count": count_tokens_many([doc.page_content for doc in summary_docs], self.embedding_model_name)
         }
 
-def main_create_vector_db(file_path, model_name, collection_name, persist_directory):
+def main_create_vector_db(file_path, model_name, collection_name, persist_directory, document_metadata=None):
     print("Creating vector store...")
     print(f"File path: {file_path}")
     create_vector_store = CreateVectorStore(file_path)
@@ -314,4 +319,4 @@ def main_create_vector_db(file_path, model_name, collection_name, persist_direct
         persist_directory=persist_directory,
         embedding_model_name=model_name
     )
-    return create_vector_store.create_vector_store()
+    return create_vector_store.create_vector_store(document_metadata)
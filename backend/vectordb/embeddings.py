@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import threading
+from typing import List
+
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+from vectordb.cache import LocalLRUCache
+
+logger = logging.getLogger(__name__)
+
+query_embedding_cache = LocalLRUCache(
+    max_size=getattr(settings, 'VECTOR_DB_CONFIG', {}).get('QUERY_EMBEDDING_CACHE_SIZE', 4096)
+)
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that memoises query vectors in a process-wide LRU"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def _key(self, text: str):
+        return (self.model_name, hashlib.sha256(text.encode()).hexdigest())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = query_embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            query_embedding_cache.set(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one forward pass and prime the cache for embed_query.
+
+        Only texts missing from the cache are encoded.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = [query_embedding_cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for i, text in enumerate(texts):
+                if vectors[i] is None:
+                    vectors[i] = encoded[text]
+                    query_embedding_cache.set(keys[i], vectors[i])
+        return vectors
+
+
+def _load_embeddings(model_name: str) -> Embeddings:
+    """HuggingFace model, or hash-based vectors when EMBEDDINGS_BACKEND is 'hash' (offline load tests)"""
+    config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+    if config.get('EMBEDDINGS_BACKEND') == 'hash':
+        from vectordb.fake_providers import HashEmbeddings
+        return HashEmbeddings(
+            dimension=config.get('EMBEDDING_DIMENSION', 384),
+            latency_ms=config.get('FAKE_EMBEDDING_LATENCY_MS', 0),
+        )
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def get_embeddings(model_name: str) -> CachedQueryEmbeddings:
+    """Return the process-wide embeddings instance for a model, loading it once"""
+    with _embeddings_lock:
+        if model_name not in _embeddings:
+            logger.info(f"Loading embeddings model: {model_name}")
+            _embeddings[model_name] = CachedQueryEmbeddings(_load_embeddings(model_name), model_name)
+        return _embeddings[model_name]
+
+
+def query_embedding_cache_stats():
+    return query_embedding_cache.stats()
@@ -0,0 +1,29 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Bounded pool for CPU-bound work (query embedding, vector search, model loading)
+# so async views never run it on the event loop or spawn unbounded threads.
+search_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'VECTOR_DB_CONFIG', {}).get('SEARCH_THREADS', 4),
+    thread_name_prefix='vectordb-search',
+)
+
+# Separate pool for project-wide fan-out so one wide query cannot starve single-module searches
+fanout_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'VECTOR_DB_CONFIG', {}).get('PROJECT_SEARCH_THREADS', 8),
+    thread_name_prefix='vectordb-fanout',
+)
+
+# LLM calls made under a deadline (see resilience.py); abandoned attempts finish here, not on request threads
+llm_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'LLM_CONFIG', {}).get('MAX_CONNECTIONS', 20),
+    thread_name_prefix='llm-call',
+)
+
+
+async def run_in_search_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+WORD = re.compile(r"\w+")
+
+
+class LatencySampler:
+    """Draws delays in seconds around a median; seeded so runs are reproducible"""
+
+    def __init__(self, median_ms: float = 0, distribution: str = 'lognormal', sigma: float = 0.5, seed: int = 0):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.median_ms = median_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == 'fixed':
+                delay_ms = self.median_ms
+            elif self.distribution == 'uniform':
+                delay_ms = self._random.uniform(0, 2 * self.median_ms)
+            else:
+                delay_ms = self._random.lognormvariate(math.log(self.median_ms), self.sigma)
+        return delay_ms / 1000
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model for load tests: no API key or network, same prompt gives the same answer.
+
+    Latency is simulated from a configurable distribution so measurements
+    separate this service's overhead from provider time.
+    """
+
+    model_name: str = "fake"
+    answer_tokens: int = 64
+    latency_ms: float = 0
+    latency_distribution: str = 'lognormal'
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 0
+    seed: int = 0
+
+    _sampler: LatencySampler = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._sampler = LatencySampler(self.latency_ms, self.latency_distribution, self.latency_sigma, self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-deterministic"
+
+    def _answer(self, messages: List[BaseMessage]) -> List[str]:
+        """Words drawn from the prompt with a RNG seeded by its hash"""
+        prompt = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        digest = hashlib.sha256(f"{self.model_name}\n{prompt}".encode()).digest()
+        words = WORD.findall(" ".join(str(message.content) for message in messages)) or ["answer"]
+        rng = random.Random(digest)
+        return [rng.choice(words) for _ in range(self.answer_tokens)]
+
+    def _message(self, messages: List[BaseMessage], words: List[str]) -> AIMessage:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        return AIMessage(
+            content=" ".join(words),
+            usage_metadata={
+                'input_tokens': input_tokens,
+                'output_tokens': len(words),
+                'total_tokens': input_tokens + len(words),
+            },
+            response_metadata={'model_name': self.model_name},
+        )
+
+    def _chunk(self, messages: List[BaseMessage], words: List[str], i: int) -> ChatGenerationChunk:
+        # Like the real providers, usage arrives with the last chunk of a stream
+        usage = self._message(messages, words).usage_metadata if i == len(words) - 1 else None
+        return ChatGenerationChunk(
+            message=AIMessageChunk(content=words[i] if i == 0 else f" {words[i]}", usage_metadata=usage)
+        )
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        words = self._answer(messages)
+        time.sleep(self._sampler.sample() + self._token_delay() * len(words))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, words))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        words = self._answer(messages)
+        await asyncio.sleep(self._sampler.sample() + self._token_delay() * len(words))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, words))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # The sampled latency is time to first token; tokens_per_second paces the rest
+        time.sleep(self._sampler.sample())
+        words = self._answer(messages)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self._token_delay())
+            yield self._chunk(messages, words, i)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._sampler.sample())
+        words = self._answer(messages)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self._token_delay())
+            yield self._chunk(messages, words, i)
+
+
+class HashEmbeddings(Embeddings):
+    """Feature-hashed bag of words: no model, deterministic, and texts sharing words stay close"""
+
+    def __init__(self, dimension: int = 384, latency_ms: float = 0, latency_distribution: str = 'fixed',
+                 seed: int = 0):
+        self.dimension = dimension
+        self.sampler = LatencySampler(latency_ms, latency_distribution, seed=seed)
+
+    def _hash(self, token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'little')
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in WORD.findall((text or "").lower()) or [text or ""]:
+            value = self._hash(token)
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # One simulated forward pass per call, like a batched encoder
+        time.sleep(self.sampler.sample())
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
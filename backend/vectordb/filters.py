@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Optional
+
+ELEMENT_TYPES = ('text', 'table', 'image')
+
+
+def to_timestamp(value: datetime) -> int:
+    """Chroma only compares numbers, so dates are stored as epoch seconds"""
+    return int(value.timestamp())
+
+
+def element_type_of(element) -> str:
+    """Map an unstructured element (or chunk of elements) to text/table/image"""
+    type_name = type(element).__name__
+    if "Image" in type_name:
+        return 'image'
+    if "Table" in type_name:
+        return 'table'
+    return 'text'
+
+
+def document_metadata(document) -> dict:
+    """Metadata shared by every chunk of a source document"""
+    metadata = {
+        'document_id': document.id,
+        'document_title': document.title or '',
+    }
+    if document.uploaded_at:
+        metadata['uploaded_at'] = to_timestamp(document.uploaded_at)
+    return metadata
+
+
+def element_metadata(element, element_index: int, base: dict = None) -> dict:
+    """Metadata for one stored chunk; Chroma rejects None values so missing fields are omitted"""
+    metadata = dict(base or {})
+    metadata['element_index'] = element_index
+    metadata['element_type'] = element_type_of(element)
+    page_number = getattr(getattr(element, 'metadata', None), 'page_number', None)
+    if page_number is not None:
+        metadata['page_number'] = page_number
+    return metadata
+
+
+def build_where(filters: dict = None) -> Optional[dict]:
+    """Translate API retrieval filters into a Chroma `where` clause.
+
+    The clause is evaluated by the vector store before the ANN search, so a
+    filtered query only scores vectors that can actually be returned.
+    """
+    if not filters:
+        return None
+
+    clauses = []
+
+    def one_of(field, values):
+        if values:
+            values = list(values)
+            clauses.append({field: values[0]} if len(values) == 1 else {field: {'$in': values}})
+
+    one_of('document_id', filters.get('document_ids'))
+    one_of('element_type', filters.get('element_types'))
+    if filters.get('page_from') is not None:
+        clauses.append({'page_number': {'$gte': filters['page_from']}})
+    if filters.get('page_to') is not None:
+        clauses.append({'page_number': {'$lte': filters['page_to']}})
+    if filters.get('uploaded_after'):
+        clauses.append({'uploaded_at': {'$gte': to_timestamp(filters['uploaded_after'])}})
+    if filters.get('uploaded_before'):
+        clauses.append({'uploaded_at': {'$lte': to_timestamp(filters['uploaded_before'])}})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {'$and': clauses}
@@ -0,0 +1,680 @@
+import copy
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Below this many matching vectors a filtered query is answered by an exact scan
+# of the memory-mapped vectors, which beats walking the graph with a predicate.
+EXACT_SCAN_LIMIT = 2048
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.lock'
+FORMAT_VERSION = 2
+
+# The index is saved once this many rows were appended since the last save;
+# readers index the rows after it themselves when they load
+CHECKPOINT_MIN_ROWS = 256
+CHECKPOINT_MAX_ROWS = 4096
+CHECKPOINT_RATIO = 0.1
+
+# Deleted rows are compacted away once they make up this share of the store
+COMPACT_RATIO = 0.2
+COPY_ROWS = 16384
+
+_OPERATORS = {
+    '$eq': lambda value, operand: value == operand,
+    '$ne': lambda value, operand: value != operand,
+    '$gt': lambda value, operand: value is not None and value > operand,
+    '$gte': lambda value, operand: value is not None and value >= operand,
+    '$lt': lambda value, operand: value is not None and value < operand,
+    '$lte': lambda value, operand: value is not None and value <= operand,
+    '$in': lambda value, operand: value in operand,
+    '$nin': lambda value, operand: value not in operand,
+}
+
+
+def matches_where(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style where clause against one metadata dict"""
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[op](value, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def cosine_relevance_fn(space: str):
+    """Map a distance in the given space to cosine similarity, the scale every backend reports.
+
+    Squared L2 (hnswlib's and Chroma's default) and inner product only equal
+    cosine for unit-length embeddings, which all configured providers return.
+    """
+    if space == 'l2':
+        return lambda distance: 1.0 - distance / 2.0
+    return lambda distance: 1.0 - distance
+
+
+def write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_array(path: str, array: np.ndarray):
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+
+    write_atomic(path, write)
+
+
+class StoreState:
+    """One committed version of a store.
+
+    A search reads a single instance from start to end, and writers and reloads
+    publish a new one with one assignment, so no search sees a half-loaded
+    store. Appends extend the shared lists in place; rows at or past ``count``
+    belong to a newer state and are ignored.
+    """
+
+    def __init__(self, ids=None, texts=None, metadatas=None, count: int = 0, vectors=None, dim: int = None,
+                 deleted=frozenset(), space: str = 'cosine', generation: int = None, docs_bytes: int = 0,
+                 indexed: int = 0):
+        self.ids = ids if ids is not None else []
+        self.texts = texts if texts is not None else []
+        self.metadatas = metadatas if metadatas is not None else []
+        self.labels = {doc_id: label for label, doc_id in enumerate(self.ids[:count])}
+        self.count = count
+        self.vectors = vectors
+        self.dim = dim
+        self.deleted = frozenset(deleted)
+        self.space = space
+        self.generation = generation
+        self.docs_bytes = docs_bytes
+        self.indexed = indexed
+        self.index = None
+        self.signature = None
+        self.filter_cache = {}
+
+    def derive(self, **changes) -> 'StoreState':
+        """A newer state sharing this one's rows"""
+        state = copy.copy(self)
+        state.__dict__.update(changes)
+        state.deleted = frozenset(state.deleted)
+        state.filter_cache = {}
+        return state
+
+    @property
+    def live(self) -> int:
+        return self.count - len(self.deleted)
+
+    def is_live(self, label: int) -> bool:
+        return label < self.count and label not in self.deleted
+
+    def label(self, doc_id: str) -> Optional[int]:
+        label = self.labels.get(doc_id)
+        return label if label is not None and self.is_live(label) else None
+
+    def document(self, label: int) -> Document:
+        return Document(id=self.ids[label], page_content=self.texts[label], metadata=self.metadatas[label])
+
+
+class MmapVectorStore(VectorStore):
+    """Base for in-process vector stores persisted next to the module's other data.
+
+    Files live under ``<persist_directory>/<collection_name><DIRECTORY_SUFFIX>/``
+    and belong to a generation: ``vectors.<g>.f32`` (raw float32 rows, opened
+    with mmap so they stay on disk until touched) and ``docs.<g>.jsonl`` (id,
+    text and metadata per row) are append-only, plus whatever the index
+    writes. ``manifest.json`` is replaced last and says how many rows are
+    committed, which are deleted and how far the saved index goes, so it marks
+    a complete commit; other processes reload when it changes. Compaction
+    rewrites the live rows into the next generation. Stores written before
+    generations (``vectors.npy`` / ``docs.json``) are read as they are and
+    converted on their first write. Subclasses provide the index through the
+    ``_*_index`` hooks.
+    """
+
+    DIRECTORY_SUFFIX = '.index'
+
+    def __init__(self, collection_name: str, embedding_function: Embeddings, persist_directory: str,
+                 space: str = 'cosine'):
+        self.collection_name = collection_name
+        self._embedding = embedding_function
+        self.path = self.storage_path(persist_directory, collection_name)
+        self.space = space
+        self._lock = threading.RLock()
+        self._state = self._read_state()
+
+    @classmethod
+    def storage_path(cls, persist_directory: str, collection_name: str) -> str:
+        return os.path.join(persist_directory, f"{collection_name}{cls.DIRECTORY_SUFFIX}")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST)
+
+    @property
+    def legacy_docs_path(self):
+        return os.path.join(self.path, 'docs.json')
+
+    def _file(self, name: str, extension: str, generation: int = None) -> str:
+        """``name.<generation>.extension``, or ``name.extension`` for a store written before generations"""
+        filename = f"{name}.{extension}" if generation is None else f"{name}.{generation}.{extension}"
+        return os.path.join(self.path, filename)
+
+    # Index hooks
+
+    def _load_index(self, state: StoreState, generation: Optional[int]):
+        """The saved index for a generation, or None to build it from the vectors"""
+        raise NotImplementedError
+
+    def _extend_index(self, index, state: StoreState, start: int):
+        """Index rows start..state.count and return the index to publish.
+
+        ``index`` may be searched concurrently, so it must not be resized or
+        rebuilt in place; None means build it from all rows.
+        """
+        raise NotImplementedError
+
+    def _save_index(self, index, generation: int):
+        raise NotImplementedError
+
+    def _drop_from_index(self, index, label: int):
+        pass
+
+    def _index_search(self, state: StoreState, query: np.ndarray, k: int,
+                      allowed: Optional[set]) -> List[Tuple[int, float]]:
+        """Return (label, distance) pairs; raise RuntimeError to fall back to an exact scan"""
+        raise NotImplementedError
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by the index itself (excludes the mmapped vectors)"""
+        raise NotImplementedError
+
+    # Reading
+
+    def _disk_signature(self):
+        for path in (self.manifest_path, self.legacy_docs_path):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return path, stat.st_ino, stat.st_mtime_ns, stat.st_size
+        return None
+
+    def _map_vectors(self, generation: int, count: int, dim: int):
+        if not count:
+            return None
+        return np.memmap(self._file('vectors', 'f32', generation), dtype=np.float32, mode='r', shape=(count, dim))
+
+    def _restore_index(self, state: StoreState, index):
+        if state.count:
+            if index is None:
+                index = self._extend_index(None, state, 0)
+            elif state.indexed < state.count:
+                index = self._extend_index(index, state, state.indexed)
+            for label in state.deleted:
+                self._drop_from_index(index, label)
+        return index
+
+    def _read_generation(self) -> StoreState:
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        generation, count, dim = manifest['generation'], manifest['count'], manifest['dim']
+        with open(self._file('docs', 'jsonl', generation), 'rb') as f:
+            records = [json.loads(line) for line in f.read(manifest['docs_bytes']).splitlines()]
+        state = StoreState(
+            ids=[record['id'] for record in records],
+            texts=[record['text'] for record in records],
+            metadatas=[record['metadata'] for record in records],
+            count=count,
+            vectors=self._map_vectors(generation, count, dim),
+            dim=dim,
+            deleted=manifest['deleted'],
+            space=manifest.get('space', self.space),
+            generation=generation,
+            docs_bytes=manifest['docs_bytes'],
+            indexed=manifest['indexed'],
+        )
+        state.index = self._restore_index(state, self._load_index(state, generation))
+        return state
+
+    def _read_legacy(self) -> StoreState:
+        with open(self.legacy_docs_path) as f:
+            data = json.load(f)
+        vectors = np.load(self._file('vectors', 'npy'), mmap_mode='r')
+        count = len(data['ids'])
+        state = StoreState(
+            ids=data['ids'],
+            texts=data['texts'],
+            metadatas=data['metadatas'],
+            count=count,
+            vectors=vectors if count else None,
+            dim=vectors.shape[1] if vectors.ndim == 2 else None,
+            deleted=data.get('deleted', []),
+            space=data.get('space', self.space),
+            indexed=count,
+        )
+        state.index = self._restore_index(state, self._load_index(state, None))
+        return state
+
+    def _read_state(self) -> StoreState:
+        for attempt in range(3):
+            signature = self._disk_signature()
+            try:
+                if signature is None:
+                    state = StoreState(space=self.space)
+                elif signature[0] == self.manifest_path:
+                    state = self._read_generation()
+                else:
+                    state = self._read_legacy()
+            except FileNotFoundError:
+                # A compaction replaced the generation while it was being read
+                if attempt == 2:
+                    raise
+                continue
+            state.signature = signature
+            return state
+
+    def _current(self) -> StoreState:
+        """The latest committed state, re-read first if another process committed since"""
+        state = self._state
+        if self._disk_signature() != state.signature:
+            with self._lock:
+                state = self._state
+                if self._disk_signature() != state.signature:
+                    state = self._read_state()
+                    self._state = state
+        return state
+
+    # Writing
+
+    @contextmanager
+    def _writing(self):
+        """Serialise writers across threads and processes and start from the latest commit"""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield self._current()
+                except BaseException:
+                    # Forget anything applied in memory but not committed
+                    self._state = self._read_state()
+                    raise
+
+    def _commit(self, state: StoreState):
+        manifest = {
+            'format': FORMAT_VERSION,
+            'generation': state.generation,
+            'count': state.count,
+            'dim': state.dim,
+            'docs_bytes': state.docs_bytes,
+            'indexed': state.indexed,
+            'deleted': sorted(state.deleted),
+            'space': state.space,
+        }
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+
+        write_atomic(self.manifest_path, write)
+        state.signature = self._disk_signature()
+        self._state = state
+
+    def _checkpoint_due(self, state: StoreState) -> bool:
+        due = min(CHECKPOINT_MAX_ROWS, max(CHECKPOINT_MIN_ROWS, int(state.count * CHECKPOINT_RATIO)))
+        return state.count - state.indexed >= due
+
+    def _compact(self, state: StoreState, deleted=None) -> StoreState:
+        """Rewrite the live rows into a new generation and commit it"""
+        deleted = state.deleted if deleted is None else deleted
+        live = [label for label in range(state.count) if label not in deleted]
+        generation = (state.generation or 0) + 1
+
+        with open(self._file('vectors', 'f32', generation), 'wb') as f:
+            for start in range(0, len(live), COPY_ROWS):
+                f.write(np.asarray(state.vectors[live[start:start + COPY_ROWS]], dtype=np.float32).tobytes())
+        payload = ''.join(
+            json.dumps({'id': state.ids[label], 'text': state.texts[label], 'metadata': state.metadatas[label]}) + '\n'
+            for label in live
+        ).encode()
+        with open(self._file('docs', 'jsonl', generation), 'wb') as f:
+            f.write(payload)
+
+        compacted = StoreState(
+            ids=[state.ids[label] for label in live],
+            texts=[state.texts[label] for label in live],
+            metadatas=[state.metadatas[label] for label in live],
+            count=len(live),
+            vectors=self._map_vectors(generation, len(live), state.dim),
+            dim=state.dim,
+            space=state.space,
+            generation=generation,
+            docs_bytes=len(payload),
+            indexed=len(live),
+        )
+        if live:
+            compacted.index = self._extend_index(None, compacted, 0)
+            self._save_index(compacted.index, generation)
+        self._commit(compacted)
+        self._remove_stale_files(generation)
+        logger.info(f"Compacted {self.collection_name}: {len(live)} rows kept, {state.count - len(live)} dropped")
+        return compacted
+
+    def _remove_stale_files(self, generation: int):
+        marker = f".{generation}."
+        for name in os.listdir(self.path):
+            if name in (MANIFEST, LOCK_FILE) or marker in name:
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = [doc_id or str(uuid.uuid4()) for doc_id in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+
+        with self._writing() as state:
+            if state.generation is None and state.count:
+                state = self._compact(state)
+            if state.dim is not None and vectors.shape[1] != state.dim:
+                raise ValueError(f"Expected {state.dim}-dimensional vectors, got {vectors.shape[1]}")
+            generation = state.generation or 1
+
+            # Only the new rows are written; anything past the last commit is a crashed append
+            with open(self._file('vectors', 'f32', generation), 'ab') as f:
+                f.truncate(state.count * vectors.shape[1] * vectors.itemsize)
+                f.write(vectors.tobytes())
+            payload = ''.join(
+                json.dumps({'id': doc_id, 'text': text, 'metadata': metadata}) + '\n'
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            ).encode()
+            with open(self._file('docs', 'jsonl', generation), 'ab') as f:
+                f.truncate(state.docs_bytes)
+                f.write(payload)
+
+            for rows, new_rows in ((state.ids, ids), (state.texts, texts), (state.metadatas, metadatas)):
+                del rows[state.count:]
+                rows.extend(new_rows)
+            count = state.count + len(ids)
+            appended = state.derive(
+                count=count,
+                vectors=self._map_vectors(generation, count, vectors.shape[1]),
+                dim=vectors.shape[1],
+                generation=generation,
+                docs_bytes=state.docs_bytes + len(payload),
+            )
+            for offset, doc_id in enumerate(ids):
+                appended.labels[doc_id] = state.count + offset
+            appended.index = self._extend_index(state.index, appended, state.count)
+            if self._checkpoint_due(appended):
+                self._save_index(appended.index, generation)
+                appended.indexed = count
+            self._commit(appended)
+        return ids
+
+    def _delete_labels(self, select) -> List[Document]:
+        with self._writing() as state:
+            labels = [label for label in select(state) if state.is_live(label)]
+            if not labels:
+                return []
+            removed = [state.document(label) for label in labels]
+            deleted = state.deleted | set(labels)
+            if state.generation is None or len(deleted) >= COMPACT_RATIO * state.count:
+                self._compact(state, deleted)
+            else:
+                for label in labels:
+                    self._drop_from_index(state.index, label)
+                self._commit(state.derive(deleted=deleted))
+        return removed
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        self.delete_ids(ids)
+        return True
+
+    def delete_ids(self, ids: List[str]) -> List[Document]:
+        """Delete the live vectors with the given ids and return what was removed"""
+        return self._delete_labels(lambda state: [label for label in map(state.label, ids) if label is not None])
+
+    def delete_where(self, where: dict) -> List[Document]:
+        """Delete every live vector whose metadata matches `where` and return what was removed"""
+        return self._delete_labels(lambda state: [
+            label for label in range(state.count) if matches_where(state.metadatas[label], where)
+        ])
+
+    def delete_collection(self):
+        """Remove the index files; the store is empty afterwards"""
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._state = StoreState(space=self.space)
+
+    def checkpoint(self):
+        """Save the index now rather than at the next threshold, e.g. before measuring disk use"""
+        with self._writing() as state:
+            if state.generation is not None and state.index is not None and state.indexed < state.count:
+                self._save_index(state.index, state.generation)
+                self._commit(state.derive(indexed=state.count))
+
+    def metadata_by_id(self) -> Dict[str, dict]:
+        """Metadata of every live row, keyed by id"""
+        state = self._current()
+        return {state.ids[label]: state.metadatas[label] for label in range(state.count) if label not in state.deleted}
+
+    def export(self) -> dict:
+        """Live ids, texts, metadata and vectors, e.g. to benchmark another backend on the same chunks"""
+        state = self._current()
+        live = [label for label in range(state.count) if label not in state.deleted]
+        return {
+            'ids': [state.ids[label] for label in live],
+            'texts': [state.texts[label] for label in live],
+            'metadatas': [state.metadatas[label] for label in live],
+            'embeddings': (
+                np.asarray(state.vectors[live], dtype=np.float32) if live
+                else np.zeros((0, state.dim or 0), dtype=np.float32)
+            ),
+        }
+
+    # Search
+
+    def get_by_ids(self, ids, /) -> List[Document]:
+        state = self._current()
+        labels = [state.label(doc_id) for doc_id in ids]
+        return [state.document(label) for label in labels if label is not None]
+
+    def _allowed_labels(self, state: StoreState, where: dict) -> List[int]:
+        key = json.dumps(where, sort_keys=True, default=str)
+        if key not in state.filter_cache:
+            if len(state.filter_cache) >= 128:
+                state.filter_cache.clear()
+            state.filter_cache[key] = [
+                label for label in range(state.count)
+                if label not in state.deleted and matches_where(state.metadatas[label], where)
+            ]
+        return state.filter_cache[key]
+
+    def _exact_distances(self, state: StoreState, query: np.ndarray, labels: List[int]) -> np.ndarray:
+        """Distances with hnswlib's conventions for the given labels"""
+        vectors = np.asarray(state.vectors[labels], dtype=np.float32)
+        if state.space == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            return 1.0 - (vectors @ query) / np.maximum(norms, 1e-12)
+        if state.space == 'ip':
+            return 1.0 - vectors @ query
+        return np.sum((vectors - query) ** 2, axis=1)
+
+    def _exact_search(self, state: StoreState, query: np.ndarray, k: int, labels: List[int]) -> List[Tuple[int, float]]:
+        distances = self._exact_distances(state, query, labels)
+        order = np.argsort(distances)[:k]
+        return [(labels[i], float(distances[i])) for i in order]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        state = self._current()
+        if state.live <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+
+        if filter:
+            candidates = self._allowed_labels(state, filter)
+            if not candidates:
+                return []
+            if len(candidates) <= EXACT_SCAN_LIMIT:
+                return [
+                    (state.document(label), distance)
+                    for label, distance in self._exact_search(state, query, k, candidates)
+                ]
+            allowed = set(candidates)
+        else:
+            candidates = None
+            allowed = None
+
+        limit = len(allowed) if allowed is not None else state.live
+        try:
+            hits = self._index_search(state, query, min(k, limit), allowed)
+        except RuntimeError:
+            # e.g. hnswlib gives up when the graph walk cannot reach k allowed elements
+            if candidates is None:
+                candidates = [label for label in range(state.count) if label not in state.deleted]
+            hits = self._exact_search(state, query, k, candidates)
+
+        return [(state.document(label), distance) for label, distance in hits if state.is_live(label)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return cosine_relevance_fn(self._state.space)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, collection_name: str = 'langchain',
+                   persist_directory: str = '.', **kwargs: Any) -> 'MmapVectorStore':
+        store = cls(collection_name, embedding, persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+class HNSWVectorStore(MmapVectorStore):
+    """In-process HNSW graph (hnswlib); ``index.<g>.bin`` holds the graph"""
+
+    DIRECTORY_SUFFIX = '.hnsw'
+
+    def __init__(self, collection_name: str, embedding_function: Embeddings, persist_directory: str,
+                 space: str = 'cosine', M: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        super().__init__(collection_name, embedding_function, persist_directory, space)
+
+    def set_ef_search(self, ef_search: int):
+        """Change the query-time beam width without rebuilding"""
+        self.ef_search = ef_search
+        if self._state.index is not None:
+            self._state.index.set_ef(ef_search)
+
+    def _configure(self, index):
+        index.set_ef(self.ef_search)
+        # Queries already run on the search thread pool; don't fan out again inside hnswlib
+        index.set_num_threads(1)
+        return index
+
+    def _load_index(self, state: StoreState, generation: Optional[int]):
+        path = self._file('index', 'bin', generation)
+        if not state.count or not os.path.exists(path):
+            return None
+        import hnswlib
+
+        index = hnswlib.Index(space=state.space, dim=state.dim)
+        index.load_index(path, max_elements=state.count)
+        return self._configure(index)
+
+    def _grown(self, index, state: StoreState):
+        """Copy with room for the state's rows; hnswlib cannot resize an index that is being searched"""
+        import hnswlib
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.bin')
+            index.save_index(path)
+            grown = hnswlib.Index(space=state.space, dim=state.dim)
+            grown.load_index(path, max_elements=max(state.count, 2 * index.get_max_elements()))
+        return self._configure(grown)
+
+    def _extend_index(self, index, state: StoreState, start: int):
+        import hnswlib
+
+        if index is None:
+            start = 0
+            index = hnswlib.Index(space=state.space, dim=state.dim)
+            index.init_index(max_elements=max(state.count, 1), ef_construction=self.ef_construction, M=self.M)
+            self._configure(index)
+        elif index.get_max_elements() < state.count:
+            index = self._grown(index, state)
+        if start < state.count:
+            index.add_items(np.asarray(state.vectors[start:state.count]), np.arange(start, state.count))
+        return index
+
+    def _save_index(self, index, generation: int):
+        write_atomic(self._file('index', 'bin', generation), index.save_index)
+
+    def _drop_from_index(self, index, label: int):
+        try:
+            index.mark_deleted(label)
+        except RuntimeError:
+            pass  # already marked in the saved index
+
+    def _index_search(self, state: StoreState, query: np.ndarray, k: int,
+                      allowed: Optional[set]) -> List[Tuple[int, float]]:
+        search_filter = (lambda label: label in allowed) if allowed is not None else None
+        labels, distances = state.index.knn_query(query, k=k, filter=search_filter)
+        return [(int(label), float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def resident_bytes(self) -> int:
+        # hnswlib keeps the full vectors inside the graph, so the saved index is what it holds in memory
+        path = self._file('index', 'bin', self._state.generation)
+        return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MISTRAL_ENDPOINT = "https://api.mistral.ai/v1"
+
+# Local copy of the "rlm/rag-prompt" hub prompt, used offline or when the hub is unreachable
+RAG_PROMPT_TEXT = (
+    "You are an assistant for question-answering tasks. Use the following pieces of retrieved context "
+    "to answer the question. If you don't know the answer, just say that you don't know. Use three "
+    "sentences maximum and keep the answer concise.\nQuestion: {question} \nContext: {context} \nAnswer:"
+)
+
+_chat_models = {}
+_http_clients = {}
+_rag_prompt = None
+_lock = threading.Lock()
+
+
+def _llm_config() -> dict:
+    return getattr(settings, 'LLM_CONFIG', {})
+
+
+# Settings LangChain and the Mistral client read from the environment
+PROVIDER_ENVIRONMENT = ('LANGCHAIN_TRACING_V2', 'LANGCHAIN_ENDPOINT', 'LANGCHAIN_API_KEY', 'MISTRAL_API_KEY')
+
+
+def export_provider_environment():
+    """Copy provider and tracing settings into os.environ; unset keys are skipped (offline fake providers)"""
+    for name in PROVIDER_ENVIRONMENT:
+        if getattr(settings, name, None):
+            os.environ[name] = getattr(settings, name)
+
+
+def is_offline() -> bool:
+    """True when LLM_CONFIG['PROVIDER'] selects the fake chat model (load tests, CI, air-gapped hosts)"""
+    return _llm_config().get('PROVIDER') == 'fake'
+
+
+def _fake_chat_model(model_name: str):
+    from vectordb.fake_providers import FakeChatModel
+
+    fake = _llm_config().get('FAKE', {})
+    return FakeChatModel(
+        model_name=model_name,
+        answer_tokens=fake.get('ANSWER_TOKENS', 64),
+        latency_ms=fake.get('LATENCY_MS', 0),
+        latency_distribution=fake.get('LATENCY_DISTRIBUTION', 'lognormal'),
+        latency_sigma=fake.get('LATENCY_SIGMA', 0.5),
+        tokens_per_second=fake.get('TOKENS_PER_SECOND', 0),
+        seed=fake.get('SEED', 0),
+    )
+
+
+def _mistral_clients(limits, timeout) -> dict:
+    """Keep-alive sync/async clients set up the way ChatMistralAI would build its own"""
+    import httpx
+
+    api_key = os.getenv("MISTRAL_API_KEY", "")
+    client_kwargs = {
+        'base_url': os.getenv("MISTRAL_BASE_URL", MISTRAL_ENDPOINT),
+        'headers': {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        },
+        'limits': limits,
+        'timeout': timeout,
+    }
+    return {'client': httpx.Client(**client_kwargs), 'async_client': httpx.AsyncClient(**client_kwargs)}
+
+
+# provider -> factory(limits, timeout) returning the client kwargs for init_chat_model
+CLIENT_FACTORIES = {
+    'mistralai': _mistral_clients,
+}
+
+
+def _clients_for(provider: str) -> dict:
+    """Process-wide HTTP clients for a provider, shared by every model of it (call with _lock held)"""
+    if provider not in _http_clients:
+        factory = CLIENT_FACTORIES.get(provider)
+        if factory is None:
+            # The provider's own client is still reused through the cached model instance
+            _http_clients[provider] = {}
+        else:
+            import httpx
+
+            config = _llm_config()
+            limits = httpx.Limits(
+                max_connections=config.get('MAX_CONNECTIONS', 20),
+                max_keepalive_connections=config.get('MAX_KEEPALIVE_CONNECTIONS', 10),
+                keepalive_expiry=config.get('KEEPALIVE_EXPIRY', 30),
+            )
+            timeout = httpx.Timeout(config.get('TIMEOUT', 120), connect=config.get('CONNECT_TIMEOUT', 10))
+            _http_clients[provider] = factory(limits, timeout)
+    return _http_clients[provider]
+
+
+def get_chat_model(model_name: str, model_provider: str = "mistralai", temperature: float = 0.0):
+    """Return the process-wide chat model for (provider, model, temperature), creating it once.
+
+    All models of a provider share one keep-alive connection pool, so
+    LLM_CONFIG['MAX_CONNECTIONS'] caps outbound concurrency per process. With
+    LLM_CONFIG['PROVIDER'] = 'fake' every model is served by FakeChatModel.
+    """
+    if is_offline():
+        model_provider = 'fake'
+    key = (model_provider, model_name, temperature)
+    with _lock:
+        if key not in _chat_models:
+            logger.info(f"Creating chat model client: {model_provider}/{model_name} (temperature={temperature})")
+            if model_provider == 'fake':
+                _chat_models[key] = _fake_chat_model(model_name)
+            else:
+                from langchain.chat_models import init_chat_model
+
+                _chat_models[key] = init_chat_model(
+                    model_name,
+                    model_provider=model_provider,
+                    temperature=temperature,
+                    max_retries=_llm_config().get('MAX_RETRIES', 2),
+                    **_clients_for(model_provider)
+                )
+        return _chat_models[key]
+
+
+def get_rag_prompt():
+    """The "rlm/rag-prompt" template, pulled from the LangChain hub once per process"""
+    global _rag_prompt
+    with _lock:
+        if _rag_prompt is None:
+            from langchain_core.prompts import ChatPromptTemplate
+
+            if not is_offline():
+                try:
+                    from langchain import hub
+                    _rag_prompt = hub.pull("rlm/rag-prompt")
+                except Exception as e:
+                    logger.warning(f"Could not pull rlm/rag-prompt from the hub, using the local copy: {e}")
+            if _rag_prompt is None:
+                _rag_prompt = ChatPromptTemplate.from_messages([("human", RAG_PROMPT_TEXT)])
+        return _rag_prompt
@@ -0,0 +1,116 @@
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from vectordb.benchmarks import (
+    PrecomputedEmbeddings, export_chunks, sample_queries, latency_summary, directory_size,
+    exact_top_k, recall_at_k
+)
+from vectordb.embeddings import get_embeddings
+from vectordb.models import ModuleVectorStore
+from vectordb.retrieval import open_vector_store
+from vectordb.vector_backends import create_vector_store
+
+BATCH_SIZE = 5000
+
+# name -> (backend, constructor options)
+VARIANTS = {
+    'chromadb': ('chromadb', {}),
+    'hnswlib': ('hnswlib', {}),
+    'int8': ('quantized', {'quantization': 'int8'}),
+    'binary': ('quantized', {'quantization': 'binary'}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild a module's chunks on each vector backend and compare recall@k against exact search, "
+        "query latency, index memory and disk size"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('module_id', type=int)
+        parser.add_argument('--queries', type=int, default=100, help="Number of sampled queries")
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+
+    def handle(self, *args, **options):
+        try:
+            vector_store = ModuleVectorStore.objects.get(module_id=options['module_id'], status='ready')
+        except ModuleVectorStore.DoesNotExist:
+            raise CommandError(f"No ready vector store for module {options['module_id']}")
+
+        source = open_vector_store(
+            vector_store.collection_name,
+            vector_store.persistence_directory,
+            vector_store.embedding_model,
+            vector_store.config
+        )
+        chunks = export_chunks(source)
+        if not chunks['ids']:
+            raise CommandError("Vector store is empty")
+
+        # Embed everything once so every backend is timed on identical vectors
+        k = options['k']
+        queries = sample_queries(chunks['texts'], options['queries'])
+        query_vectors = get_embeddings(vector_store.embedding_model).embed_documents(queries)
+        vectors = dict(zip(chunks['texts'], chunks['embeddings'].tolist()))
+        vectors.update(zip(queries, query_vectors))
+        embeddings = PrecomputedEmbeddings(vectors)
+        expected = [
+            [chunks['ids'][i] for i in row]
+            for row in exact_top_k(chunks['embeddings'], np.asarray(query_vectors, dtype=np.float32), k)
+        ]
+
+        self.stdout.write(
+            f"Module {options['module_id']}: {len(chunks['ids'])} chunks "
+            f"({chunks['embeddings'].nbytes / (1024 * 1024):.2f} MB as float32), {len(queries)} queries, k={k}"
+        )
+        results = {}
+        for name in options['variants']:
+            backend, backend_kwargs = VARIANTS[name]
+            with tempfile.TemporaryDirectory() as persist_directory:
+                store = create_vector_store(backend, 'benchmark', persist_directory, embeddings, **backend_kwargs)
+
+                start = time.perf_counter()
+                for i in range(0, len(chunks['ids']), BATCH_SIZE):
+                    store.add_texts(
+                        chunks['texts'][i:i + BATCH_SIZE],
+                        metadatas=chunks['metadatas'][i:i + BATCH_SIZE],
+                        ids=chunks['ids'][i:i + BATCH_SIZE],
+                    )
+                build_ms = (time.perf_counter() - start) * 1000
+
+                store.similarity_search_with_relevance_scores(queries[0], k=k)  # warm up
+                latencies, retrieved = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    hits = store.similarity_search_with_relevance_scores(query, k=k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    retrieved.append([doc.id for doc, _ in hits])
+
+                summary = latency_summary(latencies)
+                summary['recall'] = round(recall_at_k(retrieved, expected), 4)
+                summary['build_ms'] = round(build_ms, 1)
+                if hasattr(store, 'checkpoint'):
+                    # Persist the index so disk size is measured as it would be served
+                    store.checkpoint()
+                summary['disk_mb'] = round(directory_size(persist_directory) / (1024 * 1024), 2)
+                summary['index_mb'] = (
+                    round(store.resident_bytes() / (1024 * 1024), 2) if hasattr(store, 'resident_bytes') else None
+                )
+                results[name] = summary
+
+            self.stdout.write(
+                f"  {name:<10} recall@{k} {summary['recall']}, p50 {summary['p50_ms']} ms, "
+                f"p99 {summary['p99_ms']} ms, index {summary['index_mb'] if summary['index_mb'] is not None else 'n/a'} MB, "
+                f"disk {summary['disk_mb']} MB, build {summary['build_ms']} ms"
+            )
+
+        fastest = min(results, key=lambda name: results[name]['p99_ms'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Fastest at p99: {fastest} (recall@{k} {results[fastest]['recall']}). Select a backend per module "
+            f"with config['vector_store'] (and config['quantization'] for int8/binary), then re-index."
+        ))
@@ -0,0 +1,138 @@
+import itertools
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from vectordb.benchmarks import (
+    PrecomputedEmbeddings, export_chunks, sample_queries, latency_summary, exact_top_k, recall_at_k
+)
+from vectordb.embeddings import get_embeddings
+from vectordb.hnsw_store import HNSWVectorStore
+from vectordb.models import ModuleVectorStore
+from vectordb.retrieval import open_vector_store
+
+LARGE_MODULE_CHUNKS = 50000
+
+
+def default_grid(chunk_count: int, k: int) -> dict:
+    """Candidate HNSW settings; large modules also try denser graphs"""
+    large = chunk_count >= LARGE_MODULE_CHUNKS
+    return {
+        'M': [8, 16, 32] + ([48] if large else []),
+        'ef_construction': [100, 200] + ([400] if large else []),
+        'ef_search': sorted({max(k, value) for value in [16, 32, 64, 128, 256] + ([512] if large else [])}),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k against exact search and p50/p99 latency for HNSW settings on a module's "
+        "vectors, and recommend hnsw_m / hnsw_ef_construction / hnsw_ef_search for its config"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('module_id', type=int)
+        parser.add_argument('--queries', type=int, default=200, help="Number of sampled queries")
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--target-recall', type=float, default=0.95)
+        parser.add_argument('--m', type=int, nargs='+', help="M values to try")
+        parser.add_argument('--ef-construction', type=int, nargs='+', help="ef_construction values to try")
+        parser.add_argument('--ef-search', type=int, nargs='+', help="ef_search values to try")
+        parser.add_argument('--apply', action='store_true', help="Write the recommendation into the module config")
+
+    def handle(self, *args, **options):
+        try:
+            vector_store = ModuleVectorStore.objects.get(module_id=options['module_id'], status='ready')
+        except ModuleVectorStore.DoesNotExist:
+            raise CommandError(f"No ready vector store for module {options['module_id']}")
+
+        source = open_vector_store(
+            vector_store.collection_name,
+            vector_store.persistence_directory,
+            vector_store.embedding_model,
+            vector_store.config
+        )
+        chunks = export_chunks(source)
+        if not chunks['ids']:
+            raise CommandError("Vector store is empty")
+
+        k = options['k']
+        queries = sample_queries(chunks['texts'], options['queries'])
+        query_vectors = get_embeddings(vector_store.embedding_model).embed_documents(queries)
+        embeddings = PrecomputedEmbeddings(dict(zip(chunks['texts'], chunks['embeddings'].tolist())))
+        expected = [
+            [chunks['ids'][i] for i in row]
+            for row in exact_top_k(chunks['embeddings'], np.asarray(query_vectors, dtype=np.float32), k)
+        ]
+
+        grid = default_grid(len(chunks['ids']), k)
+        grid['M'] = options['m'] or grid['M']
+        grid['ef_construction'] = options['ef_construction'] or grid['ef_construction']
+        grid['ef_search'] = options['ef_search'] or grid['ef_search']
+
+        self.stdout.write(
+            f"Module {options['module_id']}: {len(chunks['ids'])} chunks, {len(queries)} queries, k={k}, "
+            f"target recall {options['target_recall']}"
+        )
+        self.stdout.write(f"  {'M':>4} {'ef_c':>5} {'ef_s':>5} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'build ms':>9}")
+
+        rows = []
+        for m, ef_construction in itertools.product(grid['M'], grid['ef_construction']):
+            with tempfile.TemporaryDirectory() as persist_directory:
+                store = HNSWVectorStore(
+                    'tune', embeddings, persist_directory, M=m, ef_construction=ef_construction
+                )
+                start = time.perf_counter()
+                store.add_texts(chunks['texts'], metadatas=chunks['metadatas'], ids=chunks['ids'])
+                build_ms = (time.perf_counter() - start) * 1000
+
+                # ef_search is a query-time knob, so one build serves the whole sweep
+                for ef_search in grid['ef_search']:
+                    store.set_ef_search(ef_search)
+                    store.similarity_search_with_score_by_vector(query_vectors[0], k)  # warm up
+                    latencies, retrieved = [], []
+                    for vector in query_vectors:
+                        start = time.perf_counter()
+                        hits = store.similarity_search_with_score_by_vector(vector, k)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        retrieved.append([doc.id for doc, _ in hits])
+
+                    row = latency_summary(latencies)
+                    row.update({
+                        'hnsw_m': m,
+                        'hnsw_ef_construction': ef_construction,
+                        'hnsw_ef_search': ef_search,
+                        'recall': round(recall_at_k(retrieved, expected), 4),
+                        'build_ms': round(build_ms, 1),
+                    })
+                    rows.append(row)
+                    self.stdout.write(
+                        f"  {m:>4} {ef_construction:>5} {ef_search:>5} {row['recall']:>7} "
+                        f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['build_ms']:>9}"
+                    )
+
+        passing = [row for row in rows if row['recall'] >= options['target_recall']]
+        if passing:
+            # Fastest tail latency first; prefer the smaller graph when tied
+            best = min(passing, key=lambda row: (row['p99_ms'], row['hnsw_m'], row['hnsw_ef_construction']))
+        else:
+            best = max(rows, key=lambda row: (row['recall'], -row['p99_ms']))
+            self.stdout.write(self.style.WARNING(
+                f"No setting reached recall {options['target_recall']}; recommending the most accurate one"
+            ))
+
+        recommendation = {key: best[key] for key in ('hnsw_m', 'hnsw_ef_construction', 'hnsw_ef_search')}
+        self.stdout.write(self.style.SUCCESS(
+            f"Recommended: {recommendation} (recall@{k} {best['recall']}, p50 {best['p50_ms']} ms, "
+            f"p99 {best['p99_ms']} ms)"
+        ))
+
+        if options['apply']:
+            vector_store.config = {**(vector_store.config or {}), **recommendation}
+            vector_store.save(update_fields=['config'])
+            self.stdout.write(
+                "Saved to the module config. hnsw_ef_search applies on the next query; "
+                "hnsw_m and hnsw_ef_construction apply after re-indexing the module."
+            )
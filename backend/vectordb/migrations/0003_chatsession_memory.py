@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0002_chatsession_question_answer_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='memory_summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='recent_turns',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summarized_turns',
+            field=models.IntegerField(default=0),
+        ),
+    ]
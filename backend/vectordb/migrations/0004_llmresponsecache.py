@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0003_chatsession_memory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponseCache',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model_name', models.CharField(max_length=100)),
+                ('collection_name', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('response_text', models.TextField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'vectordb_llm_response_cache',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0004_llmresponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='completion_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='model_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='total_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='querylog',
+            name='completion_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='querylog',
+            name='model_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='querylog',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='querylog',
+            name='total_tokens',
+            field=models.IntegerField(default=0),
+        ),
+    ]
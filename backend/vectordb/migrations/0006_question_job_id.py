@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0005_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='job_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0006_question_job_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='tokens_estimated',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='querylog',
+            name='tokens_estimated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vectordb', '0007_tokens_estimated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexVersion',
+            fields=[
+                ('collection_name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'vectordb_index_version',
+            },
+        ),
+    ]
@@ -0,0 +1,284 @@
+import logging
+import re
+from typing import List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from vectordb.llm import get_chat_model
+from vectordb.resilience import LLMUnavailable, get_caller
+from vectordb.response_cache import response_cache
+from vectordb.tokens import add_usage, count_tokens, empty_usage, message_usage
+
+logger = logging.getLogger(__name__)
+
+# Questions asking for reasoning over the context rather than a lookup
+COMPLEX_QUESTION = re.compile(
+    r"\b(compare|comparison|difference|differences|versus|vs|why|explain|analy[sz]e|summari[sz]e|"
+    r"pros|cons|trade-?offs?|impact|recommend)\b",
+    re.IGNORECASE,
+)
+
+# The prompts tell the model to say "I don't know" when the context does not cover the question
+LOW_CONFIDENCE = re.compile(
+    r"(\bi don'?t know\b|\bi do not know\b|\bnot (?:contained|mentioned|provided|specified) in\b|"
+    r"\bcannot (?:find|determine|answer)\b|\bno information\b)",
+    re.IGNORECASE,
+)
+
+DEGRADED_PREFIX = "The answer service is temporarily unavailable. The most relevant passage found was:"
+DEGRADED_NO_CONTEXT = "The answer service is temporarily unavailable. Please try again shortly."
+
+
+def resolve_routing(module_config: dict = None) -> dict:
+    """Routing settings: LLM_CONFIG defaults overlaid with the module's config['routing'].
+
+    config['chat_model'] pins a module to one model and turns routing off.
+    """
+    llm_config = getattr(settings, 'LLM_CONFIG', {})
+    routing = {
+        'enabled': llm_config.get('ROUTING_ENABLED', True),
+        'small_model': llm_config.get('SMALL_MODEL', 'mistral-small-latest'),
+        'large_model': llm_config.get('LARGE_MODEL', 'mistral-large-latest'),
+        'max_question_tokens': llm_config.get('ROUTE_MAX_QUESTION_TOKENS', 48),
+        'max_context_tokens': llm_config.get('ROUTE_MAX_CONTEXT_TOKENS', 2000),
+        'min_top_score': llm_config.get('ROUTE_MIN_TOP_SCORE', 0.5),
+        'fallback': llm_config.get('ROUTE_FALLBACK', True),
+    }
+    module_config = module_config or {}
+    routing.update(module_config.get('routing') or {})
+    if module_config.get('chat_model'):
+        routing.update(enabled=False, large_model=module_config['chat_model'])
+    return routing
+
+
+def is_low_confidence(answer: str) -> bool:
+    return not (answer or "").strip() or bool(LOW_CONFIDENCE.search(answer))
+
+
+def degraded_answer(context: str = "", max_chars: int = 800) -> str:
+    """Retrieval-only reply for when no model is reachable: the top excerpt, verbatim"""
+    excerpt = (context or "").strip().split("\n\n")[0][:max_chars]
+    if not excerpt:
+        return DEGRADED_NO_CONTEXT
+    return f"{DEGRADED_PREFIX}\n\n{excerpt}"
+
+
+class ModelRouter:
+    """Picks the small or large chat model for one generation from cheap request features.
+
+    Temperature-0 calls go through the response cache, so a repeated prompt is
+    answered without reaching the provider. Provider calls run under the
+    model's deadline, hedging and circuit breaker (see resilience.py); when
+    neither model answers, invoke() degrades to the top retrieved passage.
+    """
+
+    def __init__(self, routing: dict = None, model_provider: str = "mistralai", temperature: float = 0.0,
+                 collection_name: str = ""):
+        self.routing = routing or resolve_routing()
+        self.model_provider = model_provider
+        self.temperature = temperature
+        self.collection_name = collection_name
+        self.cached = response_cache.cacheable(temperature)
+
+    def choose(self, question: str, scores: List[float], context_tokens: int) -> Tuple[str, str]:
+        """Return (model, reason); anything that looks like more than a lookup goes to the large model"""
+        routing = self.routing
+        large, small = routing['large_model'], routing['small_model']
+        if not routing['enabled']:
+            return large, 'routing disabled'
+        if not scores:
+            return small, 'no context'
+        if count_tokens(question, large) > routing['max_question_tokens']:
+            return large, 'long question'
+        if COMPLEX_QUESTION.search(question):
+            return large, 'complex question'
+        if context_tokens > routing['max_context_tokens']:
+            return large, 'large context'
+        if max(scores) < routing['min_top_score']:
+            return large, 'weak retrieval'
+        return small, 'simple lookup'
+
+    def should_fall_back(self, model: str, answer: str, scores: List[float]) -> bool:
+        """Retry on the large model when the small one gave up despite having context"""
+        return bool(
+            self.routing['fallback'] and scores and model != self.routing['large_model']
+            and is_low_confidence(answer)
+        )
+
+    def llm(self, model: str):
+        return get_chat_model(model, self.model_provider, self.temperature)
+
+    def _call(self, model: str, messages) -> Tuple[str, dict]:
+        llm = self.llm(model)
+        response = get_caller(model).call(lambda: llm.invoke(messages))
+        return response.content, message_usage(response, messages, model)
+
+    async def _acall(self, model: str, messages) -> Tuple[str, dict]:
+        llm = self.llm(model)
+
+        async def attempt():
+            return await llm.ainvoke(messages)
+
+        response = await get_caller(model).acall(attempt)
+        return response.content, message_usage(response, messages, model)
+
+    def complete(self, model: str, messages) -> Tuple[str, bool, dict]:
+        """Answer text for one prompt, whether it came from the response cache, and its token usage.
+
+        Cached answers cost no tokens, so their usage is zero.
+        """
+        if not self.cached:
+            answer, usage = self._call(model, messages)
+            return answer, False, usage
+        key = response_cache.make_key(model, messages, self.collection_name)
+        answer = response_cache.get(key)
+        if answer is not None:
+            return answer, True, empty_usage()
+        answer, usage = self._call(model, messages)
+        response_cache.set(key, model, answer, self.collection_name)
+        return answer, False, usage
+
+    async def acomplete(self, model: str, messages) -> Tuple[str, bool, dict]:
+        if not self.cached:
+            answer, usage = await self._acall(model, messages)
+            return answer, False, usage
+        # The key reads the collection's index version from the shared cache
+        key = await sync_to_async(response_cache.make_key)(model, messages, self.collection_name)
+        answer = await sync_to_async(response_cache.get)(key)
+        if answer is not None:
+            return answer, True, empty_usage()
+        answer, usage = await self._acall(model, messages)
+        await sync_to_async(response_cache.set)(key, model, answer, self.collection_name)
+        return answer, False, usage
+
+    async def astream(self, model: str, messages, context: str = "", usage: dict = None):
+        """Yield answer tokens; a cached answer is yielded in one piece.
+
+        If the model is unavailable before the first token, the degraded
+        retrieval-only answer is yielded instead; a failure mid-answer is raised.
+        When given, `usage` is filled with the stream's token usage once it ends.
+        """
+        usage = usage if usage is not None else {}
+        usage.update(empty_usage())
+        key = None
+        if self.cached:
+            key = await sync_to_async(response_cache.make_key)(model, messages, self.collection_name)
+        answer = await sync_to_async(response_cache.get)(key) if key else None
+        if answer is not None:
+            yield answer
+            return
+
+        parts, reported = [], empty_usage()
+        llm = self.llm(model)
+        try:
+            async for chunk in get_caller(model).astream(lambda: llm.astream(messages)):
+                if chunk.usage_metadata:
+                    reported = add_usage(reported, chunk.usage_metadata)
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except LLMUnavailable as e:
+            if parts:
+                raise
+            logger.warning(f"Streaming degraded to retrieval-only: {e}")
+            yield degraded_answer(context)
+            return
+        answer = "".join(parts)
+        # Providers report streamed usage on the final chunk, if at all
+        usage.update(reported if reported['total_tokens'] else message_usage(answer, messages, model))
+        if key:
+            await sync_to_async(response_cache.set)(key, model, answer, self.collection_name)
+
+    def batch(self, model: str, messages: List, max_concurrency: int = None) -> List[Tuple]:
+        """(answer text or exception, token usage) per prompt; only cache misses reach the provider"""
+        keys = [
+            response_cache.make_key(model, prompt, self.collection_name) if self.cached else None for prompt in messages
+        ]
+        results = [(response_cache.get(key) if key else None, empty_usage()) for key in keys]
+        missing = [i for i, (answer, _) in enumerate(results) if answer is None]
+        if missing:
+            llm = self.llm(model)
+            caller = get_caller(model)
+            # One deadline for the whole batch, scaled by the number of concurrency rounds; not hedged
+            rounds = -(-len(missing) // max_concurrency) if max_concurrency else 1
+            try:
+                responses = caller.call(
+                    lambda: llm.batch(
+                        [messages[i] for i in missing], config={"max_concurrency": max_concurrency},
+                        return_exceptions=True
+                    ),
+                    deadline=caller.deadline * rounds,
+                    hedge=False,
+                )
+            except LLMUnavailable as e:
+                responses = [e] * len(missing)
+            for i, response in zip(missing, responses):
+                if isinstance(response, Exception):
+                    results[i] = (response, empty_usage())
+                    continue
+                results[i] = (response.content, message_usage(response, messages[i], model))
+                if keys[i]:
+                    response_cache.set(keys[i], model, response.content, self.collection_name)
+        return results
+
+    def _degraded(self, reason: str, error: LLMUnavailable, context: str) -> dict:
+        logger.warning(f"Answering retrieval-only ({reason}): {error}")
+        return {
+            'answer': degraded_answer(context), 'model': None, 'route_reason': f'degraded after {reason}',
+            'cached': False, 'degraded': True, 'usage': empty_usage(),
+        }
+
+    def invoke(self, messages, question: str, scores: List[float], context_tokens: int, context: str = "") -> dict:
+        """Routed answer with the model used, the reason, and token usage summed over every call made"""
+        model, reason = self.choose(question, scores, context_tokens)
+        large = self.routing['large_model']
+        try:
+            try:
+                answer, cached, usage = self.complete(model, messages)
+            except LLMUnavailable:
+                if model == large:
+                    raise
+                model, reason = large, f'{reason}, small model unavailable'
+                answer, cached, usage = self.complete(model, messages)
+        except LLMUnavailable as e:
+            return self._degraded(reason, e, context)
+        if self.should_fall_back(model, answer, scores):
+            try:
+                answer, cached, retry_usage = self.complete(large, messages)
+                model, reason, usage = large, f'fallback after {reason}', add_usage(usage, retry_usage)
+            except LLMUnavailable as e:
+                # The small model's answer is still better than none
+                logger.warning(f"Fallback to {large} unavailable: {e}")
+        logger.info(f"Answered with {model} ({reason}{', cached' if cached else ''}, {usage['total_tokens']} tokens)")
+        return {
+            'answer': answer, 'model': model, 'route_reason': reason, 'cached': cached, 'degraded': False,
+            'usage': usage,
+        }
+
+    async def ainvoke(self, messages, question: str, scores: List[float], context_tokens: int,
+                      context: str = "") -> dict:
+        model, reason = self.choose(question, scores, context_tokens)
+        large = self.routing['large_model']
+        try:
+            try:
+                answer, cached, usage = await self.acomplete(model, messages)
+            except LLMUnavailable:
+                if model == large:
+                    raise
+                model, reason = large, f'{reason}, small model unavailable'
+                answer, cached, usage = await self.acomplete(model, messages)
+        except LLMUnavailable as e:
+            return self._degraded(reason, e, context)
+        if self.should_fall_back(model, answer, scores):
+            try:
+                answer, cached, retry_usage = await self.acomplete(large, messages)
+                model, reason, usage = large, f'fallback after {reason}', add_usage(usage, retry_usage)
+            except LLMUnavailable as e:
+                # The small model's answer is still better than none
+                logger.warning(f"Fallback to {large} unavailable: {e}")
+        logger.info(f"Answered with {model} ({reason}{', cached' if cached else ''}, {usage['total_tokens']} tokens)")
+        return {
+            'answer': answer, 'model': model, 'route_reason': reason, 'cached': cached, 'degraded': False,
+            'usage': usage,
+        }
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -205,6 +207,17 @@ class ModuleVectorStore(models.Model):
             'document_count', 'total_chunks', 'total_tokens', 'last_indexed_at'
         ])
 
+    def apply_stat_deltas(self, doc_delta=0, chunk_delta=0, token_delta=0):
+        """Adjust statistics by deltas in one UPDATE, so concurrent re-indexes don't overwrite each other"""
+        fields = ['document_count', 'total_chunks', 'total_tokens', 'last_indexed_at']
+        ModuleVectorStore.objects.filter(pk=self.pk).update(
+            document_count=Greatest(F('document_count') + doc_delta, 0),
+            total_chunks=Greatest(F('total_chunks') + chunk_delta, 0),
+            total_tokens=Greatest(F('total_tokens') + token_delta, 0),
+            last_indexed_at=timezone.now()
+        )
+        self.refresh_from_db(fields=fields)
+
 
 class QueryLog(models.Model):
     """Log RAG queries at module level"""
@@ -226,6 +239,14 @@ class QueryLog(models.Model):
     retrieval_time_ms = models.IntegerField(default=0)
     generation_time_ms = models.IntegerField(default=0)
     total_time_ms = models.IntegerField(default=0)
+
+    # LLM usage as reported by the provider (zero for cached or retrieval-only answers)
+    model_name = models.CharField(max_length=100, blank=True)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    total_tokens = models.IntegerField(default=0)
+    # Counted with a tokenizer (or characters/4) because the provider reported no usage
+    tokens_estimated = models.BooleanField(default=False)
     
     # Feedback
     user_rating = models.IntegerField(
@@ -271,6 +292,8 @@ class Question(models.Model):
         on_delete=models.CASCADE,
         related_name='questions'
     )
+    # Celery task id when the question was submitted as a chat job
+    job_id = models.CharField(max_length=255, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -293,6 +316,12 @@ class Answer(models.Model):
     )
     time_required = models.FloatField(help_text="Time taken to generate the answer in seconds")
     text = models.TextField()
+    model_name = models.CharField(max_length=100, blank=True)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    total_tokens = models.IntegerField(default=0)
+    # Counted with a tokenizer (or characters/4) because the provider reported no usage
+    tokens_estimated = models.BooleanField(default=False)
     created_by = models.ForeignKey(
         'rag_app.User', 
         on_delete=models.CASCADE,
@@ -354,6 +383,11 @@ class ChatSession(models.Model):
         related_name='chat_sessions'
     )
 
+    # Rolling conversation memory: recent turns verbatim, older turns folded into a summary
+    memory_summary = models.TextField(blank=True)
+    recent_turns = models.JSONField(default=list, blank=True)
+    summarized_turns = models.IntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -370,3 +404,36 @@ class ChatSession(models.Model):
         return f"{self.title} - {self.user.username}"
     
 
+
+class LLMResponseCache(models.Model):
+    """Responses of temperature-0 LLM calls, keyed by model and fully rendered prompt"""
+
+    key = models.CharField(max_length=64, primary_key=True)  # sha256 of (model, prompt)
+    model_name = models.CharField(max_length=100)
+    # Collection whose context went into the prompt; entries are dropped when it is re-indexed
+    collection_name = models.CharField(max_length=255, blank=True, db_index=True)
+    response_text = models.TextField()
+
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'vectordb_llm_response_cache'
+        ordering = ['-last_used_at']
+
+    def __str__(self):
+        return f"{self.model_name} - {self.key[:12]}"
+
+
+class IndexVersion(models.Model):
+    """Index version of a collection, used instead of the cache when no shared cache is configured"""
+
+    collection_name = models.CharField(max_length=255, primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'vectordb_index_version'
+
+    def __str__(self):
+        return f"{self.collection_name} - v{self.version}"
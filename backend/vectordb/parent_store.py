@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from langchain_core.documents import Document
+
+from vectordb.cache import LocalLRUCache
+
+logger = logging.getLogger(__name__)
+
+# Parsed per-document element files, keyed by (path, mtime) so re-ingestion is picked up
+_documents = LocalLRUCache(max_size=256)
+
+
+def resolve_parent_window(module_config: dict = None, override: int = None) -> int:
+    """Neighbouring elements to add on each side of a hit; 0 maps hits to their parent only"""
+    if override is not None:
+        return override
+    default = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('PARENT_WINDOW', 0)
+    return (module_config or {}).get('parent_window', default)
+
+
+class ParentElementStore:
+    """Original elements of each indexed document, in reading order.
+
+    What gets embedded is a summary of an element; this keeps the element
+    itself so hits can be answered with the full text. Stored as one JSON
+    file per document under ``<persist_directory>/<collection_name>.parents/``,
+    keyed by element_index, so an element's neighbours are simply the
+    adjacent indices.
+    """
+
+    def __init__(self, collection_name: str, persist_directory: str):
+        self.path = os.path.join(persist_directory, f"{collection_name}.parents")
+
+    def _document_path(self, document_id) -> str:
+        return os.path.join(self.path, f"{document_id}.json")
+
+    def save_document(self, document_id, elements: List[dict]):
+        """Replace the stored elements of a document; each needs element_index and text"""
+        os.makedirs(self.path, exist_ok=True)
+        path = self._document_path(document_id)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({str(element['element_index']): element for element in elements}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def load_document(self, document_id) -> Dict[int, dict]:
+        path = self._document_path(document_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        key = (path, mtime)
+        elements = _documents.get(key)
+        if elements is None:
+            with open(path) as f:
+                elements = {int(index): element for index, element in json.load(f).items()}
+            _documents.set(key, elements)
+        return elements
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def expand(self, results: List[Tuple[Document, float]], window: int = 0) -> List[Tuple[Document, float]]:
+        """Replace hits with their parent elements plus `window` neighbours on each side.
+
+        Overlapping or touching windows from the same document are merged into
+        one passage that keeps the best hit's score and metadata. Hits without
+        stored parents (e.g. indexed before this existed) pass through unchanged.
+        """
+        by_document, passthrough = {}, []
+        for doc, score in results:
+            document_id = doc.metadata.get('document_id')
+            element_index = doc.metadata.get('element_index')
+            if document_id is None or element_index is None or element_index not in self.load_document(document_id):
+                passthrough.append((doc, score))
+                continue
+            by_document.setdefault(document_id, []).append((element_index, doc, score))
+
+        expanded = []
+        for document_id, hits in by_document.items():
+            elements = self.load_document(document_id)
+            spans = sorted(
+                ((max(0, index - window), index + window, doc, score) for index, doc, score in hits),
+                key=lambda span: (span[0], span[1])
+            )
+            merged = []
+            for start, end, doc, score in spans:
+                if merged and start <= merged[-1][1] + 1:
+                    last = merged[-1]
+                    best_doc, best_score = (doc, score) if score > last[3] else (last[2], last[3])
+                    merged[-1] = [last[0], max(last[1], end), best_doc, best_score]
+                else:
+                    merged.append([start, end, doc, score])
+
+            for start, end, doc, score in merged:
+                indices = [index for index in range(start, end + 1) if index in elements]
+                expanded.append((
+                    Document(
+                        id=doc.id,
+                        page_content="\n\n".join(elements[index]['text'] for index in indices),
+                        metadata={**doc.metadata, 'element_range': [indices[0], indices[-1]]},
+                    ),
+                    score,
+                ))
+
+        return sorted(expanded + passthrough, key=lambda hit: hit[1], reverse=True)
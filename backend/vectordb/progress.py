@@ -0,0 +1,144 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Live progress outlives a crashed worker by at most this long
+LIVE_PROGRESS_TTL = 3600
+
+TASK_FIELDS = [
+    'current_document', 'progress_percentage',
+    'processed_documents', 'successful_documents', 'failed_documents',
+]
+
+
+def progress_key(task_id: str) -> str:
+    return f"vectordb:progress:{task_id}"
+
+
+def live_progress(task_id: str):
+    """Latest progress of a running build, including sub-document detail, or None"""
+    try:
+        return shared_cache.get(progress_key(task_id))
+    except Exception as e:
+        logger.warning(f"Live progress read failed for task {task_id}: {e}")
+        return None
+
+
+class ProgressReporter:
+    """Buffers a module build's progress and writes it out at most every PROGRESS_FLUSH_SECONDS.
+
+    Counters live in memory. The VectorDBTask row and the Celery state (a row
+    in the django-db result backend) are written together on flush, which also
+    happens at once when the build starts, a document fails or the build ends.
+    Sub-document progress (stage, pages, chunks) only goes to the Django cache
+    (Redis in deployment), at most every PROGRESS_LIVE_SECONDS.
+    """
+
+    def __init__(self, task, task_obj, total_documents: int):
+        config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+        self.task = task
+        self.task_obj = task_obj
+        self.total = total_documents
+        self.flush_interval = config.get('PROGRESS_FLUSH_SECONDS', 5)
+        self.live_interval = config.get('PROGRESS_LIVE_SECONDS', 1)
+        self.index = 0
+        self.current_document = ''
+        self.processed = self.successful = self.failed = 0
+        self.detail = {}
+        self.flushes = 0
+        self._dirty = False
+        self._flushed_at = None
+        self._published_at = None
+
+    @property
+    def percentage(self) -> int:
+        """5-95 while documents are processed, counting the current document's chunks"""
+        if not self.total:
+            return 5
+        done = self.processed
+        if self.detail.get('chunks_total'):
+            done += self.detail.get('chunks_done', 0) / self.detail['chunks_total']
+        return min(95, int((done / self.total) * 90) + 5)
+
+    def snapshot(self) -> dict:
+        return {
+            'progress': self.percentage,
+            'status': f'Processing document {self.index}/{self.total}',
+            'current_document': self.current_document,
+            'processed': self.processed,
+            'total': self.total,
+            'successful': self.successful,
+            'failed': self.failed,
+            **self.detail,
+        }
+
+    def start_document(self, index: int, name: str):
+        self.index = index
+        self.current_document = name
+        self.detail = {}
+        self._dirty = True
+        self._maybe_flush(force=self._flushed_at is None)
+
+    def update(self, **detail):
+        """Sub-document progress from the ingestion pipeline, e.g. stage, pages, chunks_done"""
+        stage_changed = detail.get('stage') != self.detail.get('stage')
+        self.detail.update(detail)
+        self._dirty = True
+        if not self._maybe_flush():
+            self._publish(force=stage_changed)
+
+    def finish_document(self, success: bool = True):
+        self.processed += 1
+        if success:
+            self.successful += 1
+        else:
+            self.failed += 1
+        self.detail = {}
+        self._dirty = True
+        self._maybe_flush(force=not success or self.processed == self.total)
+
+    def _maybe_flush(self, force: bool = False) -> bool:
+        if force or self._flushed_at is None or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def _publish(self, force: bool = False):
+        now = time.monotonic()
+        if not force and self._published_at is not None and now - self._published_at < self.live_interval:
+            return
+        self._published_at = now
+        # Live progress is best-effort; a cache outage must not fail the build
+        try:
+            shared_cache.set(progress_key(self.task_obj.task_id), self.snapshot(), LIVE_PROGRESS_TTL)
+        except Exception as e:
+            logger.warning(f"Live progress write failed for task {self.task_obj.task_id}: {e}")
+
+    def flush(self):
+        """Write buffered progress to the task row, the Celery state and the live cache"""
+        if not self._dirty:
+            return
+        self.task_obj.current_document = self.current_document
+        self.task_obj.progress_percentage = self.percentage
+        self.task_obj.processed_documents = self.processed
+        self.task_obj.successful_documents = self.successful
+        self.task_obj.failed_documents = self.failed
+        self.task_obj.save(update_fields=TASK_FIELDS)
+        self.task.update_state(state='PROGRESS', meta=self.snapshot())
+        self._publish(force=True)
+        self._flushed_at = time.monotonic()
+        self._dirty = False
+        self.flushes += 1
+
+    def close(self):
+        """Final flush; the live entry is dropped so readers fall back to the task row"""
+        self.flush()
+        try:
+            shared_cache.delete(progress_key(self.task_obj.task_id))
+        except Exception as e:
+            logger.warning(f"Live progress cleanup failed for task {self.task_obj.task_id}: {e}")
+        logger.info(f"Progress for task {self.task_obj.task_id}: {self.processed} documents, {self.flushes} writes")
@@ -0,0 +1,165 @@
+import logging
+import time
+from concurrent.futures import wait
+from typing import Dict, Any
+
+from django.conf import settings
+from langchain_core.prompts import ChatPromptTemplate
+
+from vectordb.context_packer import ContextPacker, resolve_token_budget
+from vectordb.parent_store import ParentElementStore, resolve_parent_window
+from vectordb.executors import fanout_executor
+from vectordb.model_router import ModelRouter, resolve_routing
+from vectordb.filters import build_where
+from vectordb.models import ModuleVectorStore
+from vectordb.retrieval import (
+    open_vector_store, similarity_search_with_scores, apply_score_cutoff,
+    resolve_score_threshold, resolve_score_gap, resolve_answer_min_score, has_relevant_context, NO_ANSWER
+)
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEXT = """Answer the question based on the context below. The context comes from several
+modules of the same project; each excerpt is prefixed with the module it belongs to.
+Mention which module(s) the answer comes from.
+If the answer is not contained within the text below, say "I don't know".
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+
+def normalise_score(score: float, threshold: float) -> float:
+    """Rescale a module's relevance score so its own threshold maps to 0 and a perfect match to 1.
+
+    Modules can use different embedding models and thresholds, so raw scores are
+    not comparable across shards; distance above each module's bar is.
+    """
+    if threshold >= 1.0:
+        return 0.0
+    return max(0.0, (score - threshold) / (1.0 - threshold))
+
+
+class ProjectSearchService:
+    """Fan a question out to every ready module collection of a project"""
+
+    def __init__(self, model_provider: str = "mistralai"):
+        self.model_provider = model_provider
+        self.prompt = ChatPromptTemplate.from_template(PROMPT_TEXT)
+
+    def _search_module(self, vector_store: ModuleVectorStore, query: str, k: int, where: dict = None):
+        store = open_vector_store(
+            vector_store.collection_name,
+            vector_store.persistence_directory,
+            vector_store.embedding_model,
+            vector_store.config
+        )
+        threshold = resolve_score_threshold(vector_store.config)
+        results = similarity_search_with_scores(store, vector_store.collection_name, query, k=k, filters=where)
+        results = apply_score_cutoff(results, threshold, resolve_score_gap(vector_store.config))
+        results = ParentElementStore(vector_store.collection_name, vector_store.persistence_directory).expand(
+            results, resolve_parent_window(vector_store.config)
+        )
+        return [
+            {
+                'document': doc,
+                'score': score,
+                'normalized_score': normalise_score(score, threshold),
+                'module_id': vector_store.module.id,
+                'module_name': vector_store.module.name,
+                # The module's own answer bar, budget and models; modules can override them in their config
+                'answer_min_score': resolve_answer_min_score(vector_store.config),
+                'token_budget': resolve_token_budget(vector_store.config),
+                'routing': resolve_routing(vector_store.config),
+            }
+            for doc, score in results
+        ]
+
+    def search(self, project, query: str, k: int = 5, latency_budget_ms: int = None,
+               filters: dict = None) -> Dict[str, Any]:
+        """Search all ready modules concurrently; shards that miss the budget are skipped"""
+        if latency_budget_ms is None:
+            latency_budget_ms = settings.VECTOR_DB_CONFIG.get('PROJECT_SEARCH_BUDGET_MS', 1500)
+
+        vector_stores = list(
+            ModuleVectorStore.objects.select_related('module').filter(
+                module__project=project, module__is_active=True, status='ready'
+            )
+        )
+        where = build_where(filters)
+        futures = {
+            fanout_executor.submit(self._search_module, vector_store, query, k, where): vector_store
+            for vector_store in vector_stores
+        }
+        done, not_done = wait(futures, timeout=latency_budget_ms / 1000)
+
+        hits, skipped = [], []
+        for future in not_done:
+            future.cancel()
+            skipped.append({'module_id': futures[future].module.id, 'reason': 'timeout'})
+        for future in done:
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                logger.warning(f"Search failed for module {futures[future].module.id}: {e}")
+                skipped.append({'module_id': futures[future].module.id, 'reason': 'error'})
+
+        hits.sort(key=lambda hit: hit['normalized_score'], reverse=True)
+        return {
+            'hits': hits[:k],
+            'modules_searched': len(done),
+            'modules_skipped': skipped,
+        }
+
+    def answer(self, project, query: str, k: int = 5, latency_budget_ms: int = None,
+               filters: dict = None) -> Dict[str, Any]:
+        """Project-level RAG: merged search across modules, one answer with module attribution"""
+        start_time = time.time()
+        search = self.search(project, query, k, latency_budget_ms, filters)
+        retrieval_time = int((time.time() - start_time) * 1000)
+
+        generation_start = time.time()
+        # Each hit is judged against its own module's bar; the tightest budget among the hit modules applies
+        # and the best hit's module picks the models
+        if any(has_relevant_context([hit['score']], hit['answer_min_score']) for hit in search['hits']):
+            router = ModelRouter(search['hits'][0]['routing'], self.model_provider, 0.0)
+            packer = ContextPacker(router.routing['large_model'], min(hit['token_budget'] for hit in search['hits']))
+            # Prefix each excerpt with its module so the model can attribute the answer
+            attributed = [hit['document'].model_copy(update={
+                'page_content': f"[Module: {hit['module_name']}]\n{hit['document'].page_content}"
+            }) for hit in search['hits']]
+            scores = [hit['normalized_score'] for hit in search['hits']]
+            packed = packer.pack(attributed, scores)
+            generated = router.invoke(
+                self.prompt.invoke({"question": query, "context": packed['text']}),
+                query, [hit['score'] for hit in search['hits']], packed['token_count']
+            )
+            answer, model = generated['answer'], generated['model']
+        else:
+            answer, model = NO_ANSWER, None
+        generation_time = int((time.time() - generation_start) * 1000)
+
+        return {
+            'query': query,
+            'answer': answer,
+            'sources': [
+                {
+                    'content': hit['document'].page_content,
+                    'metadata': hit['document'].metadata,
+                    'score': round(hit['score'], 4),
+                    'normalized_score': round(hit['normalized_score'], 4),
+                    'module_id': hit['module_id'],
+                    'module_name': hit['module_name'],
+                }
+                for hit in search['hits']
+            ],
+            'modules_searched': search['modules_searched'],
+            'modules_skipped': search['modules_skipped'],
+            'retrieval_time_ms': retrieval_time,
+            'generation_time_ms': generation_time,
+            'total_time_ms': int((time.time() - start_time) * 1000),
+            'metadata': {'project_id': project.id, 'model': model},
+        }
@@ -0,0 +1,175 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from vectordb.hnsw_store import MmapVectorStore, StoreState, save_array, write_atomic
+
+QUANTIZATIONS = ('int8', 'binary')
+DEFAULT_RESCORE_FACTORS = {'int8': 4, 'binary': 10}
+
+# Rows decoded per step of the first pass, bounding the transient float32 copy
+BLOCK_ROWS = 16384
+
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+class QuantizedIndex:
+    """Codes plus the parameters they were encoded with; replaced, never changed, once published"""
+
+    def __init__(self, codes: np.ndarray = None, scale: np.ndarray = None, offset: np.ndarray = None,
+                 sq_norms: np.ndarray = None):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.sq_norms = sq_norms
+
+
+class QuantizedVectorStore(MmapVectorStore):
+    """Flat index over int8 or binary codes; float vectors stay on disk for rescoring.
+
+    The first pass scans compact codes held in memory (4x smaller than float32
+    for int8, 32x for binary), keeps the best ``k * rescore_factor`` candidates
+    and re-ranks only those with exact distances read from the mmapped
+    float vectors, so returned scores are full precision.
+    """
+
+    DIRECTORY_SUFFIX = '.quant'
+
+    def __init__(self, collection_name: str, embedding_function: Embeddings, persist_directory: str,
+                 space: str = 'cosine', quantization: str = 'int8', rescore_factor: int = None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor or DEFAULT_RESCORE_FACTORS[quantization]
+        super().__init__(collection_name, embedding_function, persist_directory, space)
+
+    def _prepare(self, vectors: np.ndarray, space: str) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if space == 'cosine':
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            return vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _blocks(self, state: StoreState):
+        for start in range(0, state.count, BLOCK_ROWS):
+            yield self._prepare(state.vectors[start:min(start + BLOCK_ROWS, state.count)], state.space)
+
+    def _encode(self, index: QuantizedIndex, prepared: np.ndarray) -> np.ndarray:
+        if self.quantization == 'int8':
+            return np.clip(np.round(prepared / index.scale * 127), -127, 127).astype(np.int8)
+        return np.packbits(prepared > index.offset, axis=-1)
+
+    def _rebuild(self, state: StoreState) -> QuantizedIndex:
+        """Fit the per-dimension range (int8) or centre (binary) over all rows and encode them"""
+        index = QuantizedIndex()
+        if self.quantization == 'int8':
+            index.scale = np.maximum(
+                np.max([np.abs(block).max(axis=0) for block in self._blocks(state)], axis=0), 1e-6
+            ).astype(np.float32)
+        else:
+            index.offset = (
+                np.sum([block.sum(axis=0) for block in self._blocks(state)], axis=0) / state.count
+            ).astype(np.float32)
+        index.codes = np.concatenate([self._encode(index, block) for block in self._blocks(state)])
+        if state.space == 'l2':
+            index.sq_norms = np.concatenate([np.sum(block ** 2, axis=1) for block in self._blocks(state)])
+        return index
+
+    def _load_index(self, state: StoreState, generation: Optional[int]):
+        codes_path = self._file('codes', 'npy', generation)
+        quantizer_path = self._file('quantizer', 'npz', generation)
+        if not (os.path.exists(codes_path) and os.path.exists(quantizer_path)):
+            return None
+        params = np.load(quantizer_path)
+        if str(params['quantization']) != self.quantization:
+            # Quantization mode changed in the module config; re-encode from the float vectors
+            return None
+        # Codes past the committed index belong to a crashed append and are re-encoded
+        return QuantizedIndex(
+            codes=np.load(codes_path)[:state.indexed],
+            scale=params['scale'] if params['scale'].size else None,
+            offset=params['offset'] if params['offset'].size else None,
+            sq_norms=params['sq_norms'][:state.indexed] if params['sq_norms'].size else None,
+        )
+
+    def _extend_index(self, index, state: StoreState, start: int):
+        if index is None:
+            return self._rebuild(state)
+        prepared = self._prepare(state.vectors[start:state.count], state.space)
+        if self.quantization == 'int8' and bool(np.any(np.abs(prepared).max(axis=0) > index.scale)):
+            return self._rebuild(state)
+        return QuantizedIndex(
+            codes=np.concatenate([index.codes[:start], self._encode(index, prepared)]),
+            scale=index.scale,
+            offset=index.offset,
+            sq_norms=(
+                np.concatenate([index.sq_norms[:start], np.sum(prepared ** 2, axis=1)])
+                if state.space == 'l2' else None
+            ),
+        )
+
+    def _save_index(self, index, generation: int):
+        save_array(self._file('codes', 'npy', generation), index.codes)
+        empty = np.zeros(0, dtype=np.float32)
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    quantization=np.array(self.quantization),
+                    scale=index.scale if index.scale is not None else empty,
+                    offset=index.offset if index.offset is not None else empty,
+                    sq_norms=index.sq_norms if index.sq_norms is not None else empty,
+                )
+
+        write_atomic(self._file('quantizer', 'npz', generation), write)
+
+    def _approximate_scores(self, index: QuantizedIndex, codes: np.ndarray, query: np.ndarray,
+                            sq_norms: np.ndarray = None) -> np.ndarray:
+        """First-pass scores, higher is better"""
+        if self.quantization == 'binary':
+            query_bits = np.packbits(query > index.offset)
+            return -POPCOUNT[codes ^ query_bits].sum(axis=1).astype(np.float32)
+
+        weights = (query * index.scale / 127).astype(np.float32)
+        scores = np.concatenate([
+            codes[start:start + BLOCK_ROWS].astype(np.float32) @ weights
+            for start in range(0, len(codes), BLOCK_ROWS)
+        ])
+        if sq_norms is not None:
+            # Ranking by -||v - q||^2 only needs ||v||^2 - 2 v.q
+            scores = 2 * scores - sq_norms
+        return scores
+
+    def _index_search(self, state: StoreState, query: np.ndarray, k: int,
+                      allowed: Optional[set]) -> List[Tuple[int, float]]:
+        index = state.index
+        prepared = self._prepare(query, state.space)
+        if allowed is not None:
+            labels = np.fromiter(sorted(allowed), dtype=np.int64)
+            codes = index.codes[labels]
+            sq_norms = index.sq_norms[labels] if index.sq_norms is not None else None
+        else:
+            labels = None
+            codes = index.codes[:state.count]
+            sq_norms = index.sq_norms[:state.count] if index.sq_norms is not None else None
+
+        scores = self._approximate_scores(index, codes, prepared, sq_norms)
+        if allowed is None and state.deleted:
+            scores[[label for label in state.deleted if label < len(scores)]] = -np.inf
+
+        count = min(k * self.rescore_factor, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count]
+        candidates = labels[top] if labels is not None else top
+        return self._exact_search(
+            state, query, k, [int(label) for label in candidates if int(label) not in state.deleted]
+        )
+
+    def resident_bytes(self) -> int:
+        index = self._state.index
+        if index is None:
+            return 0
+        arrays = [index.codes, index.scale, index.offset, index.sq_norms]
+        return sum(array.nbytes for array in arrays if array is not None)
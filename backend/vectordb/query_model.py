@@ -1,30 +1,45 @@
-from langgraph.graph import START, StateGraph
+from langgraph.graph import END, START, StateGraph
 from langchain_core.documents import Document
 from typing_extensions import List, TypedDict
-from langchain import hub
-from langchain.chat_models import init_chat_model
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from vectordb.llm import get_chat_model
+from langchain_core.runnables import RunnableLambda
+from vectordb.embeddings import get_embeddings
+from vectordb.context_packer import ContextPacker, resolve_token_budget
+from vectordb.parent_store import ParentElementStore
+from vectordb.model_router import ModelRouter
+from vectordb.llm import get_rag_prompt
+from vectordb.single_flight import answer_flight, acoalesce_key, coalesce_key
+from vectordb.executors import run_in_search_pool
+from vectordb.retrieval import (
+    open_vector_store, similarity_search_with_scores, apply_score_cutoff, resolve_score_gap,
+    has_relevant_context, no_answer
+)
 
 
 class State(TypedDict):
     question: str
     context: List[Document]
+    scores: List[float]
+    closest: List[Document]
+    closest_scores: List[float]
+    filters: dict
+    parent_window: int
     answer: str
+    model: str
+    route_reason: str
+    cached: bool
+    degraded: bool
+    usage: dict
 
 
 class CREATE_VECTOR_DB:
     def __init__(self, chat_model_name: str, model_name: str, model_provider: str, temperature: float):
-        self.llm = init_chat_model(chat_model_name, model_provider=model_provider, temperature=temperature)
+        self.llm = get_chat_model(chat_model_name, model_provider, temperature)
 
-        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        self.embeddings = get_embeddings(model_name)
 
-    def load_model(self, collection_name, persist_directory):
-        self.vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory,
-        )
+    def load_model(self, collection_name, persist_directory, vector_store_config=None):
+        self.vector_store = open_vector_store(collection_name, persist_directory, self.embeddings.model_name, vector_store_config)
 
         return self.vector_store
     
@@ -37,7 +52,7 @@ class CREATE_VECTOR_DB:
 
 
 class Retrieval:
-    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7):
+    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7, vector_store_config=None, parent_window=0, routing=None, answer_min_score=0.0, token_budget=None):
         self.vector_store_db = CREATE_VECTOR_DB(
             chat_model_name=chat_model_name,
             model_name=model_name,
@@ -46,28 +61,70 @@ class Retrieval:
         )
         self.vector_store = self.vector_store_db.load_model(
             collection_name=collection_name,
-            persist_directory=persist_directory
+            persist_directory=persist_directory,
+            vector_store_config=vector_store_config
         )
         self.llm = self.vector_store_db.llm_model()
-        self.prompt = hub.pull("rlm/rag-prompt")
+        self.packer = ContextPacker(
+            chat_model_name, token_budget=resolve_token_budget() if token_budget is None else token_budget
+        )
+        self.prompt = get_rag_prompt()
+        self.collection_name = collection_name
         self.k = k
         self.score_threshold = score_threshold 
+        self.score_gap = resolve_score_gap()
+        self.parent_store = ParentElementStore(collection_name, persist_directory)
+        self.parent_window = parent_window
+        self.router = ModelRouter(routing, model_provider, temperature, collection_name)
+        self.answer_min_score = answer_min_score
 
     def retrieve(self, state: State):
-        retrieved_docs = self.vector_store.similarity_search(state["question"], k=self.k, score_threshold=self.score_threshold)
+        closest = similarity_search_with_scores(
+            self.vector_store, self.collection_name, state["question"], k=self.k,
+            filters=state.get("filters")
+        )
+        results = apply_score_cutoff(closest, self.score_threshold, self.score_gap)
+        results = self.parent_store.expand(results, self.parent_window)
+        retrieved_docs = [doc for doc, _ in results]
         for doc in retrieved_docs:
             print(f"Retrieved Document: {doc.page_content}\n")
-        return {"context": retrieved_docs}
+        return {
+            "context": retrieved_docs,
+            "scores": [score for _, score in results],
+            "closest": [doc for doc, _ in closest],
+            "closest_scores": [score for _, score in closest],
+        }
+
+    def needs_llm(self, state: State) -> bool:
+        """False when retrieval found nothing relevant enough to answer from"""
+        return has_relevant_context(state.get("scores"), self.answer_min_score)
+
+    def no_answer(self, state: State):
+        return no_answer(list(zip(state.get("closest") or [], state.get("closest_scores") or [])))
 
+    async def aretrieve(self, state: State):
+        return await run_in_search_pool(self.retrieve, state)
+
+    def build_messages(self, state: State, packed: dict = None):
+        docs_content = (packed or self.packer.pack(state["context"], state.get("scores")))["text"]
+        return self.prompt.invoke({"question": state["question"], "context": docs_content})
 
     def generate(self, state: State):
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        messages = self.prompt.invoke({"question": state["question"], "context": docs_content})
-        response = self.llm.invoke(messages)
-        return {"answer": response.content}
+        packed = self.packer.pack(state["context"], state.get("scores"))
+        return self.router.invoke(
+            self.build_messages(state, packed), state["question"], state.get("scores"), packed["token_count"],
+            packed["text"]
+        )
+
+    async def agenerate(self, state: State):
+        packed = self.packer.pack(state["context"], state.get("scores"))
+        return await self.router.ainvoke(
+            self.build_messages(state, packed), state["question"], state.get("scores"), packed["token_count"],
+            packed["text"]
+        )
 
 class Graph:
-    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7):
+    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7, vector_store_config=None, parent_window=0, routing=None, answer_min_score=0.0, token_budget=None):
         self.retrieval = Retrieval(
             chat_model_name=chat_model_name,
             model_name=model_name,
@@ -76,7 +133,12 @@ class Graph:
             persist_directory=persist_directory,
             collection_name=collection_name,
             k=k,
-            score_threshold=score_threshold
+            score_threshold=score_threshold,
+            vector_store_config=vector_store_config,
+            parent_window=parent_window,
+            routing=routing,
+            answer_min_score=answer_min_score,
+            token_budget=token_budget
         )
 
     def retrieve(self, state: State):
@@ -84,15 +146,25 @@ class Graph:
 
     def generate(self, state: State):
         return self.retrieval.generate(state)
-    
+
+    def route(self, state: State) -> str:
+        return "generate" if self.retrieval.needs_llm(state) else "no_answer"
+
     def graph_builder(self):
-        graph_builder = StateGraph(State).add_sequence([self.retrieve, self.generate])
+        graph_builder = StateGraph(State)
+        graph_builder.add_node("retrieve", RunnableLambda(self.retrieve, afunc=self.retrieval.aretrieve))
+        graph_builder.add_node("generate", RunnableLambda(self.generate, afunc=self.retrieval.agenerate))
+        # Nothing relevant retrieved: answer from retrieval alone and skip the LLM call
+        graph_builder.add_node("no_answer", self.retrieval.no_answer)
         graph_builder.add_edge(START, "retrieve")
+        graph_builder.add_conditional_edges("retrieve", self.route, ["generate", "no_answer"])
+        graph_builder.add_edge("generate", END)
+        graph_builder.add_edge("no_answer", END)
         graph = graph_builder.compile()
         return graph
     
 class RUN_GRAPH:
-    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7):
+    def __init__(self, chat_model_name, model_name, model_provider, temperature, persist_directory, collection_name, k=5, score_threshold=0.7, vector_store_config=None, parent_window=0, routing=None, answer_min_score=0.0, token_budget=None):
         self.graph = Graph(
             chat_model_name=chat_model_name,
             model_name=model_name,
@@ -101,13 +173,34 @@ class RUN_GRAPH:
             persist_directory=persist_directory,
             collection_name=collection_name,
             k=k,
-            score_threshold=score_threshold
+            score_threshold=score_threshold,
+            vector_store_config=vector_store_config,
+            parent_window=parent_window,
+            routing=routing,
+            answer_min_score=answer_min_score,
+            token_budget=token_budget
         ).graph_builder()
-    def run(self, question: str):
-        result = self.graph.invoke({"question": question})
+        self.collection_name = collection_name
+        # Graph options that change the answer, so only equivalent requests are coalesced
+        self.options = {
+            "k": k, "score_threshold": score_threshold, "parent_window": parent_window, "routing": routing,
+            "answer_min_score": answer_min_score, "token_budget": token_budget
+        }
+
+    def _flight_key(self, question: str, filters: dict = None) -> str:
+        return coalesce_key(self.collection_name, question, filters=filters, **self.options)
+
+    async def _aflight_key(self, question: str, filters: dict = None) -> str:
+        return await acoalesce_key(self.collection_name, question, filters=filters, **self.options)
+
+    def run(self, question: str, filters: dict = None):
+        state = {"question": question, "filters": filters}
+        result = answer_flight.do(self._flight_key(question, filters), lambda: self.graph.invoke(state))
         return result
-        print(f"Context: {result['context']}\n\n")
-        print(f"Answer: {result['answer']}")
+
+    async def arun(self, question: str, filters: dict = None):
+        state = {"question": question, "filters": filters}
+        return await answer_flight.ado(await self._aflight_key(question, filters), lambda: self.graph.ainvoke(state))
 
 if __name__ == "__main__":
     run_graph = RUN_GRAPH()
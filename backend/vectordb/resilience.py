@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+
+from vectordb.executors import llm_executor
+
+try:
+    import httpx
+except ImportError:  # offline fake providers make no HTTP calls
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Hedging waits for this many observed latencies before trusting the percentile
+MIN_LATENCY_SAMPLES = 20
+
+TRANSIENT_ERRORS = (TimeoutError, asyncio.TimeoutError, ConnectionError) + ((httpx.TransportError,) if httpx else ())
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for failures that say the provider is unhealthy: timeouts, connection errors, 5xx and 429.
+
+    Client errors (bad request, auth, content too long) would fail the same way
+    on a healthy provider, so they must not open the circuit.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        response = getattr(error, 'response', None)
+        status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        # Provider SDKs often wrap the HTTP error
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class LLMUnavailable(Exception):
+    """An LLM call failed fast: circuit open, deadline exceeded or provider error"""
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedging delay"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single trial call through after a cooldown.
+
+    A trial that never reports back (cancelled, or a stream its reader
+    abandoned) is given up after another cooldown and the next call becomes
+    the trial, so the breaker cannot stay half-open forever.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state != self.CLOSED and now - self.opened_at >= self.reset_seconds:
+                if self.state == self.HALF_OPEN:
+                    logger.warning(f"Trial call for {self.name} never finished, allowing another")
+                self.state = self.HALF_OPEN
+                # Reused as the trial's start time while half-open
+                self.opened_at = now
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Runs one model's calls under a deadline, hedges slow ones and trips a circuit breaker.
+
+    A call still pending after the p95 of recent latencies gets a second,
+    identical attempt and the first to succeed wins. Calls that miss the
+    deadline or fail transiently (see is_transient) count towards the breaker;
+    while it is open, calls fail immediately with LLMUnavailable instead of
+    tying up a worker. Any other error is re-raised as is and not recorded.
+    """
+
+    def __init__(self, name: str):
+        config = getattr(settings, 'LLM_CONFIG', {})
+        self.name = name
+        self.deadline = config.get('DEADLINE_SECONDS', 30)
+        self.hedge = config.get('HEDGE', True)
+        self.hedge_percentile = config.get('HEDGE_PERCENTILE', 95)
+        self.hedge_min_delay = config.get('HEDGE_MIN_DELAY_SECONDS', 1.0)
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=config.get('BREAKER_FAILURE_THRESHOLD', 5),
+            reset_seconds=config.get('BREAKER_RESET_SECONDS', 30),
+        )
+        self.latency = LatencyTracker()
+        self.hedged = 0
+
+    def _hedge_delay(self):
+        if not self.hedge or self.breaker.state != CircuitBreaker.CLOSED:
+            return None
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None:
+            return None
+        return max(delay, self.hedge_min_delay)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise LLMUnavailable(f"Circuit open for {self.name}")
+
+    def _succeeded(self, started: float):
+        self.latency.record(time.monotonic() - started)
+        self.breaker.record_success()
+
+    def _failed(self, error: BaseException = None) -> BaseException:
+        """The exception to raise for a failed call; only timeouts and transient errors reach the breaker"""
+        if error is not None and not is_transient(error):
+            return error
+        self.breaker.record_failure()
+        if error is None:
+            return LLMUnavailable(f"{self.name} missed its {self.deadline}s deadline")
+        return LLMUnavailable(f"{self.name} failed: {error}")
+
+    def call(self, func, deadline: float = None, hedge: bool = True):
+        """Run func() on the LLM pool and return its result, or raise LLMUnavailable"""
+        self._admit()
+        started = time.monotonic()
+        expires = started + (deadline or self.deadline)
+        hedge_delay = self._hedge_delay() if hedge else None
+
+        pending, error = {llm_executor.submit(func)}, None
+        while pending:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = min(remaining, hedge_delay) if hedge_delay else remaining
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self._succeeded(started)
+                    return future.result()
+                error = future.exception()
+                if not is_transient(error):
+                    # The hedged attempt would fail the same way
+                    for other in pending:
+                        other.cancel()
+                    raise error
+            if not done and hedge_delay:
+                logger.info(f"Hedging {self.name} call after {hedge_delay:.2f}s")
+                self.hedged += 1
+                pending.add(llm_executor.submit(func))
+                hedge_delay = None
+
+        # Timed-out attempts keep running on the pool until the HTTP timeout; nobody waits for them
+        raise self._failed(None if pending else error)
+
+    async def acall(self, afunc, deadline: float = None, hedge: bool = True):
+        """Async variant of call(); afunc is a coroutine function"""
+        self._admit()
+        started = time.monotonic()
+        expires = started + (deadline or self.deadline)
+        hedge_delay = self._hedge_delay() if hedge else None
+
+        pending, error = {asyncio.ensure_future(afunc())}, None
+        try:
+            while pending:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = min(remaining, hedge_delay) if hedge_delay else remaining
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._succeeded(started)
+                        return task.result()
+                    error = task.exception()
+                    if not is_transient(error):
+                        raise error
+                if not done and hedge_delay:
+                    logger.info(f"Hedging {self.name} call after {hedge_delay:.2f}s")
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future(afunc()))
+                    hedge_delay = None
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise self._failed(None if pending else error)
+
+    async def astream(self, agen_factory):
+        """Yield from an async iterator, failing if the first or any later chunk takes past the deadline"""
+        self._admit()
+        iterator = agen_factory().__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), self.deadline)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise self._failed(None)
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                raise self._failed(e)
+            yield chunk
+        # Stream durations would skew the hedging percentile, so only the breaker hears about it
+        self.breaker.record_success()
+
+    def stats(self):
+        return {
+            'state': self.breaker.state,
+            'failures': self.breaker.failures,
+            'hedged': self.hedged,
+            'p95_seconds': self.latency.percentile(95),
+        }
+
+
+_callers = {}
+_callers_lock = threading.Lock()
+
+
+def get_caller(model_name: str) -> ResilientCaller:
+    """Process-wide deadline/hedging/breaker state for a model"""
+    with _callers_lock:
+        if model_name not in _callers:
+            _callers[model_name] = ResilientCaller(model_name)
+        return _callers[model_name]
+
+
+def resilience_stats():
+    with _callers_lock:
+        return {name: caller.stats() for name, caller in _callers.items()}
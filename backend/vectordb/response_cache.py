@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from vectordb.cache import LocalLRUCache, get_index_version
+
+logger = logging.getLogger(__name__)
+
+# Prune the table back to its size limit after this many writes per process
+PRUNE_EVERY = 100
+
+
+def render_prompt(messages) -> str:
+    """Canonical text of a prompt value, message list or string, roles included"""
+    if hasattr(messages, 'to_messages'):
+        messages = messages.to_messages()
+    if isinstance(messages, str):
+        return messages
+    return json.dumps([[message.type, message.content] for message in messages], default=str)
+
+
+class ResponseCache:
+    """Answers of temperature-0 LLM calls, keyed by a hash of model name and rendered prompt.
+
+    An in-process LRU sits in front of the LLMResponseCache table, which
+    survives restarts and is shared by every worker. The prompt already
+    contains the retrieved context and chat history, so a hit is exactly the
+    call that would have been made. Keys also carry the collection's index
+    version, so a re-index retires every worker's in-process entries at once.
+    """
+
+    def __init__(self):
+        config = getattr(settings, 'LLM_CONFIG', {})
+        self.enabled = config.get('RESPONSE_CACHE', True)
+        self.max_entries = config.get('RESPONSE_CACHE_MAX_ENTRIES', 50000)
+        self.local = LocalLRUCache(max_size=config.get('RESPONSE_CACHE_L1_SIZE', 512))
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.enabled and not temperature
+
+    @staticmethod
+    def make_key(model_name: str, messages, collection_name: str = "") -> str:
+        version = get_index_version(collection_name) if collection_name else 0
+        payload = json.dumps([model_name, render_prompt(messages), collection_name or "", version])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        from vectordb.models import LLMResponseCache
+        try:
+            value = LLMResponseCache.objects.filter(key=key).values_list('response_text', flat=True).first()
+            if value is not None:
+                LLMResponseCache.objects.filter(key=key).update(
+                    hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+                )
+        except Exception as e:
+            logger.warning(f"LLM response cache read failed: {e}")
+            return None
+
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: str, model_name: str, response_text: str, collection_name: str = ""):
+        self.local.set(key, response_text)
+
+        from vectordb.models import LLMResponseCache
+        try:
+            LLMResponseCache.objects.update_or_create(
+                key=key,
+                defaults={
+                    'model_name': model_name,
+                    'collection_name': collection_name or "",
+                    'response_text': response_text,
+                    'last_used_at': timezone.now(),
+                },
+            )
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop the least recently used entries beyond RESPONSE_CACHE_MAX_ENTRIES"""
+        from vectordb.models import LLMResponseCache
+        try:
+            cutoff = list(
+                LLMResponseCache.objects.order_by('-last_used_at')
+                .values_list('last_used_at', flat=True)[self.max_entries:self.max_entries + 1]
+            )
+            if not cutoff:
+                return 0
+            deleted, _ = LLMResponseCache.objects.filter(last_used_at__lte=cutoff[0]).delete()
+        except Exception as e:
+            logger.warning(f"LLM response cache prune failed: {e}")
+            return 0
+        logger.info(f"Pruned {deleted} LLM response cache entries")
+        return deleted
+
+    def invalidate(self, collection_name: str) -> int:
+        """Drop every response generated from a collection's previous contents"""
+        from vectordb.models import LLMResponseCache
+        try:
+            deleted, _ = LLMResponseCache.objects.filter(collection_name=collection_name).delete()
+        except Exception as e:
+            logger.warning(f"LLM response cache invalidation failed for {collection_name}: {e}")
+            return 0
+        # In-process entries are unreachable once the index version is bumped (see make_key)
+        return deleted
+
+    def stats(self):
+        return self.local.stats()
+
+
+response_cache = ResponseCache()
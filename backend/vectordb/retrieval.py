@@ -0,0 +1,129 @@
+import json
+import logging
+import threading
+from typing import List, Tuple
+
+from django.conf import settings
+from langchain_core.documents import Document
+
+from vectordb.cache import retrieval_cache
+from vectordb.tokens import empty_usage
+
+logger = logging.getLogger(__name__)
+
+# Returned without calling the LLM when nothing retrieved is relevant enough to answer from
+NO_ANSWER = "I couldn't find relevant information to answer your question."
+
+_vector_stores = {}
+_vector_stores_lock = threading.Lock()
+
+
+def open_vector_store(collection_name: str, persist_directory: str, embedding_model_name: str,
+                      module_config: dict = None):
+    """Return the process-wide handle for a collection, opening it on first use.
+
+    The backend and its options come from the module's config.
+    """
+    from vectordb.vector_backends import resolve_backend, backend_options
+
+    backend = resolve_backend(module_config)
+    options = backend_options(backend, module_config)
+    key = (collection_name, persist_directory, embedding_model_name, backend, json.dumps(options, sort_keys=True))
+    with _vector_stores_lock:
+        if key not in _vector_stores:
+            from vectordb.embeddings import get_embeddings
+            from vectordb.vector_backends import create_vector_store
+
+            _vector_stores[key] = create_vector_store(
+                backend, collection_name, persist_directory, get_embeddings(embedding_model_name), **options
+            )
+        return _vector_stores[key]
+
+
+def forget_vector_store(collection_name: str):
+    """Drop cached handles for a collection, e.g. after it was deleted"""
+    with _vector_stores_lock:
+        for key in [key for key in _vector_stores if key[0] == collection_name]:
+            del _vector_stores[key]
+
+
+def similarity_search_with_scores(vector_store, collection_name: str, query: str, k: int = 4,
+                                  filters: dict = None) -> List[Tuple[Document, float]]:
+    """Scored vector search with the shared retrieval cache in front of it.
+
+    Only chunk ids and scores are cached; documents are re-read by id so a hit
+    skips query embedding and the ANN search entirely.
+    """
+    key = retrieval_cache.make_key(collection_name, query, k, filters)
+
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        ids = [doc_id for doc_id, _ in cached]
+        docs_by_id = {doc.id: doc for doc in vector_store.get_by_ids(ids)} if ids else {}
+        if all(doc_id in docs_by_id for doc_id in ids):
+            return [(docs_by_id[doc_id], score) for doc_id, score in cached]
+        logger.info(f"Stale retrieval cache entry for {collection_name}, re-running search")
+
+    results = vector_store.similarity_search_with_relevance_scores(query, k=k, filter=filters)
+
+    if results and all(doc.id for doc, _ in results):
+        retrieval_cache.set(key, [(doc.id, score) for doc, score in results])
+    return results
+
+
+def apply_score_cutoff(results: List[Tuple[Document, float]], score_threshold: float,
+                       max_gap: float = None) -> List[Tuple[Document, float]]:
+    """Drop hits below the relevance threshold, then cut at the first large score gap.
+
+    A sharp drop between consecutive scores usually separates the chunks that
+    answer the question from loosely related filler, so everything after it
+    is discarded as well.
+    """
+    kept = sorted(
+        [(doc, score) for doc, score in results if score >= score_threshold],
+        key=lambda hit: hit[1],
+        reverse=True,
+    )
+    if max_gap:
+        for i in range(1, len(kept)):
+            if kept[i - 1][1] - kept[i][1] > max_gap:
+                return kept[:i]
+    return kept
+
+
+def resolve_score_threshold(module_config: dict = None, override: float = None) -> float:
+    """Per-request override, else the module's configured threshold, else the global default"""
+    if override is not None:
+        return override
+    default = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('SCORE_THRESHOLD', 0.2)
+    return (module_config or {}).get('score_threshold', default)
+
+
+def resolve_score_gap(module_config: dict = None) -> float:
+    default = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('SCORE_GAP', 0.15)
+    return (module_config or {}).get('score_gap', default)
+
+
+def resolve_answer_min_score(module_config: dict = None) -> float:
+    """Top relevance score a question needs before it is sent to the LLM; 0 only skips empty retrievals"""
+    default = getattr(settings, 'VECTOR_DB_CONFIG', {}).get('ANSWER_MIN_SCORE', 0.3)
+    return (module_config or {}).get('answer_min_score', default)
+
+
+def has_relevant_context(scores: List[float], min_score: float = None) -> bool:
+    return bool(scores) and max(scores) >= (min_score or 0)
+
+
+def no_answer(closest: List[Tuple[Document, float]]) -> dict:
+    """Retrieval-only reply: the canned answer, with the closest documents as its sources"""
+    closest = sorted(closest, key=lambda hit: hit[1], reverse=True)
+    return {
+        "answer": NO_ANSWER,
+        "context": [doc for doc, _ in closest],
+        "scores": [score for _, score in closest],
+        "model": None,
+        "route_reason": "no relevant context",
+        "cached": False,
+        "degraded": False,
+        "usage": empty_usage(),
+    }
@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import VectorDBTask, ModuleVectorStore, QueryLog, Question, Answer, Rating, ChatSession
+from .filters import ELEMENT_TYPES
 
 class VectorDBTaskSerializer(serializers.ModelSerializer):
     # Access module through module_vector_store relationship
@@ -61,8 +63,8 @@ class QueryLogSerializer(serializers.ModelSerializer):
             'id', 'user', 'module', 'user_username', 'module_name', 'project_name',
             'query_text', 'query_hash', 'response_text', 'retrieved_chunks',
             'similarity_scores', 'retrieval_time_ms', 'generation_time_ms',
-            'total_time_ms', 'user_rating', 'user_feedback', 'metadata',
-            'created_at'
+            'total_time_ms', 'model_name', 'prompt_tokens', 'completion_tokens',
+            'total_tokens', 'tokens_estimated', 'user_rating', 'user_feedback', 'metadata', 'created_at'
         ]
         read_only_fields = ['id', 'query_hash', 'created_at']
 
@@ -89,18 +91,46 @@ class VectorDBCreateSerializer(serializers.Serializer):
             })
         return data
 
+class RetrievalFiltersSerializer(serializers.Serializer):
+    """Metadata filters applied inside the vector store before scoring"""
+    document_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    element_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=ELEMENT_TYPES), required=False, allow_empty=False
+    )
+    page_from = serializers.IntegerField(min_value=1, required=False)
+    page_to = serializers.IntegerField(min_value=1, required=False)
+    uploaded_after = serializers.DateTimeField(required=False)
+    uploaded_before = serializers.DateTimeField(required=False)
+    
+    def validate(self, data):
+        """Validate ranges are not inverted"""
+        if data.get('page_from') and data.get('page_to') and data['page_from'] > data['page_to']:
+            raise serializers.ValidationError({'page_to': 'page_to must not be less than page_from'})
+        if data.get('uploaded_after') and data.get('uploaded_before') and data['uploaded_after'] > data['uploaded_before']:
+            raise serializers.ValidationError({'uploaded_before': 'uploaded_before must not be earlier than uploaded_after'})
+        return data
+
 class RAGQuerySerializer(serializers.Serializer):
     """Serializer for RAG queries"""
     query = serializers.CharField(max_length=2000)
     module_id = serializers.IntegerField()
     max_results = serializers.IntegerField(default=5, min_value=1, max_value=20, required=False)
     similarity_threshold = serializers.FloatField(
-        default=0.7, 
         min_value=0.0, 
         max_value=1.0,
-        required=False
+        required=False,
+        allow_null=True,
+        help_text="Overrides the module's configured score threshold"
     )
     include_metadata = serializers.BooleanField(default=True, required=False)
+    filters = RetrievalFiltersSerializer(required=False)
+    parent_window = serializers.IntegerField(
+        min_value=0,
+        max_value=5,
+        required=False,
+        allow_null=True,
+        help_text="Neighbouring elements to include around each hit; overrides the module's configured window"
+    )
     
     def validate_query(self, value):
         """Validate query is not empty after stripping"""
@@ -115,6 +145,61 @@ class RAGQuerySerializer(serializers.Serializer):
             raise serializers.ValidationError("Module does not exist or is not active")
         return value
 
+class BatchQuerySerializer(serializers.Serializer):
+    """Serializer for many RAG queries against one module"""
+    queries = serializers.ListField(
+        child=serializers.CharField(max_length=2000),
+        min_length=1,
+        max_length=getattr(settings, 'VECTOR_DB_CONFIG', {}).get('BATCH_MAX_QUERIES', 500)
+    )
+    module_id = serializers.IntegerField()
+    max_results = serializers.IntegerField(default=5, min_value=1, max_value=20, required=False)
+    similarity_threshold = serializers.FloatField(min_value=0.0, max_value=1.0, required=False, allow_null=True)
+    filters = RetrievalFiltersSerializer(required=False)
+    parent_window = serializers.IntegerField(min_value=0, max_value=5, required=False, allow_null=True)
+    generate = serializers.BooleanField(default=True, required=False, help_text="False returns sources only")
+    max_concurrency = serializers.IntegerField(
+        min_value=1,
+        max_value=32,
+        required=False,
+        help_text="LLM calls in flight at once; defaults to BATCH_LLM_CONCURRENCY"
+    )
+
+    def validate_queries(self, value):
+        """Strip queries and reject empty ones"""
+        queries = [query.strip() for query in value]
+        if not all(queries):
+            raise serializers.ValidationError("Queries cannot be empty")
+        return queries
+
+    def validate_module_id(self, value):
+        """Validate module exists"""
+        from rag_app.models import Module
+        if not Module.objects.filter(id=value, is_active=True).exists():
+            raise serializers.ValidationError("Module does not exist or is not active")
+        return value
+
+class ProjectQuerySerializer(serializers.Serializer):
+    """Serializer for project-wide RAG queries across all module vector stores"""
+    query = serializers.CharField(max_length=2000)
+    project_id = serializers.IntegerField()
+    max_results = serializers.IntegerField(default=5, min_value=1, max_value=20, required=False)
+    latency_budget_ms = serializers.IntegerField(min_value=100, max_value=30000, required=False)
+    filters = RetrievalFiltersSerializer(required=False)
+    
+    def validate_query(self, value):
+        """Validate query is not empty after stripping"""
+        if not value or not value.strip():
+            raise serializers.ValidationError("Query cannot be empty")
+        return value.strip()
+    
+    def validate_project_id(self, value):
+        """Validate project exists"""
+        from rag_app.models import Project
+        if not Project.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Project does not exist")
+        return value
+
 class RAGResponseSerializer(serializers.Serializer):
     """Serializer for RAG response"""
     query = serializers.CharField()
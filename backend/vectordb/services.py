@@ -19,7 +19,7 @@ class VectorDBService:
     def __init__(self, vector_store_type='chromadb'):
         self.vector_store_type = vector_store_type
     
-    def process_document_for_module(self, document: Document, vector_store: ModuleVectorStore, chunk_size: int = 1000, chunk_overlap: int = 200) -> Dict[str, Any]:
+    def process_document_for_module(self, document: Document, vector_store: ModuleVectorStore, chunk_size: int = 1000, chunk_overlap: int = 200, progress=None) -> Dict[str, Any]:
         """Process a single document - imports heavy modules only when needed"""
         try:
             # Import the actual service when needed
@@ -27,7 +27,7 @@ class VectorDBService:
             actual_service = ActualVectorDBService()
             print("Document: ", document)
             print("Vector Store: ", vector_store)
-            return actual_service.process_document_for_module(document, vector_store, chunk_size, chunk_overlap)
+            return actual_service.process_document_for_module(document, vector_store, chunk_size, chunk_overlap, progress)
         except ImportError as e:
             logger.error(f"Vector service dependencies not available: {e}")
             raise
@@ -35,6 +35,19 @@ class VectorDBService:
             logger.error(f"Failed to process document: {e}")
             raise
     
+    def replace_document_in_module(self, document: Document, vector_store: ModuleVectorStore, progress=None) -> Dict[str, Any]:
+        """Re-index a document's chunks - imports heavy modules only when needed"""
+        try:
+            from vectordb.vector_services import VectorDBService as ActualVectorDBService
+            actual_service = ActualVectorDBService()
+            return actual_service.replace_document_in_module(document, vector_store, progress)
+        except ImportError as e:
+            logger.error(f"Vector service dependencies not available: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to replace document: {e}")
+            raise
+
     def reset_module_vector_store(self, vector_store: ModuleVectorStore):
         """Reset vector store - imports heavy modules only when needed"""
         try:
@@ -60,12 +73,36 @@ class RAGService:
         pass
     
     def process_query(self, query: str, project, module=None, 
-                     user=None, max_results: int = 5) -> Dict[str, Any]:
+                     user=None, max_results: int = 5, similarity_threshold: float = None,
+                     filters: dict = None, parent_window: int = None) -> Dict[str, Any]:
         """Process RAG query - imports heavy modules only when needed"""
         try:
             from .vector_services import RAGService as ActualRAGService
             actual_service = ActualRAGService()
-            return actual_service.process_query(query, project, module, user, max_results)
+            return actual_service.process_query(query, project, module, user, max_results, similarity_threshold, filters, parent_window)
+        except ImportError as e:
+            logger.error(f"RAG service dependencies not available: {e}")
+            return {
+                'query': query,
+                'answer': "RAG service not available - missing dependencies",
+                'sources': [],
+                'retrieval_time_ms': 0,
+                'generation_time_ms': 0,
+                'total_time_ms': 0,
+                'metadata': {}
+            }
+        except Exception as e:
+            logger.error(f"RAG query processing failed: {e}")
+            raise
+
+    async def aprocess_query(self, query: str, project, module=None,
+                             user=None, max_results: int = 5, similarity_threshold: float = None,
+                             filters: dict = None, parent_window: int = None) -> Dict[str, Any]:
+        """Async RAG query processing - imports heavy modules only when needed"""
+        try:
+            from .vector_services import RAGService as ActualRAGService
+            actual_service = ActualRAGService()
+            return await actual_service.aprocess_query(query, project, module, user, max_results, similarity_threshold, filters, parent_window)
         except ImportError as e:
             logger.error(f"RAG service dependencies not available: {e}")
             return {
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from vectordb.cache import get_index_version, normalise_query
+
+logger = logging.getLogger(__name__)
+
+# How often a follower in another worker checks whether the leader has finished
+POLL_INTERVAL = 0.1
+
+
+def _request_key(collection_name: str, version: int, question: str, previous_chat: str, params: dict) -> str:
+    history = hashlib.sha256((previous_chat or "").encode()).hexdigest()
+    payload = json.dumps(
+        [collection_name, version, normalise_query(question), history, params],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def coalesce_key(collection_name: str, question: str, previous_chat: str = "", **params) -> str:
+    """Identity of a request: (module, index version, normalised question, history fingerprint, options)"""
+    return _request_key(collection_name, get_index_version(collection_name), question, previous_chat, params)
+
+
+async def acoalesce_key(collection_name: str, question: str, previous_chat: str = "", **params) -> str:
+    """coalesce_key() for async callers; the index version read is cache I/O, kept off the event loop"""
+    version = await sync_to_async(get_index_version)(collection_name)
+    return _request_key(collection_name, version, question, previous_chat, params)
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    Within a process, threads and coroutines that arrive while a call is in
+    flight wait for its result instead of starting their own. With `shared`,
+    workers also coordinate through the Django cache (Redis in deployment): one
+    takes a lock and publishes its result for `result_ttl` seconds, the others
+    poll for it. If the leader fails, its followers in this process see the
+    same exception and other workers compute on their own. An async leader's
+    work runs as its own task, so a leader whose request is cancelled (client
+    disconnect) still finishes the call for the followers waiting on it.
+    """
+
+    def __init__(self, namespace: str, shared: bool = False, timeout: float = 120, result_ttl: int = 10):
+        self.namespace = namespace
+        self.shared = shared
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+        # Detached async leader runs, referenced until they finish
+        self._tasks = set()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _claim(self, key: str):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _release(self, key: str):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _keys(self, key: str):
+        return f"{self.namespace}:lock:{key}", f"{self.namespace}:result:{key}"
+
+    def _publish(self, result_key: str, result):
+        try:
+            shared_cache.set(result_key, result, self.result_ttl)
+        except Exception as e:
+            logger.warning(f"Could not publish coalesced result for {self.namespace}: {e}")
+
+    def _try_lead(self, lock_key: str, result_key: str):
+        """(cached result, owns lock); (None, None) means wait and retry"""
+        try:
+            result = shared_cache.get(result_key)
+            if result is not None:
+                return result, False
+            if shared_cache.add(lock_key, 1, int(self.timeout)):
+                return None, True
+        except Exception as e:
+            logger.warning(f"Shared single-flight unavailable for {self.namespace}: {e}")
+            return None, False
+        return None, None
+
+    def _drop_lock(self, lock_key: str):
+        try:
+            shared_cache.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Could not release single-flight lock for {self.namespace}: {e}")
+
+    def _run_shared(self, key: str, func):
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result, owner = self._try_lead(lock_key, result_key)
+            if result is not None:
+                return result
+            if owner is not None or time.monotonic() > deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            result = func()
+            self._publish(result_key, result)
+            return result
+        finally:
+            if owner:
+                self._drop_lock(lock_key)
+
+    async def _arun_shared(self, key: str, afunc):
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result, owner = await sync_to_async(self._try_lead)(lock_key, result_key)
+            if result is not None:
+                return result
+            if owner is not None or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+
+        try:
+            result = await afunc()
+            await sync_to_async(self._publish)(result_key, result)
+            return result
+        finally:
+            if owner:
+                await sync_to_async(self._drop_lock)(lock_key)
+
+    def do(self, key: str, func):
+        """Return func(), sharing one execution among concurrent callers with the same key"""
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result(timeout=self.timeout)
+
+        try:
+            result = self._run_shared(key, func) if self.shared else func()
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    async def _alead(self, key: str, future: Future, afunc):
+        try:
+            result = await (self._arun_shared(key, afunc) if self.shared else afunc())
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled():
+            # Seen by the followers through the shared future; don't log it as never retrieved
+            task.exception()
+
+    async def ado(self, key: str, afunc):
+        """Async variant of do(); afunc is a coroutine function"""
+        future, leader = self._claim(key)
+        if not leader:
+            # Shielded: a follower that is cancelled or times out must not cancel the shared future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+
+        task = asyncio.ensure_future(self._alead(key, future, afunc))
+        self._tasks.add(task)
+        task.add_done_callback(self._forget)
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'in_flight': in_flight, 'leaders': self.leaders, 'coalesced': self.coalesced}
+
+
+def _build_single_flight() -> SingleFlight:
+    config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+    return SingleFlight(
+        'vectordb:inflight',
+        shared=config.get('COALESCE_ACROSS_WORKERS', False),
+        timeout=config.get('COALESCE_TIMEOUT', 120),
+        result_ttl=config.get('COALESCE_RESULT_TTL', 10),
+    )
+
+
+answer_flight = _build_single_flight()
@@ -10,6 +10,7 @@ from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from .models import VectorDBTask, ModuleVectorStore
 from .services import VectorDBService
+from .progress import ProgressReporter
 from rag_app.models import Document, Module
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
     module = None  # Initialize module variable
     vector_store = None
     task_obj = None
+    reporter = None
     
     try:
         # Get vector store
@@ -79,30 +81,13 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
         total_chunks = 0
         total_tokens = 0
         
+        # Progress is buffered and written at most every PROGRESS_FLUSH_SECONDS
+        reporter = ProgressReporter(self, task_obj, total_docs)
+        
         # Process each document
         for i, document in enumerate(documents, 1):
             try:
-                # Update progress
-                progress = int((i / total_docs) * 90) + 5  # 5-95 range
-                current_doc_name = document.title[:50]
-                
-                task_obj.current_document = current_doc_name
-                task_obj.progress_percentage = progress
-                task_obj.save(update_fields=['current_document', 'progress_percentage'])
-                
-                # Update Celery state
-                self.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'progress': progress,
-                        'status': f'Processing document {i}/{total_docs}',
-                        'current_document': current_doc_name,
-                        'processed': i - 1,
-                        'total': total_docs,
-                        'successful': successful_docs,
-                        'failed': failed_docs
-                    }
-                )
+                reporter.start_document(i, document.title[:50])
 
                 print(f"Processing document {i}/{total_docs}: {document.title}")
 
@@ -111,7 +96,8 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
                     document=document,
                     vector_store=vector_store,
                     chunk_size=chunk_size,
-                    chunk_overlap=chunk_overlap
+                    chunk_overlap=chunk_overlap,
+                    progress=reporter.update
                 )
                 
                 # Update counters
@@ -119,16 +105,18 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
                 total_chunks += doc_result.get('chunk_count', 0)
                 total_tokens += doc_result.get('token_count', 0)
                 
-                task_obj.increment_processed(success=True)
+                reporter.finish_document(success=True)
                 logger.info(f"Successfully processed document {document.id}: {document.title}")
                 
             except Exception as e:
                 error_msg = str(e)
                 failed_docs += 1
-                task_obj.increment_processed(success=False)
+                reporter.finish_document(success=False)
                 logger.error(f"Failed to process document {document.id}: {error_msg}", exc_info=True)
                 continue
         
+        reporter.close()
+        
         # Finalize vector store
         vector_store.update_stats(
             doc_count=successful_docs,
@@ -208,6 +196,8 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
         
         # Mark task as failed
         try:
+            if reporter:
+                reporter.close()
             if task_obj:
                 task_obj.mark_failed(error_message)
             
@@ -230,6 +220,136 @@ def create_vectordb_for_module_task(self, task_record_id, module_vector_store_id
         raise
 
 
+def queue_module_rebuild(vector_store, user):
+    """Clear a module's vector store and queue a full build of it on the builds queue"""
+    vector_service = VectorDBService()
+    vector_service.reset_module_vector_store(vector_store)
+    task_obj = VectorDBTask.objects.create(
+        module_vector_store=vector_store,
+        current_step='initializing',
+        total_documents=Document.objects.filter(module=vector_store.module, active=True).count(),
+        created_by=user,
+        chunk_size=vector_store.chunk_size,
+        chunk_overlap=vector_store.chunk_overlap,
+        embedding_model=vector_store.embedding_model
+    )
+    celery_task = create_vectordb_for_module_task.delay(
+        str(task_obj.id),
+        str(vector_store.id),
+        task_obj.chunk_size,
+        task_obj.chunk_overlap,
+        task_obj.embedding_model
+    )
+    task_obj.task_id = celery_task.id
+    task_obj.save(update_fields=['task_id'])
+    return celery_task.id
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def reindex_document_task(self, document_id):
+    """Re-index one document in its module's ready vector store: add its current chunks, then drop the old ones.
+
+    An inactive document is only removed. Runs on the reindex queue, ahead of
+    bulk work, so an upload is searchable without rebuilding the module. A
+    store whose chunks predate per-document metadata is rebuilt in full instead.
+    A failed attempt leaves the previous version searchable and is retried;
+    the store is only marked 'error' when it could not be cleaned up.
+    """
+    from .vector_services import InconsistentStoreError, UnattributedChunksError
+
+    document = Document.objects.get(id=document_id)
+    vector_store = ModuleVectorStore.objects.filter(module=document.module).first()
+    if vector_store is None or vector_store.status != 'ready':
+        # A store that is empty or being built picks the document up with its next full build
+        logger.info(f"Skipping re-index of document {document_id}: vector store not ready")
+        return {'document_id': document_id, 'status': 'skipped'}
+
+    try:
+        replaced = VectorDBService().replace_document_in_module(document, vector_store)
+    except UnattributedChunksError as e:
+        logger.warning(f"{e}; queueing a full build for document {document_id}")
+        build_task_id = queue_module_rebuild(vector_store, document.uploaded_by)
+        return {'document_id': document_id, 'status': 'rebuilding', 'build_task_id': build_task_id}
+    except InconsistentStoreError as e:
+        logger.error(f"Re-index of document {document_id} left {vector_store.collection_name} inconsistent: {e}")
+        vector_store.status = 'error'
+        vector_store.save(update_fields=['status'])
+        raise
+    except Exception as e:
+        logger.error(
+            f"Re-index of document {document_id} failed (attempt {self.request.retries + 1}), "
+            f"previous version still served: {e}", exc_info=True
+        )
+        raise self.retry(exc=e)
+
+    added, removed = replaced['added'], replaced['removed']
+    was_indexed = removed['chunk_count'] > 0
+    vector_store.apply_stat_deltas(
+        doc_delta=int(document.active) - int(was_indexed),
+        chunk_delta=added['chunk_count'] - removed['chunk_count'],
+        token_delta=added['token_count'] - removed['token_count']
+    )
+
+    result = {
+        'document_id': document_id,
+        'status': 'indexed' if document.active else 'removed',
+        'removed_chunks': removed['chunk_count'],
+        'added_chunks': added['chunk_count'],
+    }
+    logger.info(f"Re-indexed document {document_id} in {vector_store.collection_name}: {result}")
+    return result
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def summarize_chat_session_task(self, session_id):
+    """Fold chat turns that left the recent window into the session's rolling summary"""
+    from django.conf import settings
+    from .chat_memory import fold_overflow
+    from .llm import get_chat_model
+
+    try:
+        llm = get_chat_model(
+            settings.VECTOR_DB_CONFIG.get('CHAT_MEMORY_SUMMARY_MODEL', 'mistral-small-latest'),
+            model_provider="mistralai",
+            temperature=0.0
+        )
+        folded = fold_overflow(session_id, llm)
+        logger.info(f"Chat session {session_id} memory {'updated' if folded else 'unchanged'}")
+        return folded
+    except Exception as e:
+        logger.error(f"Failed to summarise chat session {session_id}: {e}")
+        raise self.retry(exc=e)
+
+
+@shared_task(bind=True, acks_late=True)
+def answer_chat_question_task(self, question_id, filters=None):
+    """Chat job: answer a stored question on a query worker and save the Answer"""
+    from .chat_jobs import answer_question
+    from .models import Question
+
+    question = Question.objects.select_related(
+        'chat_session', 'module_vector_store', 'created_by'
+    ).get(id=question_id)
+    if question.answers.exists():
+        # Redelivered after the answer was saved (acks_late); don't answer twice
+        logger.info(f"Chat job {self.request.id} already answered")
+        return {'question_id': str(question_id), 'answer_id': str(question.answers.first().id)}
+
+    self.update_state(state='PROGRESS', meta={'step': 'answering'})
+    try:
+        response = answer_question(question, filters)
+    except Exception as e:
+        logger.error(f"Chat job {self.request.id} failed: {e}")
+        raise
+    return {'question_id': str(question_id), 'answer_id': response['answer_id']}
+
+
+@shared_task
+def prune_llm_response_cache():
+    """Trim the LLM response cache to LLM_CONFIG['RESPONSE_CACHE_MAX_ENTRIES']"""
+    from .response_cache import response_cache
+    return response_cache.prune()
+
 
 @shared_task
 def cleanup_old_vector_tasks():
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase, override_settings
+from langchain_core.documents import Document
+
+from vectordb.context_packer import ContextPacker
+from vectordb.llm import PROVIDER_ENVIRONMENT, export_provider_environment
+from vectordb.resilience import CircuitBreaker, LLMUnavailable, ResilientCaller
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class OfflineImportTests(SimpleTestCase):
+    """The ingestion path must import on hosts with no provider keys (CI, air-gapped, fake providers)"""
+
+    def test_ingestion_imports_without_provider_keys(self):
+        env = {name: value for name, value in os.environ.items() if name not in PROVIDER_ENVIRONMENT}
+        env['LLM_PROVIDER'] = 'fake'
+        # A fresh interpreter, so the module-level environment export really runs with the keys unset
+        result = subprocess.run(
+            [sys.executable, '-c', 'import vectordb.create_vector_db'],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    @override_settings(MISTRAL_API_KEY=None, LANGCHAIN_API_KEY=None)
+    def test_unset_keys_are_not_exported(self):
+        previous = os.environ.pop('MISTRAL_API_KEY', None)
+        try:
+            export_provider_environment()
+            self.assertNotIn('MISTRAL_API_KEY', os.environ)
+        finally:
+            if previous is not None:
+                os.environ['MISTRAL_API_KEY'] = previous
+
+
+class ContextPackerDedupeTests(SimpleTestCase):
+    STEP = (
+        "stop the druid ingestion job then snapshot the iceberg table and record "
+        "the snapshot id in the runbook before resuming the load"
+    )
+
+    def test_partially_overlapping_chunks_keep_the_better_one(self):
+        best = Document(id='a', page_content=self.STEP, metadata={'document_id': 1, 'element_index': 2})
+        # The splitter's chunk overlap: the tail of the first chunk plus a few new words, not a substring of it
+        overlapping = Document(
+            id='b', page_content=" ".join(self.STEP.split()[5:]) + " and page the on call engineer",
+            metadata={'document_id': 1, 'element_index': 3}
+        )
+        distinct = Document(
+            id='c', page_content="rollback restores the previous snapshot from the catalog when the load fails",
+            metadata={'document_id': 1, 'element_index': 4}
+        )
+        selected = ContextPacker(token_budget=3000, overlap_ratio=0.6).select(
+            [overlapping, best, distinct], [0.8, 0.9, 0.7]
+        )
+        self.assertEqual([doc.id for doc in selected], ['a', 'c'])
+
+    def test_chunk_inside_an_expanded_passage_is_dropped(self):
+        passage = Document(
+            id='a', page_content="elements two to four of the sop",
+            metadata={'document_id': 1, 'element_index': 3, 'element_range': [2, 4]}
+        )
+        chunk = Document(id='c', page_content="a different wording", metadata={'document_id': 1, 'element_index': 4})
+        selected = ContextPacker(token_budget=3000).select([passage, chunk], [0.9, 0.7])
+        self.assertEqual([doc.id for doc in selected], ['a'])
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@override_settings(LLM_CONFIG={'BREAKER_FAILURE_THRESHOLD': 2, 'HEDGE': False})
+class CircuitBreakerClassificationTests(SimpleTestCase):
+    def _fail_with(self, error):
+        def func():
+            raise error
+        return func
+
+    def test_client_errors_are_raised_without_tripping(self):
+        caller = ResilientCaller('test-model')
+        for _ in range(3):
+            with self.assertRaises(ProviderError):
+                caller.call(self._fail_with(ProviderError(400)))
+        self.assertEqual(caller.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(caller.breaker.failures, 0)
+
+    def test_server_errors_and_rate_limits_trip(self):
+        caller = ResilientCaller('test-model')
+        for status_code in (503, 429):
+            with self.assertRaises(LLMUnavailable):
+                caller.call(self._fail_with(ProviderError(status_code)))
+        self.assertEqual(caller.breaker.state, CircuitBreaker.OPEN)
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer can be loaded
+CHARS_PER_TOKEN = 4
+
+_tokenizers = {}
+# Tokenizer name -> when loading it last failed; retried after TOKENIZER_RETRY_SECONDS
+_failed_at = {}
+_warned = set()
+_tokenizers_lock = threading.Lock()
+
+
+def tokenizer_name_for(model_name: str = None) -> str:
+    """Map a chat or embedding model name to the HuggingFace tokenizer that counts for it"""
+    llm_config = getattr(settings, 'LLM_CONFIG', {})
+    tokenizers = llm_config.get('TOKENIZERS', {})
+    if model_name in tokenizers:
+        return tokenizers[model_name]
+    # Embedding models are HuggingFace repos and carry their own tokenizer
+    if model_name and '/' in model_name:
+        return model_name
+    if model_name and model_name.startswith('all-'):
+        return f"sentence-transformers/{model_name}"
+    return llm_config.get('TOKENIZER')
+
+
+def get_tokenizer(model_name: str = None):
+    """Load (once per process) the tokenizer for a model, or None while it is unavailable"""
+    name = tokenizer_name_for(model_name)
+    if not name or getattr(settings, 'LLM_CONFIG', {}).get('PROVIDER') == 'fake':
+        # Offline runs estimate instead of downloading tokenizers
+        return None
+
+    with _tokenizers_lock:
+        if name in _tokenizers:
+            return _tokenizers[name]
+        retry_seconds = getattr(settings, 'LLM_CONFIG', {}).get('TOKENIZER_RETRY_SECONDS', 600)
+        if name in _failed_at and time.monotonic() - _failed_at[name] < retry_seconds:
+            return None
+        try:
+            from transformers import AutoTokenizer
+            _tokenizers[name] = AutoTokenizer.from_pretrained(name)
+            _failed_at.pop(name, None)
+            return _tokenizers[name]
+        except Exception as e:
+            _failed_at[name] = time.monotonic()
+            if name not in _warned:
+                _warned.add(name)
+                logger.warning(
+                    f"Tokenizer {name} unavailable, estimating token counts as {CHARS_PER_TOKEN} characters "
+                    f"per token (retrying every {retry_seconds}s): {e}"
+                )
+            else:
+                logger.debug(f"Tokenizer {name} still unavailable: {e}")
+            return None
+
+
+def count_tokens(text: str, model_name: str = None) -> int:
+    if not text:
+        return 0
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = None) -> str:
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) <= max_tokens:
+        return text
+    return tokenizer.decode(ids[:max_tokens])
+
+
+def count_tokens_many(texts, model_name: str = None) -> int:
+    """Total tokens over many texts, tokenized in one batch"""
+    texts = [text for text in texts if text]
+    if not texts:
+        return 0
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer is None:
+        return sum(max(1, len(text) // CHARS_PER_TOKEN) for text in texts)
+    return sum(len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids'])
+
+
+def empty_usage() -> dict:
+    return {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'estimated': False}
+
+
+def add_usage(*usages) -> dict:
+    """Sum usages; the total is marked estimated if any part was"""
+    total = empty_usage()
+    for usage in usages:
+        for key in ('input_tokens', 'output_tokens', 'total_tokens'):
+            total[key] += (usage or {}).get(key, 0) or 0
+        total['estimated'] = total['estimated'] or bool((usage or {}).get('estimated'))
+    return total
+
+
+def message_usage(message, prompt=None, model_name: str = None) -> dict:
+    """Token usage of one LLM response: the provider's usage_metadata, or an estimate flagged as such"""
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        return add_usage(usage)
+    prompt_text = prompt.to_string() if hasattr(prompt, 'to_string') else str(prompt or "")
+    input_tokens = count_tokens(prompt_text, model_name)
+    output_tokens = count_tokens(getattr(message, 'content', message) or "", model_name)
+    return {
+        'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens,
+        'estimated': True,
+    }
+
+
+def usage_fields(result: dict) -> dict:
+    """Model and token columns for Answer/QueryLog from a generation result"""
+    usage = add_usage((result or {}).get('usage'))
+    return {
+        'model_name': (result or {}).get('model') or "",
+        'prompt_tokens': usage['input_tokens'],
+        'completion_tokens': usage['output_tokens'],
+        'total_tokens': usage['total_tokens'],
+        'tokens_estimated': usage['estimated'],
+    }
@@ -4,13 +4,23 @@ from .views import (
     VectorDBTaskStatusView,
     VectorDBTaskCancelView,
     VectorDBTaskListView,
+    ReindexDocumentView,
     ModuleVectorStoreListView,
     ModuleVectorStoreDetailView,
     RAGQueryView,
+    ProjectQueryView,
+    BatchQueryView,
     QueryLogListView,
     QueryLogDetailView,
     VectorDBStatsView,
     ChatView,
+    ChatStreamView,
+    AsyncRAGQueryView,
+    AsyncChatView,
+    ChatJobView,
+    ChatJobStatusView,
+    ChatJobResultView,
+    ChatJobEventsView,
     GiveRating,
     DeleteSessionView,
     EditSessionView
@@ -26,6 +36,7 @@ urlpatterns = [
     path('tasks/', VectorDBTaskListView.as_view(), name='task-list'),
     path('tasks/status/<str:task_id>/', VectorDBTaskStatusView.as_view(), name='task-status'),
     path('tasks/cancel/<str:task_id>/', VectorDBTaskCancelView.as_view(), name='task-cancel'),
+    path('documents/<int:document_id>/reindex/', ReindexDocumentView.as_view(), name='document-reindex'),
     
     # Vector Store Management
     path('stores/', ModuleVectorStoreListView.as_view(), name='vector-store-list'),
@@ -33,6 +44,13 @@ urlpatterns = [
     
     # RAG Queries
     path('query/', RAGQueryView.as_view(), name='rag-query'),
+    path('query/project/', ProjectQueryView.as_view(), name='rag-project-query'),
+    path('query/batch/', BatchQueryView.as_view(), name='rag-batch-query'),
+    
+    # Async variants for ASGI deployments: waiting on the LLM does not hold a worker thread
+    path('async/query/', AsyncRAGQueryView.as_view(), name='rag-query-async'),
+    path("async/chat_session/<int:module_id>/", AsyncChatView.as_view(), name='chat-session-async-url'),
+    path("async/chat_session/<int:module_id>/<str:session_id>/", AsyncChatView.as_view(), name='chat-session-async-url'),
     
     # Query Logs
     path('queries/', QueryLogListView.as_view(), name='query-log-list'),
@@ -45,6 +63,15 @@ urlpatterns = [
     ## chat session
     path("chat_session/<int:module_id>/", ChatView.as_view(), name='chat-session-url'),
     path("chat_session/<int:module_id>/<str:session_id>/", ChatView.as_view(), name='chat-session-url'),
+    ## streamed chat (server-sent events)
+    path("chat_stream/<int:module_id>/", ChatStreamView.as_view(), name='chat-stream-url'),
+    path("chat_stream/<int:module_id>/<str:session_id>/", ChatStreamView.as_view(), name='chat-stream-url'),
+    ## chat jobs: answered by a Celery worker, polled or pushed as server-sent events
+    path("chat_jobs/<int:module_id>/", ChatJobView.as_view(), name='chat-job-url'),
+    path("chat_jobs/<int:module_id>/<str:session_id>/", ChatJobView.as_view(), name='chat-job-url'),
+    path("chat_jobs/status/<str:job_id>/", ChatJobStatusView.as_view(), name='chat-job-status'),
+    path("chat_jobs/result/<str:job_id>/", ChatJobResultView.as_view(), name='chat-job-result'),
+    path("chat_jobs/events/<str:job_id>/", ChatJobEventsView.as_view(), name='chat-job-events'),
     ## delete session
     path("delete_session/<str:session_id>/", DeleteSessionView.as_view(), name='delete-session-url'),
     ## edit session
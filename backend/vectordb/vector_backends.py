@@ -0,0 +1,154 @@
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('chromadb', 'hnswlib', 'quantized')
+
+
+def resolve_backend(module_config: dict = None, default: str = None) -> str:
+    """Module's configured backend, else VECTOR_DB_CONFIG['VECTOR_STORE']"""
+    default = default or getattr(settings, 'VECTOR_DB_CONFIG', {}).get('VECTOR_STORE', 'chromadb')
+    backend = (module_config or {}).get('vector_store', default)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    return backend
+
+
+HNSW_CONFIG_KEYS = {
+    'hnsw_m': ('M', 'hnsw:M'),
+    'hnsw_ef_construction': ('ef_construction', 'hnsw:construction_ef'),
+    'hnsw_ef_search': ('ef_search', 'hnsw:search_ef'),
+}
+
+
+def backend_options(backend: str, module_config: dict = None) -> dict:
+    """Constructor options for the backend taken from the module config.
+
+    HNSW parameters (hnsw_m, hnsw_ef_construction, hnsw_ef_search) apply to
+    both hnswlib and Chroma; M and ef_construction only take effect when the
+    index is built, so changing them needs a re-index.
+    """
+    config = module_config or {}
+    if backend == 'quantized':
+        options = {
+            'quantization': config.get(
+                'quantization', getattr(settings, 'VECTOR_DB_CONFIG', {}).get('QUANTIZATION', 'int8')
+            ),
+            'rescore_factor': config.get('rescore_factor'),
+        }
+    elif backend == 'hnswlib':
+        options = {name: config.get(key) for key, (name, _) in HNSW_CONFIG_KEYS.items()}
+    else:
+        metadata = {
+            chroma_key: config[key] for key, (_, chroma_key) in HNSW_CONFIG_KEYS.items() if config.get(key)
+        }
+        options = {'collection_metadata': metadata or None}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _local_store_class(backend: str):
+    if backend == 'hnswlib':
+        from vectordb.hnsw_store import HNSWVectorStore
+
+        return HNSWVectorStore
+    if backend == 'quantized':
+        from vectordb.quantized_store import QuantizedVectorStore
+
+        return QuantizedVectorStore
+    return None
+
+
+def create_vector_store(backend: str, collection_name: str, persist_directory: str, embeddings, **options):
+    """Open (or create) a collection on the given backend as a LangChain VectorStore"""
+    store_class = _local_store_class(backend)
+    if store_class is not None:
+        return store_class(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+            **options
+        )
+
+    from langchain_chroma import Chroma
+    from vectordb.hnsw_store import cosine_relevance_fn
+
+    metadata = options.get('collection_metadata')
+    return Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=persist_directory,
+        collection_metadata=metadata,
+        # Report cosine similarity like the local backends, so score thresholds mean the same everywhere
+        relevance_score_fn=cosine_relevance_fn((metadata or {}).get('hnsw:space', 'l2')),
+    )
+
+
+def _open_local_store(store_class, collection_name: str, persist_directory: str, **options):
+    return store_class(
+        collection_name=collection_name,
+        embedding_function=None,
+        persist_directory=persist_directory,
+        **options
+    )
+
+
+def _chroma_collection(collection_name: str, persist_directory: str):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    try:
+        return client.get_collection(name=collection_name)
+    except Exception:
+        return None
+
+
+def delete_ids(backend: str, collection_name: str, persist_directory: str, ids: list, **options) -> list:
+    """Delete the vectors with the given ids and return their texts"""
+    if not ids:
+        return []
+    store_class = _local_store_class(backend)
+    if store_class is not None:
+        store = _open_local_store(store_class, collection_name, persist_directory, **options)
+        return [document.page_content for document in store.delete_ids(ids)]
+
+    collection = _chroma_collection(collection_name, persist_directory)
+    if collection is None:
+        return []
+    found = collection.get(ids=ids, include=['documents'])
+    if found['ids']:
+        collection.delete(ids=found['ids'])
+    return found['documents'] or []
+
+
+def chunk_document_ids(backend: str, collection_name: str, persist_directory: str, **options) -> dict:
+    """Map each stored chunk id to the document_id in its metadata (None for chunks indexed without one)"""
+    store_class = _local_store_class(backend)
+    if store_class is not None:
+        store = _open_local_store(store_class, collection_name, persist_directory, **options)
+        return {chunk_id: metadata.get('document_id') for chunk_id, metadata in store.metadata_by_id().items()}
+
+    collection = _chroma_collection(collection_name, persist_directory)
+    if collection is None:
+        return {}
+    found = collection.get(include=['metadatas'])
+    return {
+        chunk_id: (metadata or {}).get('document_id')
+        for chunk_id, metadata in zip(found['ids'], found['metadatas'])
+    }
+
+
+def delete_vector_store(backend: str, collection_name: str, persist_directory: str):
+    """Delete a collection's stored vectors on the given backend"""
+    store_class = _local_store_class(backend)
+    if store_class is not None:
+        import shutil
+
+        shutil.rmtree(store_class.storage_path(persist_directory, collection_name), ignore_errors=True)
+        return
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    client.delete_collection(name=collection_name)
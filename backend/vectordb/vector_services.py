@@ -12,11 +12,28 @@ django.setup()
 from django.utils import timezone
 from vectordb.models import ModuleVectorStore, QueryLog
 from rag_app.models import Document, Module
+from vectordb.cache import bump_index_version
+from vectordb.response_cache import response_cache
+from vectordb.retrieval import forget_vector_store
+from vectordb.filters import document_metadata, build_where
+from vectordb.vector_backends import (
+    resolve_backend, backend_options, delete_vector_store, delete_ids, chunk_document_ids
+)
+from vectordb.parent_store import ParentElementStore, resolve_parent_window
+from vectordb.tokens import add_usage, count_tokens_many, usage_fields
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
 
+class UnattributedChunksError(Exception):
+    """The collection holds chunks indexed without a document_id, so one document can't be replaced in place"""
+
+
+class InconsistentStoreError(Exception):
+    """A re-index failed half-way and could not be rolled back; the collection needs a full rebuild"""
+
+
 class VectorDBService:
     """Service class for module-level vector database operations"""
     
@@ -27,22 +44,30 @@ class VectorDBService:
             'all-MiniLM-L6-v2'
         )
     
+    def _vector_store_config(self, vector_store: ModuleVectorStore) -> dict:
+        """Module config with this service's backend as the fallback"""
+        return {'vector_store': self.vector_store_type, **(vector_store.config or {})}
+
     def reset_module_vector_store(self, vector_store: ModuleVectorStore):
         """Reset/clear a module's vector store"""
         try:
             persistence_path = vector_store.persistence_directory
             collection_name = vector_store.collection_name
 
-            # Import here to avoid Django startup issues
-            import chromadb
-            client = chromadb.PersistentClient(path=persistence_path)
-
             # Delete the collection
             try:
-                client.delete_collection(name=collection_name)
+                delete_vector_store(
+                    resolve_backend(self._vector_store_config(vector_store)),
+                    collection_name,
+                    persistence_path
+                )
                 print(f"Collection '{collection_name}' has been deleted.")
             except Exception as e:
                 logger.warning(f"Failed to delete collection: {e}")
+            ParentElementStore(collection_name, persistence_path).delete()
+            bump_index_version(collection_name)
+            response_cache.invalidate(collection_name)
+            forget_vector_store(collection_name)
 
             # Update vector store status
             vector_store.status = 'empty'
@@ -59,8 +84,8 @@ class VectorDBService:
             print(f"Failed to reset vector store: {e}")
             raise
 
-    def process_document_for_module(self, document: Document, vector_store: ModuleVectorStore = None, chunk_size: int = 1000, chunk_overlap: int = 200) -> Dict[str, Any]:
-        """Process a single document and add to module vector store"""
+    def process_document_for_module(self, document: Document, vector_store: ModuleVectorStore = None, chunk_size: int = 1000, chunk_overlap: int = 200, progress=None) -> Dict[str, Any]:
+        """Process a single document and add to module vector store; `progress(**detail)` gets per-chunk updates"""
         try:
             print(f"Debug: Starting process_document_for_module for document ID {document.id}")
             print(f"Document title: {document.title}")
@@ -96,7 +121,6 @@ class VectorDBService:
             
             print(f"File name: {file_name}, File size: {file_size} bytes")
 
-            from langchain_community.embeddings import HuggingFaceEmbeddings
             from vectordb.create_vector_db import CreateVectorStore
 
             # Ensure file name has extension
@@ -124,13 +148,22 @@ class VectorDBService:
 
             print(f"Created persistence directory: {persist_directory}")
 
+            if progress:
+                progress(stage='parsing')
             create_vector_store = CreateVectorStore(file_path)
             # create_vector_store.embeddings = HuggingFaceEmbeddings(model_name=model_name)
-            create_vector_store.load_vector_store(collection_name=collection_name, persist_directory=persist_directory)
+            create_vector_store.load_vector_store(
+                collection_name=collection_name,
+                persist_directory=persist_directory,
+                embedding_model_name=model_name,
+                vector_store_config=self._vector_store_config(vector_store)
+            )
 
             print("creating vector store...")
 
-            result = create_vector_store.create_vector_store()
+            result = create_vector_store.create_vector_store(document_metadata(document), progress=progress)
+            bump_index_version(collection_name)
+            response_cache.invalidate(collection_name)
             
             print(f"Vector store created with {result.get('chunk_count', 0)} chunks and {result.get('token_count', 0)} tokens.")
             return {
@@ -150,46 +183,149 @@ class VectorDBService:
             print(f"Failed to process document {document.id}: {e}")
             raise
     
+    def replace_document_in_module(self, document: Document, vector_store: ModuleVectorStore,
+                                   progress=None) -> Dict[str, Any]:
+        """Re-index one document: its new chunks are added first and only then are the old ones deleted.
+
+        If adding fails, whatever was added is removed again and the old
+        chunks stay searchable. Raises UnattributedChunksError when the
+        collection predates per-document metadata, and InconsistentStoreError
+        when a failure could not be cleaned up; only a full build fixes either.
+        """
+        config = self._vector_store_config(vector_store)
+        backend = resolve_backend(config)
+        options = backend_options(backend, config)
+        location = (vector_store.collection_name, vector_store.persistence_directory)
+
+        chunks = chunk_document_ids(backend, *location, **options)
+        if any(document_id is None for document_id in chunks.values()):
+            raise UnattributedChunksError(
+                f"{vector_store.collection_name} has chunks without a document_id; re-index the whole module"
+            )
+        old_ids = [chunk_id for chunk_id, document_id in chunks.items() if document_id == document.id]
+
+        added = {'chunk_count': 0, 'token_count': 0}
+        if document.active:
+            try:
+                added = self.process_document_for_module(
+                    document=document,
+                    vector_store=vector_store,
+                    chunk_size=vector_store.chunk_size,
+                    chunk_overlap=vector_store.chunk_overlap,
+                    progress=progress
+                )
+            except Exception as e:
+                kept = set(old_ids)
+                try:
+                    partial = [
+                        chunk_id for chunk_id, document_id in chunk_document_ids(backend, *location, **options).items()
+                        if document_id == document.id and chunk_id not in kept
+                    ]
+                    delete_ids(backend, *location, partial, **options)
+                except Exception as rollback_error:
+                    raise InconsistentStoreError(
+                        f"Could not remove partial chunks of document {document.id}: {rollback_error}"
+                    ) from e
+                logger.warning(f"Re-index of document {document.id} failed; removed {len(partial)} partial chunks")
+                raise
+
+        try:
+            texts = delete_ids(backend, *location, old_ids, **options)
+        except Exception as e:
+            # The new chunks are in and the old ones may be partly left: the document is indexed twice
+            raise InconsistentStoreError(f"Could not remove old chunks of document {document.id}: {e}") from e
+        if texts:
+            bump_index_version(vector_store.collection_name)
+            response_cache.invalidate(vector_store.collection_name)
+        logger.info(
+            f"Replaced document {document.id} in {vector_store.collection_name}: "
+            f"{len(texts)} chunks removed, {added['chunk_count']} added"
+        )
+        return {
+            'document_id': document.id,
+            'added': added,
+            'removed': {'chunk_count': len(texts), 'token_count': count_tokens_many(texts, vector_store.embedding_model)},
+        }
+
+    def _build_query_graph(self, vector_store: ModuleVectorStore, max_results: int, similarity_threshold: float = None,
+                           parent_window: int = None):
+        # Import here to avoid startup issues
+        from .query_model import RUN_GRAPH
+        from .retrieval import resolve_score_threshold, resolve_answer_min_score
+        from .model_router import resolve_routing
+        from .context_packer import resolve_token_budget
+
+        routing = resolve_routing(vector_store.config)
+        return RUN_GRAPH(
+            chat_model_name=routing['large_model'],
+            model_name=vector_store.embedding_model,
+            model_provider="mistralai",
+            temperature=0.0,
+            persist_directory=vector_store.persistence_directory,
+            collection_name=vector_store.collection_name,
+            k=max_results,
+            score_threshold=resolve_score_threshold(vector_store.config, similarity_threshold),
+            vector_store_config=self._vector_store_config(vector_store),
+            parent_window=resolve_parent_window(vector_store.config, parent_window),
+            routing=routing,
+            answer_min_score=resolve_answer_min_score(vector_store.config),
+            token_budget=resolve_token_budget(vector_store.config)
+        )
+
     def query_module_vectors(self, query: str, module: Module, max_results: int = 5, 
-                            similarity_threshold: float = 0.7) -> tuple:
-        """Query vectors in a module and return relevant content"""
+                            similarity_threshold: float = None, filters: dict = None,
+                            parent_window: int = None) -> tuple:
+        """Query vectors in a module and return the graph result (answer, context, scores)"""
         try:
             vector_store = ModuleVectorStore.objects.get(module=module, status='ready')
         except ModuleVectorStore.DoesNotExist:
             logger.warning(f"No ready vector store found for module {module.id}")
-            return [], 0
+            return {}, 0
         
         start_time = time.time()
 
         try:
-            # Import here to avoid startup issues
-            from .query_model import RUN_GRAPH
+            retrieval_service = self._build_query_graph(vector_store, max_results, similarity_threshold, parent_window)
+            answers = retrieval_service.run(query, filters=build_where(filters))
+
+            return answers, int((time.time() - start_time) * 1000)
             
-            model_name = vector_store.embedding_model
-            collection_name = vector_store.collection_name
-            persist_directory = vector_store.persistence_directory
+        except ImportError as e:
+            print(f"Required dependencies not installed: {e}")
+            return {}, 0
+        except Exception as e:
+            print(f"Query failed: {e}")
+            return {}, 0
 
-            retrieval_service = RUN_GRAPH(
-                chat_model_name="mistral-large-latest",
-                model_name=model_name,
-                model_provider="mistralai",
-                temperature=0.0,
-                persist_directory=persist_directory,
-                collection_name=collection_name,
-                k=max_results,
-                score_threshold=similarity_threshold
+    async def aquery_module_vectors(self, query: str, module: Module, max_results: int = 5,
+                                    similarity_threshold: float = None, filters: dict = None,
+                                    parent_window: int = None) -> tuple:
+        """Async variant of query_module_vectors for ASGI views"""
+        try:
+            vector_store = await ModuleVectorStore.objects.aget(module=module, status='ready')
+        except ModuleVectorStore.DoesNotExist:
+            logger.warning(f"No ready vector store found for module {module.id}")
+            return {}, 0
+
+        start_time = time.time()
+
+        try:
+            from .executors import run_in_search_pool
+
+            # Building the graph loads models and opens the collection, so keep it off the event loop
+            retrieval_service = await run_in_search_pool(
+                self._build_query_graph, vector_store, max_results, similarity_threshold, parent_window
             )
+            answers = await retrieval_service.arun(query, filters=build_where(filters))
 
-            answers = retrieval_service.run(query)
+            return answers, int((time.time() - start_time) * 1000)
 
-            return answers['context'], int((time.time() - start_time) * 1000)
-            
         except ImportError as e:
             print(f"Required dependencies not installed: {e}")
-            return [], 0
+            return {}, 0
         except Exception as e:
             print(f"Query failed: {e}")
-            return [], 0
+            return {}, 0
 
 
 class RAGService:
@@ -197,70 +333,106 @@ class RAGService:
     
     def __init__(self):
         self.vector_service = VectorDBService()
+
+    def _build_response(self, query: str, module, search_results: dict, retrieval_time: int, start_time: float):
+        """Format the graph result as the API response plus the QueryLog fields"""
+        generation_start = time.time()
+
+        # Generate response - use the context from your RAG system
+        if search_results:
+            # Your RAG system returns the answer in the context
+            response = search_results.get('answer', 'No answer generated')
+            # Format sources from context
+            sources = []
+            scores = search_results.get('scores', [])
+            if isinstance(search_results, dict) and 'context' in search_results:
+                for doc, score in zip(search_results['context'], scores):
+                    sources.append({
+                        'content': doc.page_content if hasattr(doc, 'page_content') else str(doc),
+                        'metadata': doc.metadata if hasattr(doc, 'metadata') else {},
+                        'score': round(score, 4)
+                    })
+        else:
+            response = "I couldn't find relevant information to answer your question."
+            sources = []
+            scores = []
+
+        generation_time = int((time.time() - generation_start) * 1000)
+        total_time = int((time.time() - start_time) * 1000)
+
+        log_fields = {
+            'module': module,
+            'query_text': query,
+            'query_hash': hashlib.md5(query.encode()).hexdigest(),
+            'response_text': response,
+            'retrieved_chunks': sources,
+            'similarity_scores': [round(score, 4) for score in scores],
+            'retrieval_time_ms': retrieval_time,
+            'generation_time_ms': generation_time,
+            'total_time_ms': total_time,
+            **usage_fields(search_results)
+        }
+        result = {
+            'query': query,
+            'answer': response,
+            'sources': sources,
+            'retrieval_time_ms': retrieval_time,
+            'generation_time_ms': generation_time,
+            'total_time_ms': total_time,
+            'metadata': {
+                'module_id': module.id if module else None,
+                'model': search_results.get('model') if search_results else None,
+                'route_reason': search_results.get('route_reason') if search_results else None,
+                'degraded': bool(search_results.get('degraded')) if search_results else False,
+                'usage': add_usage(search_results.get('usage') if search_results else None),
+            }
+        }
+        return result, log_fields
     
     def process_query(self, query: str, project, module=None, 
-                     user=None, max_results: int = 5) -> Dict[str, Any]:
+                     user=None, max_results: int = 5, similarity_threshold: float = None,
+                     filters: dict = None, parent_window: int = None) -> Dict[str, Any]:
         """Process RAG query and return response"""
         start_time = time.time()
         
         try:
             # Search for relevant documents
             search_results, retrieval_time = self.vector_service.query_module_vectors(
-                query, module, max_results
+                query, module, max_results, similarity_threshold, filters, parent_window
             )
-            
-            generation_start = time.time()
-            
-            # Generate response - use the context from your RAG system
-            if search_results:
-                # Your RAG system returns the answer in the context
-                response = search_results.get('answer', 'No answer generated')
-                # Format sources from context
-                sources = []
-                if isinstance(search_results, dict) and 'context' in search_results:
-                    for doc in search_results['context']:
-                        sources.append({
-                            'content': doc.page_content if hasattr(doc, 'page_content') else str(doc),
-                            'metadata': doc.metadata if hasattr(doc, 'metadata') else {}
-                        })
-            else:
-                response = "I couldn't find relevant information to answer your question."
-                sources = []
-            
-            generation_time = int((time.time() - generation_start) * 1000)
-            total_time = int((time.time() - start_time) * 1000)
+            result, log_fields = self._build_response(query, module, search_results, retrieval_time, start_time)
             
             # Log query
             if user and module:
-                QueryLog.objects.create(
-                    user=user,
-                    module=module,
-                    query_text=query,
-                    query_hash=hashlib.md5(query.encode()).hexdigest(),
-                    response_text=response,
-                    retrieved_chunks=sources,
-                    similarity_scores=[],
-                    retrieval_time_ms=retrieval_time,
-                    generation_time_ms=generation_time,
-                    total_time_ms=total_time
-                )
+                QueryLog.objects.create(user=user, **log_fields)
             
-            return {
-                'query': query,
-                'answer': response,
-                'sources': sources,
-                'retrieval_time_ms': retrieval_time,
-                'generation_time_ms': generation_time,
-                'total_time_ms': total_time,
-                'metadata': {
-                    'module_id': module.id if module else None,
-                }
-            }
+            return result
             
         except Exception as e:
             print(f"RAG query processing failed: {e}")
             raise
 
+    async def aprocess_query(self, query: str, project, module=None,
+                             user=None, max_results: int = 5, similarity_threshold: float = None,
+                             filters: dict = None, parent_window: int = None) -> Dict[str, Any]:
+        """Async variant of process_query for ASGI views"""
+        start_time = time.time()
+
+        try:
+            search_results, retrieval_time = await self.vector_service.aquery_module_vectors(
+                query, module, max_results, similarity_threshold, filters, parent_window
+            )
+            result, log_fields = self._build_response(query, module, search_results, retrieval_time, start_time)
+
+            if user and module:
+                await QueryLog.objects.acreate(user=user, **log_fields)
+
+            return result
+
+        except Exception as e:
+            print(f"RAG query processing failed: {e}")
+            raise
+
 if __name__ == "__main__":
     # Simple test to verify setup
     service = VectorDBService()
@@ -1,30 +1,57 @@
+import asyncio
+import json
 import logging
 import hashlib
 import time
+import uuid
+
+from asgiref.sync import sync_to_async
 
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
 from django.conf import settings
+from django.http import StreamingHttpResponse, JsonResponse, Http404
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 
 from celery.result import AsyncResult
 
 from .models import VectorDBTask, ModuleVectorStore, QueryLog, Question, Answer, Rating, ChatSession
-from rag_app.models import Module
+from rag_app.models import Module, Project, Document
 from .serializers import (
     VectorDBTaskSerializer, ModuleVectorStoreSerializer, QueryLogSerializer,
-    RAGQuerySerializer, RAGResponseSerializer, ChatSessionSerializer
+    RAGQuerySerializer, RAGResponseSerializer, ChatSessionSerializer, ProjectQuerySerializer,
+    RetrievalFiltersSerializer, BatchQuerySerializer
 )
 
-from .tasks import create_vectordb_for_module_task
-from .services import VectorDBService
+from .tasks import create_vectordb_for_module_task, answer_chat_question_task, reindex_document_task
+from .services import VectorDBService, RAGService
 from .chat_bot import RUN_GRAPH
+from .cache import retrieval_cache
+from .response_cache import response_cache
+from .single_flight import answer_flight
+from .resilience import resilience_stats
+from .embeddings import query_embedding_cache_stats
+from .retrieval import resolve_score_threshold, resolve_answer_min_score
+from .context_packer import resolve_token_budget
+from .parent_store import resolve_parent_window
+from .model_router import resolve_routing
+from .filters import build_where
+from .chat_memory import seed_memory, format_memory, append_turn
+from .chat_jobs import answer_question, aanswer_question, job_status, FINISHED_STATES
+from .tokens import usage_fields
+from .progress import live_progress
 
 logger = logging.getLogger(__name__)
 
@@ -161,6 +188,13 @@ class VectorDBTaskStatusView(APIView):
                 "chunk_overlap": task_obj.chunk_overlap
             }
             
+            # Sub-document detail (stage, pages, chunks) lives in the cache between flushes
+            if task_obj.is_running:
+                live = live_progress(task_id)
+                if live:
+                    response_data["progress_percentage"] = live.get('progress', task_obj.progress_percentage)
+                    response_data["live_progress"] = live
+            
             # Add Celery-specific information
             if celery_result.state == 'PENDING':
                 response_data["celery_status"] = "Task is waiting to be processed"
@@ -260,6 +294,39 @@ class VectorDBTaskCancelView(APIView):
             )
 
 
+class ReindexDocumentView(APIView):
+    """Re-index a single document in its module's vector store (async)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, document_id):
+        """Queue the document on the reindex queue, ahead of bulk rebuilds"""
+        try:
+            document = get_object_or_404(Document, id=document_id)
+            vector_store = ModuleVectorStore.objects.filter(module=document.module).first()
+            if vector_store is None or vector_store.status != 'ready':
+                return Response(
+                    {"error": "Module vector store is not ready; build it with /api/vectordb/create/"},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            celery_task = reindex_document_task.delay(document.id)
+            return Response({
+                "success": True,
+                "task_id": celery_task.id,
+                "document_id": document.id,
+                "module_id": document.module.id
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except Http404:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to queue re-index of document {document_id}: {str(e)}")
+            return Response(
+                {"error": f"Failed to queue re-index: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class VectorDBTaskListView(APIView):
     """List vector DB tasks with filtering and pagination"""
     permission_classes = [IsAuthenticated]
@@ -457,8 +524,10 @@ class RAGQueryView(APIView):
             query = serializer.validated_data['query']
             module_id = serializer.validated_data['module_id']
             max_results = serializer.validated_data.get('max_results', 5)
-            similarity_threshold = serializer.validated_data.get('similarity_threshold', 0.7)
+            similarity_threshold = serializer.validated_data.get('similarity_threshold')
             include_metadata = serializer.validated_data.get('include_metadata', True)
+            filters = serializer.validated_data.get('filters')
+            parent_window = serializer.validated_data.get('parent_window')
             
             # Get module
             module = get_object_or_404(Module, id=module_id, is_active=True)
@@ -480,7 +549,10 @@ class RAGQueryView(APIView):
                 project=module.project,
                 module=module,
                 user=request.user,
-                max_results=max_results
+                max_results=max_results,
+                similarity_threshold=similarity_threshold,
+                filters=filters,
+                parent_window=parent_window
             )
             
             response_serializer = RAGResponseSerializer(data=result)
@@ -497,6 +569,78 @@ class RAGQueryView(APIView):
             )
 
 
+class ProjectQueryView(APIView):
+    """Handle RAG queries across every module of a project"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Search all ready module collections concurrently and answer once"""
+        try:
+            serializer = ProjectQuerySerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            
+            project = get_object_or_404(Project, id=serializer.validated_data['project_id'])
+            
+            from .project_search import ProjectSearchService
+            result = ProjectSearchService().answer(
+                project=project,
+                query=serializer.validated_data['query'],
+                k=serializer.validated_data.get('max_results', 5),
+                latency_budget_ms=serializer.validated_data.get('latency_budget_ms'),
+                filters=serializer.validated_data.get('filters')
+            )
+            return Response(result, status=status.HTTP_200_OK)
+                
+        except Exception as e:
+            logger.error(f"Project query processing failed: {str(e)}")
+            return Response(
+                {"error": f"Query processing failed: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class BatchQueryView(APIView):
+    """Handle many RAG queries against one module in a single request"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Embed all queries in one pass, search concurrently and answer with bounded LLM concurrency"""
+        try:
+            serializer = BatchQuerySerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            module = get_object_or_404(Module, id=serializer.validated_data['module_id'], is_active=True)
+            if not ModuleVectorStore.objects.filter(module=module, status='ready').exists():
+                return Response({
+                    "error": "Vector store not ready for this module",
+                    "module_name": module.name,
+                    "suggestion": "Please create vector database for this module first"
+                }, status=status.HTTP_412_PRECONDITION_FAILED)
+
+            from .batch_query import BatchQueryService
+            result = BatchQueryService().run(
+                module=module,
+                queries=serializer.validated_data['queries'],
+                max_results=serializer.validated_data.get('max_results', 5),
+                similarity_threshold=serializer.validated_data.get('similarity_threshold'),
+                filters=serializer.validated_data.get('filters'),
+                parent_window=serializer.validated_data.get('parent_window'),
+                generate=serializer.validated_data.get('generate', True),
+                max_concurrency=serializer.validated_data.get('max_concurrency'),
+                user=request.user
+            )
+            return Response(result, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Batch query processing failed: {str(e)}")
+            return Response(
+                {"error": f"Query processing failed: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class QueryLogListView(APIView):
     """List query logs with filtering"""
     permission_classes = [IsAuthenticated]
@@ -629,6 +773,16 @@ class VectorDBStatsView(APIView):
             # Query statistics
             total_queries = QueryLog.objects.count()
             user_queries = QueryLog.objects.filter(user=request.user).count()
+            token_usage = {
+                name: queryset.aggregate(
+                    prompt_tokens=Sum('prompt_tokens'),
+                    completion_tokens=Sum('completion_tokens'),
+                    total_tokens=Sum('total_tokens'),
+                    # Rows whose counts are estimates because the provider reported no usage
+                    estimated=Count('id', filter=Q(tokens_estimated=True))
+                )
+                for name, queryset in (("queries", QueryLog.objects.all()), ("chat", Answer.objects.all()))
+            }
             
             # Recent activity
             recent_tasks = VectorDBTaskSerializer(
@@ -663,6 +817,14 @@ class VectorDBStatsView(APIView):
                     "user_queries": user_queries
                 },
                 "vector_store_stats": vector_store_stats,
+                "token_usage": token_usage,
+                "cache_stats": {
+                    "query_embeddings": query_embedding_cache_stats(),
+                    "retrieval": retrieval_cache.stats(),
+                    "llm_responses": response_cache.stats(),
+                    "coalescing": answer_flight.stats()
+                },
+                "llm_health": resilience_stats(),
                 "recent_activity": {
                     "recent_tasks": recent_tasks,
                     "recent_queries": recent_queries
@@ -677,6 +839,40 @@ class VectorDBStatsView(APIView):
             )
 
 
+def get_or_create_chat_session(user, module_vector_store, session_id=None, title=''):
+    """Fetch the user's chat session, or start a new one for the module"""
+    if session_id:
+        return get_object_or_404(
+            ChatSession,
+            session_id=session_id,
+            user=user
+        )
+
+    session_id = hashlib.sha256(
+        f"{user.id}_{module_vector_store.module_id}_{time.time()}".encode()
+    ).hexdigest()
+    return ChatSession.objects.create(
+        title = title if title else f"Chat Session {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        session_id = session_id,
+        user = user,
+        module_vector_store = module_vector_store
+    )
+
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients negotiate text/event-stream; the body is produced by the view"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
 class ChatView(APIView):
     """Chat interface using RAG"""
     permission_classes = [IsAuthenticated]
@@ -694,30 +890,17 @@ class ChatView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            filters_serializer = RetrievalFiltersSerializer(data=data.get('filters') or {})
+            if not filters_serializer.is_valid():
+                return Response({"filters": filters_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
             module_vector_store = get_object_or_404(
                 ModuleVectorStore, 
                 module_id=module_id, 
                 status='ready'
             )
 
-            if session_id:
-                get_session = get_object_or_404(
-                    ChatSession,
-                    session_id=session_id,
-                    user=request.user
-                )
-            else:
-                session_id = hashlib.sha256(
-                    f"{request.user.id}_{module_id}_{time.time()}".encode()
-                ).hexdigest()
-                # session_id = get_session.session_id
-
-                get_session = ChatSession.objects.create(
-                    title = title if title or title != '' else f"Chat Session {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                    session_id = session_id,
-                    user = request.user,
-                    module_vector_store = module_vector_store
-                )
+            get_session = get_or_create_chat_session(request.user, module_vector_store, session_id, title)
             create_question = Question.objects.create(
                 module_vector_store=module_vector_store,
                 text=question,
@@ -725,75 +908,11 @@ class ChatView(APIView):
                 chat_session=get_session
             )
 
+            response = answer_question(create_question, build_where(filters_serializer.validated_data))
 
-            ## fetch latest 5 chat history for the session
-            previous_chat_history = Answer.objects.select_related('question').filter(
-                question__chat_session = get_session,
-                question__created_by = request.user
-            ).order_by('created_at').reverse()[:5]
-
-            print("Previous chat history objects:", previous_chat_history)
-            
-
-            previous_chat = []
-
-            for ans in previous_chat_history:
-                question_obj = ans.question
-                  # Get first answer
-                ratings = Rating.objects.filter(
-                    answer=ans,
-                )
-                
-                rate = [
-                    {"score": r.score, "feedback": r.feedback_text} 
-                    for r in ratings
-                ]
-                    
-                previous_chat.append({
-                    "question": question_obj.text,
-                    "answer": ans.text,
-                    "rating": rate
-                })
-
-            print("Previous chat:", previous_chat)
-
-            ## get time to process RAG
-
-            start_time = time.time()
-            rag_service = RUN_GRAPH(
-                collection_name=module_vector_store.collection_name,
-                persist_directory=module_vector_store.persistence_directory,
-                embedding_model_name=module_vector_store.embedding_model,
-                model_provider="mistralai",
-                temperature=0.0
-            )
-
-            answer_text = rag_service.run(
-                question=question,
-                previous_chat=previous_chat
-            )
-
-            end_time = time.time()
-            processing_time = end_time - start_time
-
-            answer_content = answer_text.get('answer', answer_text) if isinstance(answer_text, dict) else answer_text
-
-            create_answer = Answer.objects.create(
-                question=create_question,
-                text=answer_content,
-                created_by=request.user,
-                time_required=processing_time
-            )
-
-            logger.info(f"Chat processed for module {module_id} by user {request.user.username} in {processing_time:.3f}s")
+            logger.info(f"Chat processed for module {module_id} by user {request.user.username} in {response['processing_time']:.3f}s")
 
-            return Response({
-                "question": question,
-                "answer": answer_content,
-                "processing_time": round(processing_time, 3),
-                "session_id": session_id,
-                "answer_id": str(create_answer.id)
-            }, status=status.HTTP_200_OK)
+            return Response(response, status=status.HTTP_200_OK)
         except Exception as e:
 
             logger.error(f"Chat processing failed: {str(e)}")
@@ -848,6 +967,369 @@ class ChatView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class ChatStreamView(APIView):
+    """Chat interface using RAG, streamed as server-sent events.
+
+    Emits a `session` event, a `sources` event once retrieval finishes, one
+    `token` event per generated token and a final `done` event after the
+    answer has been saved. Serve through the ASGI application so the stream
+    does not pin a worker thread.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def post(self, request, module_id, session_id=None):
+        """Handle chat message"""
+        question = request.data.get('question')
+        title = request.data.get('title', '')
+
+        if not question:
+            return Response(
+                {"error": "Question is required"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters_serializer = RetrievalFiltersSerializer(data=request.data.get('filters') or {})
+        if not filters_serializer.is_valid():
+            return Response({"filters": filters_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        module_vector_store = get_object_or_404(
+            ModuleVectorStore, 
+            module_id=module_id, 
+            status='ready'
+        )
+        chat_session = get_or_create_chat_session(request.user, module_vector_store, session_id, title)
+        create_question = Question.objects.create(
+            module_vector_store=module_vector_store,
+            text=question,
+            created_by=request.user,
+            chat_session=chat_session
+        )
+        seed_memory(chat_session)
+        previous_chat = format_memory(chat_session)
+
+        rag_service = RUN_GRAPH(
+            collection_name=module_vector_store.collection_name,
+            persist_directory=module_vector_store.persistence_directory,
+            embedding_model_name=module_vector_store.embedding_model,
+            model_provider="mistralai",
+            temperature=0.0,
+            vector_store_config=module_vector_store.config
+        )
+        user = request.user
+
+        async def event_stream():
+            start_time = time.time()
+            answer_parts, generated = [], {}
+            yield sse_event("session", {"session_id": chat_session.session_id, "question": question})
+            try:
+                async for event, data in rag_service.astream(
+                    question=question,
+                    previous_chat=previous_chat,
+                    score_threshold=resolve_score_threshold(module_vector_store.config),
+                    token_budget=resolve_token_budget(module_vector_store.config),
+                    filters=build_where(filters_serializer.validated_data),
+                    parent_window=resolve_parent_window(module_vector_store.config),
+                    routing=resolve_routing(module_vector_store.config),
+                    answer_min_score=resolve_answer_min_score(module_vector_store.config)
+                ):
+                    if event == "usage":
+                        generated = data
+                        continue
+                    if event == "token":
+                        answer_parts.append(data)
+                    yield sse_event(event, data)
+
+                processing_time = time.time() - start_time
+                answer_content = "".join(answer_parts)
+                create_answer = await Answer.objects.acreate(
+                    question=create_question,
+                    text=answer_content,
+                    created_by=user,
+                    time_required=processing_time,
+                    **usage_fields(generated)
+                )
+                await sync_to_async(append_turn)(chat_session, question, answer_content)
+
+                logger.info(f"Streamed chat for module {module_id} by user {user.username} in {processing_time:.3f}s")
+                yield sse_event("done", {
+                    "answer_id": str(create_answer.id),
+                    "processing_time": round(processing_time, 3),
+                    "model": generated.get("model"),
+                    "usage": generated.get("usage")
+                })
+            except Exception as e:
+                logger.error(f"Chat streaming failed: {str(e)}")
+                yield sse_event("error", {"error": f"Chat processing failed: {str(e)}"})
+
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+async def authenticate_request(request):
+    """Token-authenticate a plain Django request; DRF does not run async views"""
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    """Minimal async counterpart of APIView: token authentication and JSON bodies.
+
+    Handlers run on the event loop, so a request waiting on the LLM holds no
+    worker thread. Blocking work must go through sync_to_async or the search pool.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await authenticate_request(request)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        request.user = user
+        try:
+            request.data = json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(request.data, dict):
+            return JsonResponse({"error": "JSON body must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncRAGQueryView(AsyncAPIView):
+    """Async RAG queries against module vector stores (ASGI)"""
+
+    async def post(self, request):
+        """Process RAG query"""
+        try:
+            serializer = RAGQuerySerializer(data=request.data)
+            if not await sync_to_async(serializer.is_valid)():
+                return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            query = serializer.validated_data['query']
+            module_id = serializer.validated_data['module_id']
+            max_results = serializer.validated_data.get('max_results', 5)
+            similarity_threshold = serializer.validated_data.get('similarity_threshold')
+            filters = serializer.validated_data.get('filters')
+            parent_window = serializer.validated_data.get('parent_window')
+
+            module = await Module.objects.select_related('project').aget(id=module_id, is_active=True)
+
+            if not await ModuleVectorStore.objects.filter(module=module, status='ready').aexists():
+                return JsonResponse({
+                    "error": "Vector store not ready for this module",
+                    "module_name": module.name,
+                    "suggestion": "Please create vector database for this module first"
+                }, status=status.HTTP_412_PRECONDITION_FAILED)
+
+            result = await RAGService().aprocess_query(
+                query=query,
+                project=module.project,
+                module=module,
+                user=request.user,
+                max_results=max_results,
+                similarity_threshold=similarity_threshold,
+                filters=filters,
+                parent_window=parent_window
+            )
+            return JsonResponse(result, status=status.HTTP_200_OK)
+
+        except Module.DoesNotExist:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"RAG query processing failed: {str(e)}")
+            return JsonResponse(
+                {"error": f"Query processing failed: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AsyncChatView(AsyncAPIView):
+    """Async chat interface using RAG (ASGI)"""
+
+    async def post(self, request, module_id, session_id=None):
+        """Handle chat message"""
+        try:
+            question = request.data.get('question')
+            title = request.data.get('title', '')
+
+            if not question:
+                return JsonResponse(
+                    {"error": "Question is required"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            filters_serializer = RetrievalFiltersSerializer(data=request.data.get('filters') or {})
+            if not await sync_to_async(filters_serializer.is_valid)():
+                return JsonResponse({"filters": filters_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            module_vector_store = await ModuleVectorStore.objects.aget(module_id=module_id, status='ready')
+            chat_session = await sync_to_async(get_or_create_chat_session)(
+                request.user, module_vector_store, session_id, title
+            )
+            create_question = await Question.objects.acreate(
+                module_vector_store=module_vector_store,
+                text=question,
+                created_by=request.user,
+                chat_session=chat_session
+            )
+
+            response = await aanswer_question(create_question, build_where(filters_serializer.validated_data))
+            logger.info(f"Chat processed for module {module_id} by user {request.user.username}")
+            return JsonResponse(response, status=status.HTTP_200_OK)
+
+        except (ModuleVectorStore.DoesNotExist, Http404):
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Chat processing failed: {str(e)}")
+            return JsonResponse(
+                {"error": f"Chat processing failed: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def chat_job_urls(job_id):
+    return {
+        "status_url": f"/api/vectordb/chat_jobs/status/{job_id}/",
+        "result_url": f"/api/vectordb/chat_jobs/result/{job_id}/",
+        "events_url": f"/api/vectordb/chat_jobs/events/{job_id}/",
+    }
+
+
+class ChatJobView(APIView):
+    """Submit a chat question as a background job.
+
+    The question is stored and answered by a Celery worker, so slow answers
+    do not hold a web worker. Poll the status/result endpoints or subscribe
+    to the events stream for the answer.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, module_id, session_id=None):
+        """Queue a chat message"""
+        try:
+            question = request.data.get('question')
+            title = request.data.get('title', '')
+
+            if not question:
+                return Response(
+                    {"error": "Question is required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            filters_serializer = RetrievalFiltersSerializer(data=request.data.get('filters') or {})
+            if not filters_serializer.is_valid():
+                return Response({"filters": filters_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            module_vector_store = get_object_or_404(
+                ModuleVectorStore,
+                module_id=module_id,
+                status='ready'
+            )
+            chat_session = get_or_create_chat_session(request.user, module_vector_store, session_id, title)
+
+            # The job id is chosen up front so the question is findable by it before the worker starts
+            job_id = str(uuid.uuid4())
+            create_question = Question.objects.create(
+                module_vector_store=module_vector_store,
+                text=question,
+                created_by=request.user,
+                chat_session=chat_session,
+                job_id=job_id
+            )
+            answer_chat_question_task.apply_async(
+                args=[str(create_question.id)],
+                kwargs={"filters": build_where(filters_serializer.validated_data)},
+                task_id=job_id
+            )
+
+            logger.info(f"Queued chat job {job_id} for module {module_id} by user {request.user.username}")
+            return Response({
+                "job_id": job_id,
+                "question_id": str(create_question.id),
+                "session_id": chat_session.session_id,
+                "status": "PENDING",
+                **chat_job_urls(job_id)
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except Http404:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to queue chat job: {str(e)}")
+            return Response(
+                {"error": f"Failed to queue chat job: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ChatJobStatusView(APIView):
+    """State of a chat job, with the answer once it is ready"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        question = get_object_or_404(Question, job_id=job_id, created_by=request.user)
+        return Response(job_status(question), status=status.HTTP_200_OK)
+
+
+class ChatJobResultView(APIView):
+    """Answer of a finished chat job; 202 while it is still running"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        question = get_object_or_404(Question, job_id=job_id, created_by=request.user)
+        data = job_status(question)
+        if data["status"] == "SUCCESS":
+            return Response(data["result"], status=status.HTTP_200_OK)
+        if data["status"] in FINISHED_STATES:
+            return Response(
+                {"error": data.get("error") or f"Chat job {data['status'].lower()}", "status": data["status"]},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class ChatJobEventsView(AsyncAPIView):
+    """Pushes a chat job's status changes and then its answer as server-sent events (ASGI)"""
+
+    async def get(self, request, job_id):
+        try:
+            question = await Question.objects.aget(job_id=job_id, created_by=request.user)
+        except Question.DoesNotExist:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        config = getattr(settings, 'VECTOR_DB_CONFIG', {})
+        poll_interval = config.get('CHAT_JOB_POLL_INTERVAL', 1.0)
+        timeout = config.get('CHAT_JOB_STREAM_TIMEOUT', 300)
+
+        async def event_stream():
+            deadline = time.monotonic() + timeout
+            last_status = None
+            while time.monotonic() < deadline:
+                data = await sync_to_async(job_status)(question)
+                if data["status"] == "SUCCESS":
+                    yield sse_event("result", data["result"])
+                    return
+                if data["status"] in FINISHED_STATES:
+                    yield sse_event("error", {"error": data.get("error") or f"Chat job {data['status'].lower()}"})
+                    return
+                if data["status"] != last_status:
+                    last_status = data["status"]
+                    yield sse_event("status", data)
+                await asyncio.sleep(poll_interval)
+            yield sse_event("timeout", {"job_id": job_id, **chat_job_urls(job_id)})
+
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class DeleteSessionView(APIView):
     """Delete a chat session"""
     permission_classes = [IsAuthenticated]